@@ -0,0 +1,284 @@
+"""Simulación por lotes de partidas sin pantalla para ajustar GameConfig
+
+Ejecuta miles de partidas con semilla fija y un bot en un ProcessPoolExecutor,
+barriendo una rejilla de parámetros de GameConfig. Los resultados se agregan
+en streaming: la memoria no crece con el número de partidas.
+
+Ejemplo:
+    python batch_simulation.py --games 500 \\
+        --param enemy_count=4,6,8 --param shark_speed=1.5,2.0,2.5 \\
+        --output tuning.csv
+"""
+import os
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse
+import csv
+import itertools
+import json
+import math
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field, fields
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import submarine_explorer as game
+from submarine_explorer import CELL_SIZE, GameConfig, GameState, PlayerControls
+
+DEFAULT_MAX_SECONDS = 180
+STARTING_LIVES = 3
+
+
+def cell_center(cell: Tuple[int, int]) -> Tuple[float, float]:
+    return cell[0] * CELL_SIZE + CELL_SIZE / 2, cell[1] * CELL_SIZE + CELL_SIZE / 2
+
+
+class GreedyBot:
+    """Bot de referencia sin precálculo: BFS a la perla más cercana, ignora a los enemigos"""
+
+    REPLAN_INTERVAL = 30
+
+    def __init__(self):
+        self.target = None
+        self.path: List[Tuple[int, int]] = []
+        self.replan_timer = 0
+
+    def plan(self, session: game.SubmarineExplorerGame):
+        """Busca con BFS la celda con perla más cercana al jugador"""
+        maze = session.maze
+        player = session.player
+        start = (int(player.x // CELL_SIZE), int(player.y // CELL_SIZE))
+        pearls_by_cell = {}
+        for pearl in session.pearls:
+            pearls_by_cell.setdefault((int(pearl.x // CELL_SIZE), int(pearl.base_y // CELL_SIZE)), pearl)
+
+        parents = {start: None}
+        queue = deque([start])
+        found = None
+        while queue:
+            cell = queue.popleft()
+            if cell in pearls_by_cell:
+                found = cell
+                break
+            cx, cy = cell
+            for nx, ny in ((cx + 1, cy), (cx - 1, cy), (cx, cy + 1), (cx, cy - 1)):
+                if (0 <= nx < maze.width and 0 <= ny < maze.height
+                        and not maze.grid[ny][nx] and (nx, ny) not in parents):
+                    parents[(nx, ny)] = cell
+                    queue.append((nx, ny))
+
+        self.target = pearls_by_cell.get(found)
+        self.path = []
+        while found is not None and found != start:
+            self.path.append(found)
+            found = parents[found]
+        self.path.reverse()
+        self.replan_timer = self.REPLAN_INTERVAL
+
+    def controls(self, session: game.SubmarineExplorerGame) -> PlayerControls:
+        """Decide los controles del frame actual"""
+        self.replan_timer -= 1
+        if self.target is None or self.target not in session.pearls or self.replan_timer <= 0:
+            self.plan(session)
+        if self.target is None:
+            return game.IDLE_CONTROLS
+
+        player = session.player
+        while self.path:
+            center_x, center_y = cell_center(self.path[0])
+            if abs(player.x - center_x) < 6 and abs(player.y - center_y) < 6:
+                self.path.pop(0)
+            else:
+                return PlayerControls.towards(center_x - player.x, center_y - player.y)
+        return PlayerControls.towards(self.target.x - player.x, self.target.y - player.y)
+
+
+BOTS = {'autopilot': game.Autopilot, 'greedy': GreedyBot}
+
+
+def simulate_game(config: GameConfig, seed: int, max_frames: int, bot_name: str) -> Tuple[bool, int, int, int, int]:
+    """Juega una partida sin pantalla; devuelve (completada, frames, muertes, puntos, perlas)"""
+    session = game.SubmarineExplorerGame(seed=seed, config=config, headless=True)
+    try:
+        session.reset_game()
+        session.particle_system.enabled = False
+        session.state = GameState.PLAYING
+        bot = BOTS[bot_name]()
+
+        total_pearls = len(session.pearls)
+        while session.state == GameState.PLAYING and session.game_time < max_frames:
+            session.update_game(bot.controls(session))
+    finally:
+        session.close()
+
+    completed = session.state == GameState.VICTORY
+    deaths = STARTING_LIVES - max(0, session.lives)
+    return completed, session.game_time, deaths, session.score, total_pearls - len(session.pearls)
+
+
+def run_chunk(params: Dict[str, float], seeds: List[int], max_frames: int, bot_name: str):
+    """Tarea de un proceso trabajador: varias partidas de una misma configuración"""
+    config = GameConfig(**params)
+    return params, [simulate_game(config, seed, max_frames, bot_name) for seed in seeds]
+
+
+@dataclass
+class ConfigStats:
+    """Agregado en streaming de las partidas de una configuración"""
+    games: int = 0
+    completed: int = 0
+    clear_mean: float = 0.0  # Frames hasta completar (media de Welford)
+    clear_m2: float = 0.0
+    clear_min: int = 0
+    clear_max: int = 0
+    deaths_total: int = 0
+    death_counts: List[int] = field(default_factory=lambda: [0] * (STARTING_LIVES + 1))
+    score_total: int = 0
+    pearls_total: int = 0
+
+    def add(self, completed: bool, frames: int, deaths: int, score: int, pearls: int):
+        self.games += 1
+        self.deaths_total += deaths
+        self.death_counts[min(deaths, STARTING_LIVES)] += 1
+        self.score_total += score
+        self.pearls_total += pearls
+        if completed:
+            self.completed += 1
+            delta = frames - self.clear_mean
+            self.clear_mean += delta / self.completed
+            self.clear_m2 += delta * (frames - self.clear_mean)
+            self.clear_min = frames if self.completed == 1 else min(self.clear_min, frames)
+            self.clear_max = max(self.clear_max, frames)
+
+    def summary(self) -> dict:
+        clear_std = math.sqrt(self.clear_m2 / (self.completed - 1)) if self.completed > 1 else 0.0
+        return {
+            'games': self.games,
+            'completion_rate': self.completed / self.games if self.games else 0.0,
+            'time_to_clear_s': self.clear_mean / game.FPS if self.completed else None,
+            'time_to_clear_std_s': clear_std / game.FPS,
+            'time_to_clear_min_s': self.clear_min / game.FPS if self.completed else None,
+            'time_to_clear_max_s': self.clear_max / game.FPS if self.completed else None,
+            'deaths_mean': self.deaths_total / self.games if self.games else 0.0,
+            'deaths_histogram': list(self.death_counts),
+            'score_mean': self.score_total / self.games if self.games else 0.0,
+            'pearls_mean': self.pearls_total / self.games if self.games else 0.0
+        }
+
+
+def parse_grid(specs: List[str]) -> List[Dict[str, float]]:
+    """Convierte 'campo=v1,v2' en el producto cartesiano de configuraciones"""
+    field_types = {f.name: f.type for f in fields(GameConfig)}
+    axes = []
+    for spec in specs:
+        name, _, values = spec.partition('=')
+        if name not in field_types:
+            raise ValueError(f"GameConfig no tiene el campo '{name}'")
+        cast = int if field_types[name] in (int, 'int') else float
+        axes.append([(name, cast(value)) for value in values.split(',') if value])
+    return [dict(combination) for combination in itertools.product(*axes)]
+
+
+def iter_tasks(grid: List[Dict[str, float]], games: int, base_seed: int, chunk: int) -> Iterator[tuple]:
+    """Genera las tareas de forma perezosa; todas las configuraciones usan las mismas semillas"""
+    for start in range(0, games, chunk):
+        seeds = list(range(base_seed + start, base_seed + min(games, start + chunk)))
+        for params in grid:
+            yield params, seeds
+
+
+def run_sweep(grid: List[Dict[str, float]], games: int, base_seed: int, max_frames: int,
+              bot_name: str, workers: Optional[int], chunk: int) -> Dict[tuple, ConfigStats]:
+    """Reparte las partidas entre todos los núcleos con un número acotado de tareas en vuelo"""
+    stats = {tuple(sorted(params.items())): ConfigStats() for params in grid}
+    workers = workers or os.cpu_count() or 1
+    tasks = iter_tasks(grid, games, base_seed, chunk)
+    total_games = games * len(grid)
+    done_games = 0
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < workers * 2:
+                task = next(tasks, None)
+                if task is None:
+                    exhausted = True
+                else:
+                    pending.add(executor.submit(run_chunk, *task, max_frames, bot_name))
+            if not pending:
+                break
+
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                params, results = future.result()
+                aggregate = stats[tuple(sorted(params.items()))]
+                for result in results:
+                    aggregate.add(*result)
+                done_games += len(results)
+
+            elapsed = time.perf_counter() - started
+            print(f"\r  {done_games}/{total_games} partidas ({done_games / elapsed:.0f}/s)",
+                  end='', file=sys.stderr, flush=True)
+
+    print(file=sys.stderr)
+    return stats
+
+
+def write_results(stats: Dict[tuple, ConfigStats], path: str):
+    rows = [dict(params, **aggregate.summary()) for params, aggregate in stats.items()]
+    if path.lower().endswith('.csv'):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, indent=2)
+
+
+def print_table(stats: Dict[tuple, ConfigStats]):
+    print(f"{'configuración':<48} {'partidas':>8} {'completadas':>11} {'t. medio':>9} {'muertes':>8}")
+    for params, aggregate in stats.items():
+        summary = aggregate.summary()
+        label = ", ".join(f"{name}={value}" for name, value in params) or "(por defecto)"
+        clear = f"{summary['time_to_clear_s']:.1f}s" if summary['time_to_clear_s'] is not None else "-"
+        print(f"{label:<48} {summary['games']:>8} {summary['completion_rate']:>10.1%} "
+              f"{clear:>9} {summary['deaths_mean']:>8.2f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Simulación por lotes para ajustar GameConfig")
+    parser.add_argument('--param', action='append', default=[], metavar='CAMPO=V1,V2',
+                        help="Valores a barrer para un campo de GameConfig (repetible)")
+    parser.add_argument('--games', type=int, default=200, help="Partidas por configuración")
+    parser.add_argument('--seed', type=int, default=0, help="Semilla base")
+    parser.add_argument('--max-seconds', type=float, default=DEFAULT_MAX_SECONDS,
+                        help="Duración máxima de cada partida (tiempo de juego)")
+    parser.add_argument('--bot', choices=sorted(BOTS), default='autopilot')
+    parser.add_argument('--workers', type=int, default=None, help="Procesos (por defecto todos los núcleos)")
+    parser.add_argument('--chunk', type=int, default=20, help="Partidas por tarea")
+    parser.add_argument('--output', default=None, help="Guardar el agregado en .csv o .json")
+    args = parser.parse_args(argv)
+
+    grid = parse_grid(args.param)
+    max_frames = int(args.max_seconds * game.FPS)
+    print(f"* {len(grid)} configuraciones x {args.games} partidas con el bot '{args.bot}'")
+
+    started = time.perf_counter()
+    stats = run_sweep(grid, args.games, args.seed, max_frames, args.bot, args.workers, args.chunk)
+    print(f"* Completado en {time.perf_counter() - started:.1f}s\n")
+
+    print_table(stats)
+    if args.output:
+        write_results(stats, args.output)
+        print(f"\nResultados guardados en {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
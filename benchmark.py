@@ -0,0 +1,587 @@
+"""Micro-benchmarks de las rutas críticas de El Explorador Submarino
+
+Uso:
+    python benchmark.py run [-o benchmarks/latest.json] [-k filtro] [--no-allocations]
+    python benchmark.py compare benchmarks/baseline.json benchmarks/latest.json [--threshold 10]
+    python benchmark.py scaling [--threads 1 2 4 8] [-o benchmarks/scaling.json]
+
+Todas las mediciones se hacen con el driver de vídeo "dummy" de SDL, sin ventana.
+"""
+import os
+
+# Los drivers deben fijarse antes de importar pygame
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import copy
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pygame
+
+import submarine_explorer as game
+
+DEFAULT_OUTPUT = os.path.join("benchmarks", "latest.json")
+DEFAULT_BASELINE = os.path.join("benchmarks", "baseline.json")
+DEFAULT_SCALING_OUTPUT = os.path.join("benchmarks", "scaling.json")
+DEFAULT_THRESHOLD = 10.0  # Porcentaje de empeoramiento tolerado
+ALLOC_ROUNDS = 50  # Llamadas trazadas con tracemalloc por caso
+# Diferencias absolutas por debajo de estas no cuentan como regresión de memoria
+ALLOC_NOISE_KIB = 1.0
+ALLOC_NOISE_BLOCKS = 1.0
+BENCH_SEED = 1234
+# Entidades de la prueba de escalado: muchos bloques de cada tipo para repartir entre hilos
+SCALING_ENEMIES = 4096
+SCALING_PEARLS = 1_000_000
+SCALING_PARTICLES = 100_000
+
+# Un caso devuelve (función medida, preparación no medida o None, operaciones por llamada)
+BenchmarkCase = Tuple[Callable[[], object], Optional[Callable[[], None]], int]
+BENCHMARKS: Dict[str, Callable[[], BenchmarkCase]] = {}
+# Partidas creadas por el caso en curso; se cierran (hilos incluidos) al terminar de medirlo
+OPEN_GAMES: List[game.SubmarineExplorerGame] = []
+
+
+def register(name: str):
+    """Registra un caso de benchmark bajo el nombre indicado"""
+    def decorator(setup: Callable[[], BenchmarkCase]):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+def make_game() -> game.SubmarineExplorerGame:
+    """Crea una partida lista para dibujar"""
+    instance = game.SubmarineExplorerGame(seed=BENCH_SEED)
+    OPEN_GAMES.append(instance)
+    instance.reset_game()
+    instance.state = game.GameState.PLAYING
+    return instance
+
+
+def close_games():
+    while OPEN_GAMES:
+        OPEN_GAMES.pop().close()
+
+
+def make_surface() -> pygame.Surface:
+    return pygame.Surface((game.SCREEN_WIDTH, game.SCREEN_HEIGHT))
+
+
+# --- Laberinto ---
+
+for maze_size in [(30, 20), (60, 40), (120, 80)]:
+    def _setup_generate(size=maze_size) -> BenchmarkCase:
+        maze = game.Maze(*size)
+        return maze.generate_maze, None, 1
+    register(f"maze.generate_maze[{maze_size[0]}x{maze_size[1]}]")(_setup_generate)
+
+
+@register("maze.is_wall[10k]")
+def _setup_is_wall() -> BenchmarkCase:
+    maze = game.Maze(30, 20)
+    points = [(random.uniform(0, game.SCREEN_WIDTH), random.uniform(0, game.SCREEN_HEIGHT))
+              for _ in range(10_000)]
+    is_wall = maze.is_wall
+
+    def run():
+        for x, y in points:
+            is_wall(x, y)
+    return run, None, len(points)
+
+
+@register("maze.draw")
+def _setup_maze_draw() -> BenchmarkCase:
+    maze = game.Maze(30, 20)
+    surface = make_surface()
+    return lambda: maze.draw(surface), None, 1
+
+
+@register("maze.update")
+def _setup_maze_update() -> BenchmarkCase:
+    maze = game.Maze(30, 20)
+    return maze.update, None, 1
+
+
+# --- Enemigos ---
+
+for enemy_class in [game.Shark, game.Jellyfish]:
+    def _setup_enemy_update(cls=enemy_class) -> BenchmarkCase:
+        config = game.GameConfig()
+        maze = game.Maze(config.maze_width, config.maze_height)
+        player = game.Player(*maze.get_free_position(), config)
+        enemies = [cls(*maze.get_free_position(), config) for _ in range(100)]
+
+        def run():
+            for enemy in enemies:
+                enemy.update(maze, player)
+        return run, None, len(enemies)
+    register(f"enemy.update[{enemy_class.__name__.lower()}x100]")(_setup_enemy_update)
+
+
+def make_entities(cls, count: int) -> list:
+    """Entidades repartidas por la pantalla con la animación en fases distintas"""
+    config = game.GameConfig()
+    entities = [cls(random.uniform(0, game.SCREEN_WIDTH), random.uniform(0, game.SCREEN_HEIGHT), config)
+                for _ in range(count)]
+    for i, entity in enumerate(entities):
+        entity.direction = random.uniform(0, 2 * math.pi)
+        if isinstance(entity, game.Player):
+            entity.has_harpoon = i % 2 == 0
+        else:
+            entity.feared = i % 4 == 0
+    return entities
+
+
+for entity_class in [game.Player, game.Shark, game.Jellyfish]:
+    def _setup_entity_draw(cls=entity_class) -> BenchmarkCase:
+        entities = make_entities(cls, 100)
+        surface = make_surface()
+
+        def run():
+            for entity in entities:
+                entity.draw(surface)
+        return run, None, len(entities)
+    register(f"{entity_class.__name__.lower()}.draw[x100]")(_setup_entity_draw)
+
+
+@register("sight.can_see[x100]")
+def _setup_can_see() -> BenchmarkCase:
+    config = game.GameConfig()
+    maze = game.Maze(config.maze_width, config.maze_height)
+    player = game.Player(*maze.get_free_position(), config)
+    enemies = [game.Shark(*maze.get_free_position(), config) for _ in range(100)]
+    sight = game.LineOfSight()
+
+    def move_player():
+        # El buzo cambia de celda entre lotes: mezcla de aciertos y fallos de caché
+        player.x, player.y = maze.get_free_position()
+
+    return lambda: sight.can_see(maze, player, enemies), move_player, len(enemies)
+
+
+# --- Partículas ---
+
+def make_particles(count: int) -> list:
+    """Mezcla de burbujas y partículas de explosión repartidas por la pantalla"""
+    particles = []
+    for i in range(count):
+        x = random.uniform(0, game.SCREEN_WIDTH)
+        y = random.uniform(0, game.SCREEN_HEIGHT)
+        if i % 2:
+            particles.append(game.Bubble(x, y))
+        else:
+            particles.append(game.ExplosionParticle(x, y, game.COLORS['pearl_white']))
+    return particles
+
+
+for particle_count in [100, 1_000, 10_000]:
+    def _setup_particles_update(count=particle_count) -> BenchmarkCase:
+        system = game.ParticleSystem()
+        pristine = make_particles(count)
+
+        def prepare():
+            system.particles = [copy.copy(p) for p in pristine]
+        return system.update, prepare, count
+
+    def _setup_particles_draw(count=particle_count) -> BenchmarkCase:
+        system = game.ParticleSystem()
+        system.particles = make_particles(count)
+        surface = make_surface()
+        return lambda: system.draw(surface), None, count
+
+    register(f"particles.update[{particle_count}]")(_setup_particles_update)
+    register(f"particles.draw[{particle_count}]")(_setup_particles_draw)
+
+
+# --- Perlas ---
+
+def make_pearls(count: int) -> game.PearlStore:
+    """Perlas repartidas por la pantalla; una de cada diez es gigante"""
+    pearls = []
+    for i in range(count):
+        kind = game.GiantPearl if i % 10 == 0 else game.Pearl
+        pearls.append(kind(random.uniform(0, game.SCREEN_WIDTH), random.uniform(0, game.SCREEN_HEIGHT)))
+    return game.PearlStore(pearls)
+
+
+for pearl_count in [100, 10_000]:
+    def _setup_pearls_update(count=pearl_count) -> BenchmarkCase:
+        store = make_pearls(count)
+        return store.update, None, count
+
+    def _setup_pearls_draw(count=pearl_count) -> BenchmarkCase:
+        store = make_pearls(count)
+        surface = make_surface()
+        view = surface.get_rect()
+        return lambda: store.draw(surface, view), None, count
+
+    register(f"pearls.update[{pearl_count}]")(_setup_pearls_update)
+    register(f"pearls.draw[{pearl_count}]")(_setup_pearls_draw)
+
+
+# --- Dibujo de la partida ---
+
+@register("game.draw_background")
+def _setup_draw_background() -> BenchmarkCase:
+    instance = make_game()
+    return instance.draw_background, None, 1
+
+
+for scene_state in ["MENU", "INSTRUCTIONS", "HIGH_SCORES", "PAUSED", "GAME_OVER", "VICTORY"]:
+    def _setup_draw_scene(state=scene_state) -> BenchmarkCase:
+        instance = make_game()
+        instance.draw_game()
+        instance.state = game.GameState[state]
+        return instance.current_scene().draw, None, 1
+
+    register(f"scene.draw[{scene_state.lower()}]")(_setup_draw_scene)
+
+
+@register("game.draw_minimap")
+def _setup_draw_minimap() -> BenchmarkCase:
+    instance = make_game()
+
+    def run():
+        instance.draw_minimap()
+        instance.render_queue.flush(instance.screen)
+    return run, None, 1
+
+
+@register("game.draw_hud")
+def _setup_draw_hud() -> BenchmarkCase:
+    instance = make_game()
+    return instance.draw_hud, None, 1
+
+
+# --- Grabación ---
+
+for record_scale in [1.0, 0.5]:
+    def _setup_recorder_grab(scale=record_scale) -> BenchmarkCase:
+        # Solo la copia que hace el bucle; la escritura va en el hilo del grabador
+        recorder = game.FrameRecorder(scale=scale)
+        recorder.prepare(make_game().screen)
+        buffer = recorder.buffers[0]
+        return lambda: recorder.grab(buffer), None, 1
+    register(f"recorder.grab[{record_scale}x]")(_setup_recorder_grab)
+
+
+# --- Actualización en paralelo (subcomando scaling) ---
+
+def scaling_cases(updater: game.ParallelUpdater) -> Dict[str, Callable[[], BenchmarkCase]]:
+    """Casos de la etapa en paralelo con muchas entidades, para un número de hilos"""
+    def enemies() -> BenchmarkCase:
+        config = game.GameConfig()
+        maze = game.Maze(config.maze_width, config.maze_height)
+        player = game.Player(*maze.get_free_position(), config)
+        kinds = [game.Shark, game.Jellyfish]
+        crowd = [kinds[i % 2](*maze.get_free_position(), config) for i in range(SCALING_ENEMIES)]
+        return lambda: updater.update_enemies(crowd, maze, player), None, len(crowd)
+
+    def pearls() -> BenchmarkCase:
+        store = make_pearls(SCALING_PEARLS)
+        player = game.Player(game.SCREEN_WIDTH / 2, game.SCREEN_HEIGHT / 2, game.GameConfig())
+        return lambda: updater.update_pearls(store, player), None, SCALING_PEARLS
+
+    def particles() -> BenchmarkCase:
+        system = game.ParticleSystem()
+        pristine = make_particles(SCALING_PARTICLES)
+
+        def prepare():
+            system.particles = [copy.copy(p) for p in pristine]
+        return lambda: updater.update_particles(system), prepare, SCALING_PARTICLES
+
+    return {
+        f"parallel.enemies[{SCALING_ENEMIES}]": enemies,
+        f"parallel.pearls[{SCALING_PEARLS}]": pearls,
+        f"parallel.particles[{SCALING_PARTICLES}]": particles
+    }
+
+
+def measure(setup: Callable[[], BenchmarkCase], min_time: float, max_rounds: int) -> dict:
+    """Ejecuta un caso hasta acumular min_time segundos medidos (o max_rounds rondas)"""
+    random.seed(BENCH_SEED)
+    np.random.seed(BENCH_SEED)
+    fn, prepare, ops = setup()
+
+    # Calentamiento
+    for _ in range(3):
+        if prepare:
+            prepare()
+        fn()
+
+    timings = []
+    total = 0.0
+    while total < min_time and len(timings) < max_rounds:
+        if prepare:
+            prepare()
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        timings.append(elapsed)
+        total += elapsed
+
+    median = statistics.median(timings)
+    return {
+        'median_ms': median * 1000,
+        'min_ms': min(timings) * 1000,
+        'mean_ms': statistics.fmean(timings) * 1000,
+        'stdev_ms': (statistics.stdev(timings) if len(timings) > 1 else 0.0) * 1000,
+        'rounds': len(timings),
+        'ops_per_call': ops,
+        'ns_per_op': median * 1e9 / ops
+    }
+
+
+def measure_allocations(setup: Callable[[], BenchmarkCase], rounds: int) -> dict:
+    """Traza las asignaciones de un caso con tracemalloc, en una pasada aparte de la de tiempos
+
+    Cada llamada cuenta como un frame: el pico es la memoria temporal por llamada,
+    los puntos principales son los temporales vivos en ese pico (una de cada cinco
+    llamadas) y lo retenido es lo que sigue vivo al final, repartido entre las llamadas.
+    """
+    random.seed(BENCH_SEED)
+    np.random.seed(BENCH_SEED)
+    fn, prepare, _ = setup()
+    tracker = game.AllocationTracker()
+    tracker.TOP_SITES = 5
+    tracker.SAMPLE_EVERY = 5
+    if not tracker.start(rounds):
+        return {}
+
+    # El calentamiento se traza para que la referencia incluya lo que cada ronda reemplaza
+    for _ in range(3):
+        if prepare:
+            prepare()
+        fn()
+    tracker.reset_window()
+
+    for _ in range(rounds):
+        if prepare:
+            prepare()
+        tracker.begin_frame()
+        fn()
+        tracker.end_frame()
+    report = tracker.finish()
+    return {
+        'peak_kib': report['peak_kib_median'],
+        'blocks_per_call': report['blocks_per_frame'],
+        'kib_per_call': report['kib_per_frame'],
+        'top_sites': report['top_sites'],
+        'retained_blocks_per_call': report['retained_blocks_per_frame'],
+        'retained_kib_per_call': report['retained_kib_per_frame'],
+        'retained_sites': report['retained_sites']
+    }
+
+
+def run_benchmarks(pattern: Optional[str], min_time: float, max_rounds: int,
+                   allocations: bool = True) -> dict:
+    """Ejecuta los benchmarks seleccionados y devuelve el documento de resultados"""
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if pattern and pattern not in name:
+            continue
+        try:
+            results[name] = measure(setup, min_time, max_rounds)
+            line = f"{name:<36} {results[name]['median_ms']:10.3f} ms  ({results[name]['rounds']} rondas)"
+            if allocations:
+                close_games()
+                results[name]['allocations'] = measure_allocations(setup, ALLOC_ROUNDS)
+                line += f"  pico {results[name]['allocations'].get('peak_kib', 0.0):8.1f} KiB"
+        finally:
+            close_games()
+        print(line)
+
+    return {'meta': environment(), 'results': results}
+
+
+def environment() -> dict:
+    """Versiones y máquina con que se han tomado las medidas"""
+    return {
+        'timestamp': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'free_threaded': game.FREE_THREADED,
+        'cpu_count': os.cpu_count(),
+        'pygame': pygame.version.ver,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'platform': platform.platform()
+    }
+
+
+def run_scaling(threads: List[int], min_time: float, max_rounds: int) -> dict:
+    """Mide la etapa en paralelo con cada número de hilos y la aceleración frente a uno"""
+    mode = "sin GIL" if game.FREE_THREADED else "con GIL: los hilos no aceleran el código de Python"
+    print(f"{platform.python_implementation()} {platform.python_version()} ({mode}), "
+          f"{os.cpu_count()} núcleos\n")
+    print(f"{'caso':<32} {'hilos':>5} {'ms':>10} {'aceleración':>12}")
+
+    results = {}
+    for count in threads:
+        updater = game.ParallelUpdater(count)
+        try:
+            for name, setup in scaling_cases(updater).items():
+                result = measure(setup, min_time, max_rounds)
+                result['threads'] = count
+                results.setdefault(name, []).append(result)
+        finally:
+            updater.shutdown()
+
+    for name, rows in results.items():
+        single = rows[0]['median_ms']
+        for row in rows:
+            row['speedup'] = single / row['median_ms'] if row['median_ms'] > 0 else 0.0
+            print(f"{name:<32} {row['threads']:>5} {row['median_ms']:10.3f} {row['speedup']:11.2f}x")
+    return {'meta': environment(), 'results': results}
+
+
+def compare_results(baseline: dict, current: dict, threshold: float) -> bool:
+    """Imprime la comparación y devuelve True si algún caso empeora más del umbral"""
+    base_results = baseline.get('results', {})
+    current_results = current.get('results', {})
+    regressions = []
+
+    print(f"{'benchmark':<36} {'base ms':>10} {'actual ms':>10} {'cambio':>9}")
+    for name in sorted(set(base_results) & set(current_results)):
+        base_ms = base_results[name]['median_ms']
+        current_ms = current_results[name]['median_ms']
+        change = (current_ms / base_ms - 1) * 100 if base_ms > 0 else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESIÓN"
+            regressions.append(name)
+        elif change < -threshold:
+            flag = "  mejora"
+        print(f"{name:<36} {base_ms:10.3f} {current_ms:10.3f} {change:+8.1f}%{flag}")
+
+    for name in sorted(set(base_results) - set(current_results)):
+        print(f"{name:<36} (solo en la referencia)")
+    for name in sorted(set(current_results) - set(base_results)):
+        print(f"{name:<36} (nuevo)")
+
+    regressions += compare_allocations(base_results, current_results, threshold)
+
+    if regressions:
+        print(f"\n{len(regressions)} regresiones por encima del {threshold:.0f}%")
+    else:
+        print(f"\nSin regresiones por encima del {threshold:.0f}%")
+    return bool(regressions)
+
+
+def retained_blocks(allocations: dict) -> float:
+    """Bloques retenidos por llamada (los JSON antiguos los guardaban como blocks_per_call)"""
+    return allocations.get('retained_blocks_per_call', allocations.get('blocks_per_call', 0.0))
+
+
+def compare_allocations(base_results: dict, current_results: dict, threshold: float) -> list:
+    """Compara el pico y los bloques retenidos por llamada; devuelve los casos que empeoran"""
+    names = sorted(name for name in set(base_results) & set(current_results)
+                   if base_results[name].get('allocations') and current_results[name].get('allocations'))
+    if not names:
+        return []
+
+    regressions = []
+    print(f"\n{'asignaciones':<36} {'pico base':>10} {'pico act.':>10} {'bloq. base':>10} {'bloq. act.':>10}")
+    for name in names:
+        base = base_results[name]['allocations']
+        current = current_results[name]['allocations']
+        flags = []
+        for base_value, current_value, noise, label in [
+                (base['peak_kib'], current['peak_kib'], ALLOC_NOISE_KIB, "pico"),
+                (retained_blocks(base), retained_blocks(current), ALLOC_NOISE_BLOCKS, "bloques")]:
+            difference = current_value - base_value
+            if difference > noise and difference > abs(base_value) * threshold / 100:
+                flags.append(label)
+        if flags:
+            regressions.append(f"{name} (memoria)")
+        flag = f"  REGRESIÓN ({', '.join(flags)})" if flags else ""
+        print(f"{name:<36} {base['peak_kib']:10.1f} {current['peak_kib']:10.1f} "
+              f"{retained_blocks(base):10.2f} {retained_blocks(current):10.2f}{flag}")
+    return regressions
+
+
+def load_json(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_json(data: dict, path: str):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def default_thread_counts() -> List[int]:
+    """1, 2, 4... hasta el número de núcleos (incluido)"""
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 < cores:
+        counts.append(counts[-1] * 2)
+    return sorted(set(counts) | {cores})
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de El Explorador Submarino")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Ejecuta los benchmarks y guarda el JSON")
+    run_parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT)
+    run_parser.add_argument('-k', '--filter', default=None, help="Solo casos cuyo nombre contenga este texto")
+    run_parser.add_argument('--min-time', type=float, default=0.5, help="Segundos medidos por caso")
+    run_parser.add_argument('--max-rounds', type=int, default=1000)
+    run_parser.add_argument('--no-allocations', action='store_true',
+                            help="No trazar las asignaciones con tracemalloc")
+
+    compare_parser = subparsers.add_parser('compare', help="Compara dos JSON y marca regresiones")
+    compare_parser.add_argument('baseline', nargs='?', default=DEFAULT_BASELINE)
+    compare_parser.add_argument('current', nargs='?', default=DEFAULT_OUTPUT)
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                                help="Porcentaje de empeoramiento que cuenta como regresión")
+
+    subparsers.add_parser('list', help="Lista los casos disponibles")
+
+    scaling_parser = subparsers.add_parser('scaling', help="Escalado de la actualización en paralelo con los hilos")
+    scaling_parser.add_argument('-o', '--output', default=DEFAULT_SCALING_OUTPUT)
+    scaling_parser.add_argument('--threads', type=int, nargs='+', default=None,
+                                help="Números de hilos (por defecto 1, 2, 4... hasta los núcleos)")
+    scaling_parser.add_argument('--min-time', type=float, default=1.0, help="Segundos medidos por caso")
+    scaling_parser.add_argument('--max-rounds', type=int, default=200)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        for name in BENCHMARKS:
+            print(name)
+        return 0
+
+    if args.command == 'run':
+        data = run_benchmarks(args.filter, args.min_time, args.max_rounds,
+                              allocations=not args.no_allocations)
+        save_json(data, args.output)
+        print(f"\nResultados guardados en {args.output}")
+        return 0
+
+    if args.command == 'scaling':
+        threads = args.threads or default_thread_counts()
+        data = run_scaling(sorted(set(threads) | {1}), args.min_time, args.max_rounds)
+        save_json(data, args.output)
+        print(f"\nResultados guardados en {args.output}")
+        return 0
+
+    regressed = compare_results(load_json(args.baseline), load_json(args.current), args.threshold)
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
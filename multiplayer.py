@@ -0,0 +1,1056 @@
+"""Partidas cooperativas en red: servidor autoritativo y clientes con predicción
+
+El servidor simula la partida con las reglas de update_game y un buzo por cliente.
+Recibe las entradas por UDP y envía instantáneas empaquetadas en bits, comprimidas
+por diferencias contra la última instantánea que cada cliente ha confirmado. El
+cliente predice su propio buzo con sus entradas y dibuja a los demás buzos y a
+los enemigos interpolando entre instantáneas.
+
+Uso:
+    python multiplayer.py server [--port 50555] [--max-players 8]
+    python multiplayer.py client [--host 127.0.0.1] [--port 50555]
+    python multiplayer.py loadtest [--players 2 8 32] [--seconds 10] [--loss 0.05]
+"""
+import os
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse
+import json
+import math
+import random
+import socket
+import sys
+import time
+from collections import deque
+from dataclasses import asdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pygame
+
+import submarine_explorer as game
+from submarine_explorer import (CELL_SIZE, COLORS, FPS, SCREEN_HEIGHT, SCREEN_WIDTH, VIEW, GameConfig,
+                                 GameState, PlayerControls)
+
+DEFAULT_PORT = 50555
+PROTOCOL_VERSION = 1
+STARTING_LIVES = 3
+INVULNERABLE_FRAMES = 120  # Player.max_invulnerable_time
+UDP_OVERHEAD = 28  # Cabeceras IPv4 + UDP de cada datagrama
+
+MSG_HELLO, MSG_WELCOME, MSG_INPUT, MSG_SNAPSHOT, MSG_BYE, MSG_FULL = range(1, 7)
+
+POSITION_SCALE = 8  # Posiciones en octavos de píxel
+VELOCITY_SCALE = 64
+SCORE_BITS = 20
+SNAPSHOT_INTERVAL = 2  # Ticks entre instantáneas (30 por segundo)
+HISTORY_TICKS = 64  # Antigüedad máxima de una instantánea usada como base
+INTERP_DELAY = 3 * SNAPSHOT_INTERVAL  # Los demás se dibujan con este retraso (ticks)
+MAX_REDUNDANT_INPUTS = 7  # Entradas repetidas en cada paquete por si se pierde alguno
+
+PHASES = [GameState.PLAYING, GameState.VICTORY, GameState.GAME_OVER]
+
+
+class BitWriter:
+    """Empaqueta enteros sin signo en un flujo de bits"""
+
+    __slots__ = ('value', 'bits')
+
+    def __init__(self):
+        self.value = 0
+        self.bits = 0
+
+    def write(self, value: int, bits: int):
+        self.value |= value << self.bits
+        self.bits += bits
+
+    def extend(self, other: 'BitWriter'):
+        self.write(other.value, other.bits)
+
+    def to_bytes(self) -> bytes:
+        return self.value.to_bytes((self.bits + 7) // 8, 'little')
+
+
+class BitReader:
+    """Lee enteros sin signo de un flujo de bits"""
+
+    __slots__ = ('value', 'position')
+
+    def __init__(self, data: bytes):
+        self.value = int.from_bytes(data, 'little')
+        self.position = 0
+
+    def read(self, bits: int) -> int:
+        result = (self.value >> self.position) & ((1 << bits) - 1)
+        self.position += bits
+        return result
+
+
+def octant(direction: float) -> int:
+    """Dirección del buzo como una de sus 8 orientaciones posibles"""
+    return round(direction / (math.pi / 4)) % 8
+
+
+def snap_player(player: game.Player):
+    """Redondea el estado del buzo a la precisión de la red
+
+    El servidor lo aplica tras cada tick y el cliente tras cada predicción, así
+    que al repetir entradas pendientes ambos llegan exactamente al mismo estado.
+    """
+    player.x = round(player.x * POSITION_SCALE) / POSITION_SCALE
+    player.y = round(player.y * POSITION_SCALE) / POSITION_SCALE
+    player.velocity_x = round(player.velocity_x * VELOCITY_SCALE) / VELOCITY_SCALE
+    player.velocity_y = round(player.velocity_y * VELOCITY_SCALE) / VELOCITY_SCALE
+    player.direction = octant(player.direction) * math.pi / 4
+
+
+def generate_level(config: GameConfig, seed: int) -> game.Level:
+    """Genera el nivel de una semilla sin alterar el estado global de random"""
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        return game.spawn_level(config)
+    finally:
+        random.setstate(state)
+
+
+class Snapshot(NamedTuple):
+    """Estado cuantizado de la partida en un tick"""
+    tick: int
+    round: int
+    phase: int
+    seed: int
+    players: Dict[int, tuple]  # ranura -> (x, y, vx, vy, octante, arpón, invulnerable, vidas, puntos)
+    enemies: Tuple[tuple, ...]  # (x, y, huyendo)
+    pearls: int  # Máscara de perlas sin recoger
+
+
+class SnapshotCodec:
+    """Cuantización y codificación en bits de las instantáneas
+
+    Cada campo se envía con un bit de "cambiado" respecto a la base. Si cambió,
+    las posiciones y los temporizadores usan un delta corto cuando cabe y el
+    valor completo cuando no. Sin base se codifica contra ceros.
+    """
+
+    def __init__(self, config: GameConfig, max_players: int):
+        self.max_players = max_players
+        self.enemy_count = config.enemy_count
+        self.pearl_count = config.pearl_count + config.giant_pearl_count
+        self.velocity_offset = math.ceil(config.player_speed * VELOCITY_SCALE)
+
+        x_bits = (config.maze_width * CELL_SIZE * POSITION_SCALE).bit_length()
+        y_bits = (config.maze_height * CELL_SIZE * POSITION_SCALE).bit_length()
+        velocity_bits = (2 * self.velocity_offset).bit_length()
+        harpoon_bits = max(1, config.harpoon_duration).bit_length()
+        invulnerable_bits = INVULNERABLE_FRAMES.bit_length()
+        self.max_score = (1 << SCORE_BITS) - 1
+
+        # (bits del valor completo, bits del delta corto o 0)
+        self.player_schema = ((x_bits, 8), (y_bits, 8), (velocity_bits, 0), (velocity_bits, 0), (3, 0),
+                              (harpoon_bits, 5), (invulnerable_bits, 5), (2, 0), (SCORE_BITS, 0))
+        self.enemy_schema = ((x_bits, 8), (y_bits, 8), (1, 0))
+        self.zero_player = (0,) * len(self.player_schema)
+        self.zero_enemy = (0,) * len(self.enemy_schema)
+
+    # --- Cuantización ---
+
+    def quantize_player(self, player: game.Player, lives: int, score: int) -> tuple:
+        return (
+            round(player.x * POSITION_SCALE),
+            round(player.y * POSITION_SCALE),
+            round(player.velocity_x * VELOCITY_SCALE) + self.velocity_offset,
+            round(player.velocity_y * VELOCITY_SCALE) + self.velocity_offset,
+            octant(player.direction),
+            player.harpoon_time,
+            player.invulnerable_time,
+            max(0, lives),
+            min(score, self.max_score)
+        )
+
+    def apply_player(self, player: game.Player, state: tuple):
+        """Copia un estado cuantizado sobre un buzo"""
+        x, y, velocity_x, velocity_y, direction, harpoon, invulnerable = state[:7]
+        player.x = x / POSITION_SCALE
+        player.y = y / POSITION_SCALE
+        player.velocity_x = (velocity_x - self.velocity_offset) / VELOCITY_SCALE
+        player.velocity_y = (velocity_y - self.velocity_offset) / VELOCITY_SCALE
+        player.direction = direction * math.pi / 4
+        player.harpoon_time = harpoon
+        player.has_harpoon = harpoon > 0
+        player.invulnerable_time = invulnerable
+        player.invulnerable = invulnerable > 0
+        player.update_rect()
+
+    def capture(self, world: 'CoopWorld', tick: int) -> Snapshot:
+        """Instantánea cuantizada del mundo"""
+        players = {slot: self.quantize_player(diver.player, diver.lives, diver.score)
+                   for slot, diver in world.divers.items()}
+        enemies = tuple((round(enemy.x * POSITION_SCALE), round(enemy.y * POSITION_SCALE), int(enemy.feared))
+                        for enemy in world.enemies)
+        return Snapshot(tick, world.round, PHASES.index(world.phase), world.seed, players, enemies,
+                        world.pearls.alive_mask())
+
+    # --- Codificación ---
+
+    @staticmethod
+    def write_entity(writer: BitWriter, state: tuple, base: tuple, schema: tuple):
+        if state == base:
+            writer.write(0, 1)
+            return
+        writer.write(1, 1)
+        for value, old, (bits, short_bits) in zip(state, base, schema):
+            if value == old:
+                writer.write(0, 1)
+                continue
+            writer.write(1, 1)
+            if short_bits:
+                half = 1 << (short_bits - 1)
+                delta = value - old
+                if -half <= delta < half:
+                    writer.write(1, 1)
+                    writer.write(delta + half, short_bits)
+                    continue
+                writer.write(0, 1)
+            writer.write(value, bits)
+
+    @staticmethod
+    def read_entity(reader: BitReader, base: tuple, schema: tuple) -> tuple:
+        if not reader.read(1):
+            return base
+        values = []
+        for old, (bits, short_bits) in zip(base, schema):
+            if not reader.read(1):
+                values.append(old)
+            elif short_bits and reader.read(1):
+                values.append(old + reader.read(short_bits) - (1 << (short_bits - 1)))
+            else:
+                values.append(reader.read(bits))
+        return tuple(values)
+
+    def encode_body(self, snapshot: Snapshot, baseline: Optional[Snapshot]) -> BitWriter:
+        """Jugadores, enemigos y perlas; es igual para todos los clientes con la misma base"""
+        writer = BitWriter()
+        base_players = baseline.players if baseline else {}
+        for slot in range(self.max_players):
+            state = snapshot.players.get(slot)
+            if state is None:
+                writer.write(0, 1)
+                continue
+            writer.write(1, 1)
+            self.write_entity(writer, state, base_players.get(slot, self.zero_player), self.player_schema)
+
+        for i, state in enumerate(snapshot.enemies):
+            base = baseline.enemies[i] if baseline else self.zero_enemy
+            self.write_entity(writer, state, base, self.enemy_schema)
+
+        base_pearls = baseline.pearls if baseline else 0
+        if snapshot.pearls == base_pearls:
+            writer.write(0, 1)
+        else:
+            writer.write(1, 1)
+            writer.write(snapshot.pearls, self.pearl_count)
+        return writer
+
+    def encode(self, snapshot: Snapshot, baseline: Optional[Snapshot], input_ack: int,
+               body: Optional[BitWriter] = None) -> bytes:
+        """Paquete completo: cabecera por cliente + cuerpo"""
+        writer = BitWriter()
+        writer.write(MSG_SNAPSHOT, 8)
+        writer.write(snapshot.tick, 32)
+        writer.write(snapshot.round, 8)
+        writer.write(snapshot.phase, 2)
+        if baseline is None:
+            writer.write(0, 1)
+            writer.write(snapshot.seed, 32)
+        else:
+            writer.write(1, 1)
+            writer.write(snapshot.tick - baseline.tick, 8)
+        writer.write(input_ack & 0xFFFF, 16)
+        writer.extend(body if body is not None else self.encode_body(snapshot, baseline))
+        return writer.to_bytes()
+
+    def decode(self, data: bytes, baselines: Dict[int, Snapshot]) -> Optional[Tuple[Snapshot, int, bool]]:
+        """Devuelve (instantánea, entrada confirmada en 16 bits, era completa) o None si falta la base"""
+        reader = BitReader(data)
+        reader.read(8)
+        tick = reader.read(32)
+        round_number = reader.read(8)
+        phase = reader.read(2)
+        baseline = None
+        if reader.read(1):
+            baseline = baselines.get(tick - reader.read(8))
+            if baseline is None:
+                return None
+            seed = baseline.seed
+        else:
+            seed = reader.read(32)
+        input_ack = reader.read(16)
+
+        base_players = baseline.players if baseline else {}
+        players = {}
+        for slot in range(self.max_players):
+            if reader.read(1):
+                base = base_players.get(slot, self.zero_player)
+                players[slot] = self.read_entity(reader, base, self.player_schema)
+
+        enemies = []
+        for i in range(self.enemy_count):
+            base = baseline.enemies[i] if baseline else self.zero_enemy
+            enemies.append(self.read_entity(reader, base, self.enemy_schema))
+
+        pearls = baseline.pearls if baseline else 0
+        if reader.read(1):
+            pearls = reader.read(self.pearl_count)
+
+        snapshot = Snapshot(tick, round_number, phase, seed, players, tuple(enemies), pearls)
+        return snapshot, input_ack, baseline is None
+
+
+def encode_input(ack_tick: int, newest_seq: int, recent: List[PlayerControls]) -> bytes:
+    """Paquete de entradas: confirmación de instantánea y las últimas entradas (la más nueva primero)"""
+    writer = BitWriter()
+    writer.write(MSG_INPUT, 8)
+    writer.write(ack_tick, 32)
+    writer.write(newest_seq, 32)
+    writer.write(len(recent), 3)
+    for controls in recent:
+        writer.write(controls.left | controls.right << 1 | controls.up << 2 | controls.down << 3, 4)
+    return writer.to_bytes()
+
+
+def decode_input(data: bytes) -> Tuple[int, int, List[PlayerControls]]:
+    reader = BitReader(data)
+    reader.read(8)
+    ack_tick = reader.read(32)
+    newest_seq = reader.read(32)
+    recent = []
+    for _ in range(reader.read(3)):
+        bits = reader.read(4)
+        recent.append(PlayerControls(bool(bits & 1), bool(bits & 2), bool(bits & 4), bool(bits & 8)))
+    return ack_tick, newest_seq, recent
+
+
+# --- Servidor ---
+
+class Diver:
+    """Buzo de un cliente en la partida del servidor"""
+
+    __slots__ = ('player', 'lives', 'score')
+
+    def __init__(self, player: game.Player):
+        self.player = player
+        self.lives = STARTING_LIVES
+        self.score = 0
+
+
+class CoopWorld:
+    """Partida cooperativa autoritativa: las reglas de update_game con varios buzos"""
+
+    RESTART_DELAY = 3 * FPS  # Pausa tras la victoria o la derrota antes de otra ronda
+
+    def __init__(self, config: GameConfig, seed: Optional[int] = None):
+        self.config = config
+        self.rng = random.Random(seed)
+        self.line_of_sight = game.LineOfSight()
+        self.divers: Dict[int, Diver] = {}
+        self.round = -1
+        self.start_round()
+
+    def start_round(self):
+        """Genera un nivel nuevo y reinicia a todos los buzos"""
+        self.round = (self.round + 1) % 256
+        self.seed = self.rng.randrange(2**32)
+        level = generate_level(self.config, self.seed)
+        self.maze = level.maze
+        self.enemies = level.enemies
+        self.pearls = game.PearlStore(level.pearls)
+        self.start_position = (level.player.x, level.player.y)
+        self.phase = GameState.PLAYING
+        self.phase_time = 0
+        for slot in self.divers:
+            self.divers[slot] = self.new_diver()
+
+    def new_diver(self) -> Diver:
+        player = game.Player(*self.start_position, self.config)
+        snap_player(player)
+        return Diver(player)
+
+    def add_diver(self, slot: int):
+        self.divers[slot] = self.new_diver()
+
+    def remove_diver(self, slot: int):
+        self.divers.pop(slot, None)
+
+    def step(self, controls: Dict[int, PlayerControls]):
+        """Avanza un tick con los controles de cada ranura"""
+        if self.phase != GameState.PLAYING:
+            self.phase_time += 1
+            if self.phase_time > self.RESTART_DELAY:
+                self.start_round()
+            return
+
+        # La animación del coral y las partículas son cosa de los clientes
+        active = [diver for diver in self.divers.values() if diver.lives > 0]
+        for slot, diver in self.divers.items():
+            if diver.lives > 0:
+                diver.player.update(self.maze, controls.get(slot, game.IDLE_CONTROLS))
+                snap_player(diver.player)
+
+        # Cada enemigo reacciona al buzo más cercano, si lo ve
+        if active:
+            for enemy in self.enemies:
+                target = min(active, key=lambda diver: (diver.player.x - enemy.x) ** 2
+                                                       + (diver.player.y - enemy.y) ** 2)
+                enemy.sees_player = self.line_of_sight.can_see(self.maze, target.player, [enemy])[0]
+                enemy.update(self.maze, target.player)
+
+        self.pearls.update()
+
+        # Colisiones con perlas: si dos buzos tocan la misma, se la lleva el primero
+        for diver in active:
+            for index in self.pearls.touching(diver.player):
+                pearl = self.pearls.objects[index]
+                diver.score += pearl.points
+                if isinstance(pearl, game.GiantPearl):
+                    diver.player.give_harpoon()
+                self.pearls.collect(index)
+
+        # Colisiones con enemigos
+        for diver in active:
+            for enemy in self.enemies:
+                if diver.player.collides_with(enemy) and diver.player.take_damage():
+                    diver.lives -= 1
+                    break
+
+        # Victoria (todas las perlas recogidas) o derrota (ningún buzo con vidas)
+        if not self.pearls:
+            for diver in self.divers.values():
+                if diver.lives > 0:
+                    diver.score += 1000 + diver.lives * 200
+            self.phase = GameState.VICTORY
+        elif self.divers and all(diver.lives <= 0 for diver in self.divers.values()):
+            self.phase = GameState.GAME_OVER
+
+
+class ClientConnection:
+    """Estado del servidor para un cliente conectado"""
+
+    def __init__(self, address: tuple, slot: int, tick: int):
+        self.address = address
+        self.slot = slot
+        self.inputs = deque()
+        self.last_received_seq = 0
+        self.applied_seq = 0
+        self.controls = game.IDLE_CONTROLS
+        self.acked_tick = 0
+        self.last_heard = tick
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.packets_sent = 0
+        self.full_snapshots = 0
+
+
+class CoopServer:
+    """Servidor autoritativo: recibe entradas, simula a 60 Hz y envía instantáneas a 30 Hz"""
+
+    TIMEOUT_TICKS = 5 * FPS
+    MAX_QUEUED_INPUTS = 8
+
+    def __init__(self, host: str = '127.0.0.1', port: int = DEFAULT_PORT, max_players: int = 8,
+                 config: Optional[GameConfig] = None, seed: Optional[int] = None, loss: float = 0.0):
+        self.config = config or GameConfig()
+        self.max_players = max_players
+        self.codec = SnapshotCodec(self.config, max_players)
+        self.world = CoopWorld(self.config, seed)
+        self.connections: Dict[tuple, ClientConnection] = {}
+        self.history: Dict[int, Snapshot] = {}
+        self.tick_count = 0
+        self.tick_times: List[float] = []  # ms por tick (simulación + envío)
+        self.sim_times: List[float] = []  # ms por tick solo de simulación
+        # Pérdida simulada de paquetes para las pruebas
+        self.loss = loss
+        self.loss_rng = random.Random(seed)
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.address = self.sock.getsockname()
+
+    def send(self, data: bytes, address: tuple) -> int:
+        if self.loss and self.loss_rng.random() < self.loss:
+            return len(data)
+        try:
+            self.sock.sendto(data, address)
+        except OSError as e:
+            print(f"Error enviando a {address}: {e}")
+        return len(data)
+
+    def poll(self):
+        """Procesa todos los datagramas pendientes"""
+        while True:
+            try:
+                data, address = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                continue  # En Windows un puerto cerrado del cliente llega como error
+            if data:
+                self.handle(data, address)
+
+    def handle(self, data: bytes, address: tuple):
+        connection = self.connections.get(address)
+        kind = data[0]
+        if kind == MSG_HELLO:
+            self.handle_hello(data, address, connection)
+        elif connection is None:
+            return
+        elif kind == MSG_INPUT:
+            self.handle_input(connection, data)
+        elif kind == MSG_BYE:
+            self.disconnect(connection)
+
+    def handle_hello(self, data: bytes, address: tuple, connection: Optional[ClientConnection]):
+        if len(data) < 2 or data[1] != PROTOCOL_VERSION:
+            return
+        if connection is None:
+            used = {c.slot for c in self.connections.values()}
+            free = [slot for slot in range(self.max_players) if slot not in used]
+            if not free:
+                self.send(bytes([MSG_FULL]), address)
+                return
+            connection = ClientConnection(address, free[0], self.tick_count)
+            self.connections[address] = connection
+            self.world.add_diver(connection.slot)
+
+        # Se repite si el cliente vuelve a saludar (la bienvenida pudo perderse)
+        welcome = {
+            'slot': connection.slot,
+            'max_players': self.max_players,
+            'config': asdict(self.config),
+            'tick_rate': FPS,
+            'snapshot_interval': SNAPSHOT_INTERVAL
+        }
+        connection.bytes_sent += self.send(bytes([MSG_WELCOME]) + json.dumps(welcome).encode('utf-8'), address)
+
+    def handle_input(self, connection: ClientConnection, data: bytes):
+        connection.bytes_received += len(data)
+        connection.last_heard = self.tick_count
+        ack_tick, newest_seq, recent = decode_input(data)
+        connection.acked_tick = max(connection.acked_tick, ack_tick)
+        # recent va de la más nueva a la más antigua
+        for age in range(len(recent) - 1, -1, -1):
+            seq = newest_seq - age
+            if seq > connection.last_received_seq:
+                connection.inputs.append((seq, recent[age]))
+                connection.last_received_seq = seq
+        while len(connection.inputs) > self.MAX_QUEUED_INPUTS:
+            connection.inputs.popleft()
+
+    def disconnect(self, connection: ClientConnection):
+        self.connections.pop(connection.address, None)
+        self.world.remove_diver(connection.slot)
+
+    def tick(self):
+        """Un tick: aplica una entrada por cliente, simula y envía instantáneas"""
+        start = time.perf_counter()
+        self.tick_count += 1
+
+        controls = {}
+        for connection in list(self.connections.values()):
+            if self.tick_count - connection.last_heard > self.TIMEOUT_TICKS:
+                self.disconnect(connection)
+                continue
+            # Sin entrada nueva se repite la última
+            if connection.inputs:
+                connection.applied_seq, connection.controls = connection.inputs.popleft()
+            controls[connection.slot] = connection.controls
+
+        self.world.step(controls)
+        simulated = time.perf_counter()
+
+        if self.tick_count % SNAPSHOT_INTERVAL == 0:
+            self.broadcast()
+
+        end = time.perf_counter()
+        self.sim_times.append((simulated - start) * 1000)
+        self.tick_times.append((end - start) * 1000)
+
+    def broadcast(self):
+        """Envía a cada cliente la instantánea comprimida contra su última confirmada"""
+        tick = self.tick_count
+        snapshot = self.codec.capture(self.world, tick)
+        self.history[tick] = snapshot
+        self.history.pop(tick - HISTORY_TICKS, None)
+
+        bodies: Dict[Optional[int], BitWriter] = {}
+        for connection in self.connections.values():
+            baseline = self.history.get(connection.acked_tick)
+            if baseline is not None and baseline.round != snapshot.round:
+                baseline = None
+            key = baseline.tick if baseline else None
+            body = bodies.get(key)
+            if body is None:
+                body = bodies[key] = self.codec.encode_body(snapshot, baseline)
+            packet = self.codec.encode(snapshot, baseline, connection.applied_seq, body)
+            connection.bytes_sent += self.send(packet, connection.address)
+            connection.packets_sent += 1
+            if baseline is None:
+                connection.full_snapshots += 1
+
+    def close(self):
+        self.sock.close()
+
+
+# --- Cliente ---
+
+class CoopClient:
+    """Cliente: envía entradas, predice su buzo e interpola al resto"""
+
+    HELLO_INTERVAL = FPS // 2
+
+    def __init__(self, host: str = '127.0.0.1', port: int = DEFAULT_PORT, loss: float = 0.0,
+                 seed: Optional[int] = None):
+        self.server = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.loss = loss
+        self.loss_rng = random.Random(seed)
+
+        self.slot: Optional[int] = None
+        self.rejected = False
+        self.config: Optional[GameConfig] = None
+        self.codec: Optional[SnapshotCodec] = None
+        self.hello_timer = 0
+
+        # Nivel actual, regenerado a partir de la semilla de la ronda
+        self.round: Optional[int] = None
+        self.maze = None
+        self.enemies = []
+        self.pearls = game.PearlStore()
+        self.player: Optional[game.Player] = None
+        self.divers: Dict[int, game.Player] = {}
+        self.camera = game.Camera()
+        self.lives = STARTING_LIVES
+        self.score = 0
+        self.phase = GameState.PLAYING
+
+        # Instantáneas recibidas (bases para decodificar e interpolación)
+        self.snapshots: Dict[int, Snapshot] = {}
+        self.timeline = deque(maxlen=HISTORY_TICKS // SNAPSHOT_INTERVAL)
+        self.latest: Optional[Snapshot] = None
+        self.frames_since_snapshot = 0
+
+        # Predicción
+        self.input_seq = 0
+        self.pending = deque()
+        self.recent = deque(maxlen=MAX_REDUNDANT_INPUTS)
+        self.predicted: Dict[int, Tuple[float, float]] = {}
+
+        # Estadísticas
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.prediction_errors: List[float] = []
+
+    @property
+    def connected(self) -> bool:
+        return self.slot is not None
+
+    def can_play(self) -> bool:
+        """El buzo propio existe, tiene vidas y la ronda está en juego"""
+        return (self.player is not None and self.lives > 0 and self.phase == GameState.PLAYING
+                and self.latest is not None and self.slot in self.latest.players)
+
+    def send(self, data: bytes):
+        self.bytes_sent += len(data)
+        if self.loss and self.loss_rng.random() < self.loss:
+            return
+        try:
+            self.sock.sendto(data, self.server)
+        except OSError as e:
+            print(f"Error enviando al servidor: {e}")
+
+    def poll(self):
+        """Procesa todos los datagramas pendientes"""
+        while True:
+            try:
+                data, _ = self.sock.recvfrom(4096)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            if not data:
+                continue
+            self.bytes_received += len(data)
+            if self.loss and self.loss_rng.random() < self.loss:
+                continue
+            kind = data[0]
+            if kind == MSG_WELCOME and self.slot is None:
+                self.on_welcome(json.loads(data[1:].decode('utf-8')))
+            elif kind == MSG_SNAPSHOT and self.codec is not None:
+                self.on_snapshot(data)
+            elif kind == MSG_FULL:
+                self.rejected = True
+
+    def on_welcome(self, welcome: dict):
+        self.slot = welcome['slot']
+        self.config = GameConfig(**welcome['config'])
+        self.codec = SnapshotCodec(self.config, welcome['max_players'])
+
+    def on_snapshot(self, data: bytes):
+        decoded = self.codec.decode(data, self.snapshots)
+        if decoded is None:
+            return
+        snapshot, input_ack, _ = decoded
+        if self.latest is not None and snapshot.tick <= self.latest.tick:
+            return  # Duplicada o fuera de orden
+
+        if snapshot.round != self.round:
+            self.start_round(snapshot)
+
+        self.snapshots[snapshot.tick] = snapshot
+        self.snapshots.pop(snapshot.tick - HISTORY_TICKS, None)
+        for tick in [t for t in self.snapshots if t < snapshot.tick - HISTORY_TICKS]:
+            del self.snapshots[tick]
+        self.timeline.append(snapshot)
+        self.latest = snapshot
+        self.frames_since_snapshot = 0
+        self.phase = PHASES[snapshot.phase]
+        self.pearls.set_alive_mask(snapshot.pearls)
+
+        own = snapshot.players.get(self.slot)
+        if own is not None:
+            self.lives, self.score = own[7], own[8]
+            # Reconstruir el número de secuencia completo a partir de sus 16 bits
+            ack = self.input_seq - ((self.input_seq - input_ack) & 0xFFFF)
+            self.reconcile(own, ack)
+
+    def start_round(self, snapshot: Snapshot):
+        """Regenera el nivel de la ronda con su semilla"""
+        self.round = snapshot.round
+        level = generate_level(self.config, snapshot.seed)
+        self.maze = level.maze
+        self.enemies = level.enemies
+        self.pearls = game.PearlStore(level.pearls)
+        self.player = level.player
+        self.camera.snap(self.player.x, self.player.y, self.maze)
+        self.divers = {}
+        self.predicted.clear()
+        self.snapshots.clear()
+        self.timeline.clear()
+
+    def reconcile(self, state: tuple, ack: int):
+        """Parte del estado del servidor y repite las entradas que aún no ha aplicado"""
+        predicted = self.predicted.get(ack)
+        # Las animaciones ya avanzaron al predecir; no se repiten
+        swimming, animation = self.player.swimming_animation, self.player.animation_time
+        self.codec.apply_player(self.player, state)
+        if predicted is not None:
+            self.prediction_errors.append(math.hypot(predicted[0] - self.player.x, predicted[1] - self.player.y))
+        for seq in [seq for seq in self.predicted if seq <= ack]:
+            del self.predicted[seq]
+
+        while self.pending and self.pending[0][0] <= ack:
+            self.pending.popleft()
+        if self.phase == GameState.PLAYING and self.lives > 0:
+            for seq, controls in self.pending:
+                self.player.update(self.maze, controls)
+                snap_player(self.player)
+                self.predicted[seq] = (self.player.x, self.player.y)
+        self.player.swimming_animation, self.player.animation_time = swimming, animation
+
+    def update(self, controls: PlayerControls):
+        """Un frame del cliente: predice con la entrada, la envía e interpola"""
+        if self.slot is None:
+            self.hello_timer -= 1
+            if self.hello_timer <= 0:
+                self.send(bytes([MSG_HELLO, PROTOCOL_VERSION]))
+                self.hello_timer = self.HELLO_INTERVAL
+            return
+
+        self.frames_since_snapshot += 1
+        self.input_seq += 1
+        self.recent.appendleft(controls)
+        if self.can_play():
+            self.pending.append((self.input_seq, controls))
+            self.player.update(self.maze, controls)
+            snap_player(self.player)
+            self.predicted[self.input_seq] = (self.player.x, self.player.y)
+
+        ack_tick = self.latest.tick if self.latest else 0
+        self.send(encode_input(ack_tick, self.input_seq, list(self.recent)))
+        self.update_view()
+
+    def update_view(self):
+        """Coloca enemigos y buzos remotos interpolando INTERP_DELAY ticks en el pasado"""
+        if not self.timeline:
+            return
+        render_tick = self.latest.tick + self.frames_since_snapshot - INTERP_DELAY
+        older = newer = None
+        for snapshot in reversed(self.timeline):
+            if snapshot.tick <= render_tick:
+                older = snapshot
+                break
+            newer = snapshot
+        if older is None:
+            older = newer
+        if newer is None or newer is older:
+            newer, t = older, 0.0
+        else:
+            t = (render_tick - older.tick) / (newer.tick - older.tick)
+
+        for enemy, a, b in zip(self.enemies, older.enemies, newer.enemies):
+            enemy.x = (a[0] + (b[0] - a[0]) * t) / POSITION_SCALE
+            enemy.y = (a[1] + (b[1] - a[1]) * t) / POSITION_SCALE
+            enemy.feared = bool(b[2])
+
+        for slot, b in newer.players.items():
+            if slot == self.slot:
+                continue
+            diver = self.divers.get(slot)
+            if diver is None:
+                diver = self.divers[slot] = game.Player(0, 0, self.config)
+            a = older.players.get(slot, b)
+            self.codec.apply_player(diver, b)
+            diver.x = (a[0] + (b[0] - a[0]) * t) / POSITION_SCALE
+            diver.y = (a[1] + (b[1] - a[1]) * t) / POSITION_SCALE
+            if abs(diver.velocity_x) > 0.1 or abs(diver.velocity_y) > 0.1:
+                diver.swim()
+        for slot in [slot for slot in self.divers if slot not in newer.players]:
+            del self.divers[slot]
+
+    def animate(self):
+        """Animaciones puramente visuales que el servidor no envía"""
+        if self.maze is None:
+            return
+        self.camera.follow(self.player.x, self.player.y, self.maze)
+        self.maze.update(self.camera.active_region())
+        self.pearls.update()
+        for enemy in self.enemies:
+            enemy.animate()
+
+    def close(self):
+        if self.slot is not None:
+            self.send(bytes([MSG_BYE]))
+        self.sock.close()
+
+
+# --- Ejecución interactiva ---
+
+def draw_client(screen: pygame.Surface, client: CoopClient, font: pygame.font.Font):
+    """Dibuja la vista del cliente"""
+    screen.fill((0, 0, 0))
+    if client.maze is None:
+        message = "Servidor lleno" if client.rejected else "Conectando..."
+        text = font.render(message, True, COLORS['text_white'])
+        screen.blit(text, text.get_rect(center=screen.get_rect().center))
+        return
+
+    camera = client.camera
+    screen.set_clip(VIEW.rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT))
+    with VIEW.world(camera):
+        client.maze.draw(screen)
+        client.pearls.draw(screen, camera.rect())
+        for obj in client.enemies + list(client.divers.values()):
+            if camera.sees(obj.x, obj.y, 2 * obj.size):
+                obj.draw(screen)
+        if client.lives > 0:
+            client.player.draw(screen)
+    screen.set_clip(None)
+
+    status = (f"Buzo {client.slot + 1}   Puntuación: {client.score:,}   Vidas: {client.lives}   "
+              f"Perlas: {len(client.pearls)}   Buzos: {len(client.divers) + 1}")
+    screen.blit(font.render(status, True, COLORS['text_white']), VIEW.point(20, 10))
+
+    if client.phase != GameState.PLAYING:
+        message = "¡ARRECIFE LIMPIO!" if client.phase == GameState.VICTORY else "TODOS LOS BUZOS HAN CAÍDO"
+        color = COLORS['success_green'] if client.phase == GameState.VICTORY else COLORS['danger_red']
+        text = font.render(message, True, color)
+        screen.blit(text, text.get_rect(center=screen.get_rect().center))
+
+
+def run_client(host: str, port: int):
+    """Cliente con ventana: teclado, predicción e interpolación"""
+    game.init_pygame()
+    display = game.DisplaySettings.from_env()
+    screen = pygame.display.set_mode(display.window_size)
+    pygame.display.set_caption("El Explorador Submarino - Cooperativo")
+    VIEW.fit(screen.get_size())
+    font = pygame.font.Font(None, max(8, round(32 * VIEW.scale)))
+    clock = pygame.time.Clock()
+
+    client = CoopClient(host, port)
+    running = True
+    try:
+        while running:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                    running = False
+
+            client.poll()
+            client.update(PlayerControls.from_keys(pygame.key.get_pressed()))
+            client.animate()
+            draw_client(screen, client, font)
+            pygame.display.flip()
+            clock.tick(FPS)
+    finally:
+        client.close()
+        pygame.quit()
+
+
+def run_server(host: str, port: int, max_players: int, seed: Optional[int]):
+    """Servidor en tiempo real a FPS ticks por segundo"""
+    server = CoopServer(host, port, max_players, seed=seed)
+    print(f"* Servidor cooperativo en {server.address[0]}:{server.address[1]} (hasta {max_players} buzos)")
+    interval = 1 / FPS
+    next_tick = time.perf_counter()
+    try:
+        while True:
+            server.poll()
+            server.tick()
+            next_tick += interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -0.25:
+                next_tick = time.perf_counter()  # Muy retrasado: no intentar recuperar
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if server.tick_times:
+            print(f"\n* {server.tick_count} ticks, {np.mean(server.tick_times):.3f} ms de media por tick")
+
+
+# --- Prueba de carga ---
+
+def load_test(players: int, seconds: float, loss: float, seed: int) -> dict:
+    """Servidor y clientes bot en este proceso, por UDP en 127.0.0.1, avanzando al mismo paso"""
+    server = CoopServer('127.0.0.1', 0, max_players=players, seed=seed, loss=loss)
+    clients = [CoopClient(*server.address, loss=loss, seed=seed + i) for i in range(players)]
+    bots = [game.Autopilot() for _ in clients]
+
+    def frame(controls_for):
+        for client, bot in zip(clients, bots):
+            client.update(controls_for(client, bot))
+        server.poll()
+        server.tick()
+        for client in clients:
+            client.poll()
+
+    # Conexión: esperar a que todos tengan ranura y una instantánea
+    for _ in range(5 * FPS):
+        frame(lambda client, bot: game.IDLE_CONTROLS)
+        if all(client.latest is not None for client in clients):
+            break
+    else:
+        raise RuntimeError("Los clientes no llegaron a conectarse")
+
+    # Medir solo la partida
+    server.tick_times.clear()
+    server.sim_times.clear()
+    for connection in server.connections.values():
+        connection.bytes_sent = connection.bytes_received = connection.packets_sent = connection.full_snapshots = 0
+    for client in clients:
+        client.bytes_sent = 0
+        client.prediction_errors.clear()
+
+    def bot_controls(client: CoopClient, bot: game.Autopilot) -> PlayerControls:
+        if not client.can_play():
+            return game.IDLE_CONTROLS
+        return bot.decide(client.maze, client.player, client.enemies, client.pearls)
+
+    frames = int(seconds * FPS)
+    for _ in range(frames):
+        frame(bot_controls)
+
+    duration = frames / FPS
+    connections = list(server.connections.values())
+    down = [c.bytes_sent / duration for c in connections]
+    down_wire = [(c.bytes_sent + c.packets_sent * UDP_OVERHEAD) / duration for c in connections]
+    up = [client.bytes_sent / duration for client in clients]
+    up_wire = [(client.bytes_sent + frames * UDP_OVERHEAD) / duration for client in clients]
+    errors = np.array([e for client in clients for e in client.prediction_errors] or [0.0])
+    tick_times = np.array(server.tick_times)
+    packets = sum(c.packets_sent for c in connections)
+
+    result = {
+        'players': players,
+        'loss': loss,
+        'seconds': duration,
+        'tick_ms_mean': float(tick_times.mean()),
+        'tick_ms_p99': float(np.percentile(tick_times, 99)),
+        'tick_ms_max': float(tick_times.max()),
+        'sim_ms_mean': float(np.mean(server.sim_times)),
+        'down_bytes_per_s': float(np.mean(down)),
+        'down_wire_bytes_per_s': float(np.mean(down_wire)),
+        'up_bytes_per_s': float(np.mean(up)),
+        'up_wire_bytes_per_s': float(np.mean(up_wire)),
+        'snapshot_bytes_mean': sum(c.bytes_sent for c in connections) / max(1, packets),
+        'full_snapshot_ratio': sum(c.full_snapshots for c in connections) / max(1, packets),
+        'mispredicted_ratio': float((errors > 1 / POSITION_SCALE).mean()),
+        'prediction_error_max_px': float(errors.max()),
+        'rounds': server.world.round + 1
+    }
+
+    for client in clients:
+        client.close()
+    server.close()
+    return result
+
+
+def print_results(results: List[dict]):
+    print(f"{'buzos':>5} {'tick medio':>11} {'tick p99':>9} {'simulación':>11} "
+          f"{'bajada/cliente':>15} {'subida/cliente':>15} {'instant.':>9} {'completas':>10} {'mal predichas':>14}")
+    for r in results:
+        print(f"{r['players']:>5} {r['tick_ms_mean']:>8.3f} ms {r['tick_ms_p99']:>6.3f} ms {r['sim_ms_mean']:>8.3f} ms "
+              f"{r['down_wire_bytes_per_s'] * 8 / 1000:>10.1f} kbps {r['up_wire_bytes_per_s'] * 8 / 1000:>10.1f} kbps "
+              f"{r['snapshot_bytes_mean']:>7.0f} B {r['full_snapshot_ratio']:>9.1%} {r['mispredicted_ratio']:>13.1%}")
+    print("\nAncho de banda con cabeceras IPv4/UDP; 'instant.' es el tamaño medio de la carga de cada instantánea.")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Partidas cooperativas en red de El Explorador Submarino")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    server_parser = subparsers.add_parser('server', help="Servidor autoritativo")
+    server_parser.add_argument('--host', default='0.0.0.0')
+    server_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    server_parser.add_argument('--max-players', type=int, default=8)
+    server_parser.add_argument('--seed', type=int, default=None)
+
+    client_parser = subparsers.add_parser('client', help="Cliente con ventana")
+    client_parser.add_argument('--host', default='127.0.0.1')
+    client_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+
+    load_parser = subparsers.add_parser('loadtest', help="Prueba de carga por la interfaz de loopback")
+    load_parser.add_argument('--players', type=int, nargs='+', default=[2, 8, 32])
+    load_parser.add_argument('--seconds', type=float, default=10.0, help="Tiempo de juego simulado por prueba")
+    load_parser.add_argument('--loss', type=float, default=0.0, help="Probabilidad de perder cada paquete")
+    load_parser.add_argument('--seed', type=int, default=0)
+    load_parser.add_argument('--output', default=None, help="Guardar los resultados en JSON")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'server':
+        run_server(args.host, args.port, args.max_players, args.seed)
+    elif args.command == 'client':
+        run_client(args.host, args.port)
+    else:
+        results = []
+        for players in args.players:
+            print(f"* {players} buzos durante {args.seconds:.0f} s de juego...", file=sys.stderr)
+            results.append(load_test(players, args.seconds, args.loss, args.seed))
+        print_results(results)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+            print(f"\nResultados guardados en {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+"""Prueba de resistencia sin pantalla con detección de fugas y deriva
+
+Recorre en bucle menú, partida, pausa, fin de partida o victoria y reinicio,
+enviando pulsaciones reales a handle_events. El buzo lo lleva el piloto
+automático o una entrada aleatoria. Cada intervalo se toman muestras de RSS,
+objetos de Python, partículas vivas y percentiles del tiempo por frame. Al
+terminar se compara la media de las primeras muestras con la de las últimas y
+la prueba falla si la deriva por hora de alguna métrica supera su límite. Con
+pocas muestras o poco tiempo tras el calentamiento no se juzga.
+
+Ejemplo:
+    python soak_test.py --hours 8 --interval 120 --max-slope rss_mib=4 --output soak.csv
+"""
+import os
+
+# Los drivers deben fijarse antes de importar pygame
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse
+import csv
+import gc
+import json
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pygame
+
+import submarine_explorer as game
+from submarine_explorer import GameState, PlayerControls
+
+# Pendiente máxima por hora de cada métrica (tras el calentamiento)
+DEFAULT_MAX_SLOPES = {
+    'rss_mib': 8.0,
+    'objects': 2000.0,
+    'particles': 50.0,
+    'frame_p95_ms': 0.5,
+    'frame_p99_ms': 1.0
+}
+MIN_WARMUP = 300.0  # s: el primer nivel hace crecer la RSS una vez (cachés, superficies)
+MIN_TREND_SAMPLES = 8  # Muestras tras el calentamiento para juzgar la deriva
+MIN_TREND_SPAN = 1800.0  # s entre la primera y la última de esas muestras
+TREND_WINDOW = 0.25  # Fracción de las muestras en la ventana inicial y en la final
+
+
+def rss_mib() -> float:
+    """Memoria residente del proceso en MiB (NaN si el sistema no la expone)"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return float('nan')
+    # Fuera de Linux solo queda el máximo: sirve para ver si sigue creciendo
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+class RandomPilot:
+    """Entrada aleatoria: mantiene una combinación de direcciones durante unos frames"""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.current = game.IDLE_CONTROLS
+        self.frames_left = 0
+
+    def controls(self, session: game.SubmarineExplorerGame) -> PlayerControls:
+        if self.frames_left <= 0:
+            self.current = PlayerControls(*(self.rng.random() < 0.35 for _ in range(4)))
+            self.frames_left = self.rng.randint(10, 60)
+        self.frames_left -= 1
+        return self.current
+
+
+class InputScript:
+    """Decide qué teclas pulsar en cada frame para recorrer todos los estados"""
+
+    def __init__(self, rng: random.Random, max_game_frames: int, max_level: int):
+        self.rng = rng
+        self.max_game_frames = max_game_frames
+        self.max_level = max_level
+        self.state = None
+        self.wait = 0
+        self.abandon = False
+
+    def keys(self, session: game.SubmarineExplorerGame) -> List[int]:
+        """Teclas del frame actual (casi siempre ninguna)"""
+        state = session.state
+        if state != self.state:
+            self.state = state
+            self.wait = self.rng.randint(20, 120)
+        if state == GameState.PLAYING:
+            return self.playing_keys(session)
+
+        self.wait -= 1
+        if self.wait > 0:
+            return []
+        self.state = None
+        rng = self.rng
+        if state == GameState.MENU:
+            self.abandon = False
+            roll = rng.random()
+            return [pygame.K_i if roll < 0.1 else pygame.K_h if roll < 0.2 else pygame.K_SPACE]
+        if state in (GameState.INSTRUCTIONS, GameState.HIGH_SCORES):
+            return [pygame.K_ESCAPE]
+        if state == GameState.PAUSED:
+            return [pygame.K_m if self.abandon else pygame.K_ESCAPE]
+        if state == GameState.VICTORY:
+            if session.level < self.max_level:
+                return [pygame.K_n]
+            return [rng.choice([pygame.K_r, pygame.K_SPACE])]
+        if state == GameState.GAME_OVER:
+            return [rng.choice([pygame.K_r, pygame.K_SPACE])]
+        return []
+
+    def playing_keys(self, session: game.SubmarineExplorerGame) -> List[int]:
+        if session.game_time > self.max_game_frames:
+            # Partida demasiado larga: se abandona desde la pausa
+            self.abandon = True
+            return [pygame.K_ESCAPE]
+        roll = self.rng.random()
+        if roll < 1 / 3000:
+            return [pygame.K_ESCAPE]
+        if roll < 1 / 1500:
+            return [pygame.K_l]
+        return []
+
+
+def take_sample(session: game.SubmarineExplorerGame, elapsed: float, frame_times: List[float],
+                counters: Dict[str, int]) -> dict:
+    """Fila de métricas del intervalo que acaba de terminar"""
+    gc.collect()
+    times_ms = np.array(frame_times) * 1000 if frame_times else np.zeros(1)
+    p50, p95, p99 = np.percentile(times_ms, [50, 95, 99])
+    return dict({
+        'elapsed_s': round(elapsed, 1),
+        'rss_mib': round(rss_mib(), 2),
+        'objects': len(gc.get_objects()),
+        'particles': len(session.particle_system.particles),
+        'frame_p50_ms': round(float(p50), 3),
+        'frame_p95_ms': round(float(p95), 3),
+        'frame_p99_ms': round(float(p99), 3),
+        'state': session.state.value,
+        'level': session.level
+    }, **counters)
+
+
+def run_soak(seed: int, seconds: float, interval: float, pilot_name: str,
+             max_game_frames: int, max_level: int) -> List[dict]:
+    """Bucle principal de la prueba; devuelve una fila por intervalo"""
+    pygame.init()
+    # Con el hilo que prepara el siguiente nivel, como en una partida con ventana
+    session = game.SubmarineExplorerGame(seed=seed, headless=True, preload_levels=True)
+    rng = random.Random(seed)
+    script = InputScript(rng, max_game_frames, max_level)
+    pilot = game.Autopilot() if pilot_name == 'autopilot' else RandomPilot(rng)
+
+    samples = []
+    frame_times: List[float] = []
+    counters = {'frames': 0, 'games': 0, 'levels': 0, 'transitions': 0}
+    last_state = session.state
+    last_level = 0
+    started = time.perf_counter()
+    next_sample = started + interval
+
+    while True:
+        for key in script.keys(session):
+            pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=key, mod=0, unicode=''))
+
+        frame_start = time.perf_counter()
+        if not session.handle_events():
+            # ESC en el menú cierra el juego; la prueba simplemente sigue
+            session.state = GameState.MENU
+        # El piloto solo conduce: las transiciones de estado van por teclado
+        session.autopilot = pilot if session.state == GameState.PLAYING else None
+        session.update()
+        session.draw()
+        now = time.perf_counter()
+        frame_times.append(now - frame_start)
+
+        counters['frames'] += 1
+        if session.state != last_state:
+            counters['transitions'] += 1
+            last_state = session.state
+            if session.state == GameState.PLAYING:
+                # reset_game pone el reloj a cero; start_level no lo toca
+                new_game = session.game_time <= 1
+                counters['games'] += new_game
+                counters['levels'] += new_game or session.level != last_level
+                last_level = session.level
+
+        if now >= next_sample:
+            samples.append(take_sample(session, now - started, frame_times, counters))
+            frame_times = []
+            next_sample += interval
+            row = samples[-1]
+            print(f"\r  {row['elapsed_s']:8.0f}s  RSS {row['rss_mib']:7.1f} MiB  objetos {row['objects']:7d}  "
+                  f"p95 {row['frame_p95_ms']:6.2f} ms  partidas {row['games']}",
+                  end='', file=sys.stderr, flush=True)
+            if now - started >= seconds:
+                break
+
+    print(file=sys.stderr)
+    session.close()
+    return samples
+
+
+def window_slope(hours: np.ndarray, values: np.ndarray) -> float:
+    """Deriva por hora entre las medias de la ventana inicial y la final
+
+    Menos sensible que una recta ajustada a una muestra ruidosa o a un escalón
+    aislado cerca de los extremos.
+    """
+    window = max(2, round(len(values) * TREND_WINDOW))
+    first, last = slice(None, window), slice(-window, None)
+    return float((values[last].mean() - values[first].mean())
+                 / (hours[last].mean() - hours[first].mean()))
+
+
+def trend_report(samples: List[dict], warmup: float, max_slopes: Dict[str, float]) -> List[dict]:
+    """Deriva por hora de cada métrica tras el calentamiento, frente a su límite
+
+    Sin MIN_TREND_SAMPLES muestras repartidas en MIN_TREND_SPAN segundos la
+    deriva queda sin juzgar (None): extrapolar a una hora unos pocos minutos
+    convierte el ruido en fallos.
+    """
+    rows = [sample for sample in samples if sample['elapsed_s'] >= warmup]
+    report = []
+    for metric, limit in max_slopes.items():
+        values = np.array([row[metric] for row in rows], dtype=float)
+        hours = np.array([row['elapsed_s'] for row in rows], dtype=float) / 3600
+        valid = ~np.isnan(values)
+        values, hours = values[valid], hours[valid]
+        span = float(hours[-1] - hours[0]) * 3600 if len(hours) else 0.0
+        slope = None
+        if len(values) >= MIN_TREND_SAMPLES and span >= MIN_TREND_SPAN:
+            slope = window_slope(hours, values)
+        report.append({
+            'metric': metric,
+            'first': float(values[0]) if len(values) else None,
+            'last': float(values[-1]) if len(values) else None,
+            'samples': len(values),
+            'span_s': round(span, 1),
+            'slope_per_hour': slope,
+            'max_slope': limit,
+            'failed': slope is not None and slope > limit
+        })
+    return report
+
+
+def print_report(report: List[dict]):
+    print(f"{'métrica':<14} {'inicio':>10} {'final':>10} {'deriva/h':>12} {'límite':>10}")
+    for row in report:
+        if row['slope_per_hour'] is None:
+            print(f"{row['metric']:<14} datos insuficientes ({row['samples']} muestras en "
+                  f"{row['span_s']:.0f} s tras el calentamiento; hacen falta {MIN_TREND_SAMPLES} "
+                  f"en {MIN_TREND_SPAN:.0f} s)")
+            continue
+        flag = "  FALLA" if row['failed'] else ""
+        print(f"{row['metric']:<14} {row['first']:10.2f} {row['last']:10.2f} "
+              f"{row['slope_per_hour']:+12.2f} {row['max_slope']:10.2f}{flag}")
+
+
+def write_samples(samples: List[dict], report: List[dict], path: str):
+    if path.lower().endswith('.csv'):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(samples[0].keys()))
+            writer.writeheader()
+            writer.writerows(samples)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'samples': samples, 'trends': report}, f, indent=2, ensure_ascii=False)
+
+
+def parse_slopes(specs: List[str]) -> Dict[str, float]:
+    """Aplica los 'métrica=valor' sobre los límites por defecto"""
+    slopes = dict(DEFAULT_MAX_SLOPES)
+    for spec in specs:
+        name, _, value = spec.partition('=')
+        if name not in slopes:
+            raise ValueError(f"Métrica desconocida '{name}' (válidas: {', '.join(slopes)})")
+        slopes[name] = float(value)
+    return slopes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Prueba de resistencia con detección de fugas y deriva")
+    parser.add_argument('--hours', type=float, default=1.0, help="Duración de la prueba")
+    parser.add_argument('--interval', type=float, default=60.0, help="Segundos entre muestras")
+    parser.add_argument('--warmup', type=float, default=None,
+                        help=f"Segundos iniciales que no cuentan para la tendencia "
+                             f"(por defecto, el 10%% y al menos {MIN_WARMUP:.0f} s)")
+    parser.add_argument('--input', choices=['autopilot', 'random'], default='autopilot')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-game-seconds', type=float, default=120.0,
+                        help="Tiempo de juego tras el que se abandona la partida desde la pausa")
+    parser.add_argument('--max-level', type=int, default=3, help="Último nivel antes de reiniciar")
+    parser.add_argument('--max-slope', action='append', default=[], metavar='MÉTRICA=VALOR',
+                        help=f"Pendiente máxima por hora (repetible; métricas: {', '.join(DEFAULT_MAX_SLOPES)})")
+    parser.add_argument('--output', default=None, help="Guardar las muestras en .csv o .json")
+    args = parser.parse_args(argv)
+
+    max_slopes = parse_slopes(args.max_slope)
+    seconds = args.hours * 3600
+    warmup = max(seconds * 0.1, MIN_WARMUP) if args.warmup is None else args.warmup
+    print(f"* Prueba de resistencia de {args.hours:g} h con entrada '{args.input}' "
+          f"(muestra cada {args.interval:g} s, calentamiento {warmup:.0f} s)")
+
+    samples = run_soak(args.seed, seconds, args.interval, args.input,
+                       int(args.max_game_seconds * game.FPS), args.max_level)
+    last = samples[-1]
+    print(f"* {last['frames']} frames, {last['games']} partidas, {last['levels']} niveles, "
+          f"{last['transitions']} cambios de estado\n")
+
+    report = trend_report(samples, warmup, max_slopes)
+    print_report(report)
+    if args.output:
+        write_samples(samples, report, args.output)
+        print(f"\nMuestras guardadas en {args.output}")
+
+    failed = [row['metric'] for row in report if row['failed']]
+    if failed:
+        print(f"\nDeriva por encima del límite en: {', '.join(failed)}")
+        return 1
+    if all(row['slope_per_hour'] is None for row in report):
+        print("\nDatos insuficientes para juzgar la deriva: hace falta una prueba más larga")
+        return 0
+    print("\nSin deriva por encima de los límites")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
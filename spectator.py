@@ -0,0 +1,476 @@
+"""Modo espectador: retransmite una partida en curso a pantallas que solo la dibujan
+
+Una partida normal publica tras cada tick la diferencia de su estado (posiciones,
+perlas recogidas, puntuación, vidas) a un servidor asyncio que corre en un hilo
+aparte. Cada espectador tiene una cola acotada; si no da abasto se le desconecta,
+así que una pantalla lenta nunca frena el bucle del juego. Los espectadores
+reconstruyen el nivel con la rejilla recibida y dibujan con SubmarineExplorerGame
+sin simular nada.
+
+Uso:
+    python spectator.py host [--port 50556]             # jugar y retransmitir
+    python spectator.py host --demo                      # retransmitir el piloto automático
+    python spectator.py watch [--host 127.0.0.1] [--port 50556]
+"""
+import os
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse
+import asyncio
+import json
+import math
+import socket
+import struct
+import sys
+import threading
+import time
+from dataclasses import asdict
+from typing import Dict, List, NamedTuple, Optional
+
+import pygame
+
+import submarine_explorer as game
+from submarine_explorer import CELL_SIZE, COLORS, FPS, GameConfig, GameState
+from multiplayer import INVULNERABLE_FRAMES, POSITION_SCALE, BitReader, BitWriter, SnapshotCodec, octant
+
+DEFAULT_PORT = 50556
+QUEUE_SIZE = 2 * FPS  # Mensajes pendientes por espectador antes de desconectarlo
+# Con los búferes por defecto (varios MB en loopback) un espectador colgado
+# acumularía minutos de retraso antes de llenar su cola; así son segundos
+SEND_BUFFER = 8 * 1024
+
+MSG_LEVEL, MSG_STATE = 1, 2
+FRAME_HEADER = struct.Struct('<BI')  # Tipo y longitud de cada mensaje del flujo TCP
+
+STATES = list(GameState)
+
+
+class SpectatorState(NamedTuple):
+    """Estado cuantizado que ven los espectadores"""
+    header: tuple  # (estado, puntos, vidas, nivel, tiempo de juego, temblor, demo)
+    player: tuple  # (x, y, octante, arpón, invulnerable)
+    enemies: tuple  # (x, y, huyendo) por enemigo
+    pearls: int  # Máscara de perlas sin recoger
+
+
+class SpectatorCodec:
+    """Codificación por diferencias tick a tick (el flujo es TCP: no hay pérdidas)"""
+
+    def __init__(self, config: GameConfig, enemy_count: int, pearl_count: int):
+        self.enemy_count = enemy_count
+        self.pearl_count = pearl_count
+        x_bits = (config.maze_width * CELL_SIZE * POSITION_SCALE).bit_length()
+        y_bits = (config.maze_height * CELL_SIZE * POSITION_SCALE).bit_length()
+        # (bits del valor completo, bits del delta corto o 0), como en SnapshotCodec
+        self.header_schema = ((3, 0), (24, 0), (4, 0), (8, 0), (32, 4), (5, 0), (1, 0))
+        self.player_schema = ((x_bits, 8), (y_bits, 8), (3, 0),
+                              (max(1, config.harpoon_duration).bit_length(), 5),
+                              (INVULNERABLE_FRAMES.bit_length(), 5))
+        self.enemy_schema = ((x_bits, 8), (y_bits, 8), (1, 0))
+        self.zero_state = SpectatorState((0,) * len(self.header_schema), (0,) * len(self.player_schema),
+                                         ((0,) * len(self.enemy_schema),) * enemy_count, 0)
+
+    def capture(self, session: game.SubmarineExplorerGame) -> SpectatorState:
+        header = (STATES.index(session.state), min(max(0, session.score), (1 << 24) - 1),
+                  min(max(0, session.lives), 15), min(session.level, 255), session.game_time & 0xFFFFFFFF,
+                  min(session.screen_shake, 31), int(session.demo_mode))
+        player = session.player
+        if player is None:
+            return self.zero_state._replace(header=header)
+        player_state = (round(player.x * POSITION_SCALE), round(player.y * POSITION_SCALE),
+                        octant(player.direction), max(0, player.harpoon_time), max(0, player.invulnerable_time))
+        enemies = tuple((round(enemy.x * POSITION_SCALE), round(enemy.y * POSITION_SCALE), int(enemy.feared))
+                        for enemy in session.enemies)
+        return SpectatorState(header, player_state, enemies, session.pearls.alive_mask())
+
+    def encode(self, state: SpectatorState, previous: Optional[SpectatorState]) -> bytes:
+        """Mensaje de estado; sin estado anterior es un fotograma clave"""
+        writer = BitWriter()
+        writer.write(previous is None, 1)
+        base = previous or self.zero_state
+        SnapshotCodec.write_entity(writer, state.header, base.header, self.header_schema)
+        SnapshotCodec.write_entity(writer, state.player, base.player, self.player_schema)
+        for enemy, base_enemy in zip(state.enemies, base.enemies):
+            SnapshotCodec.write_entity(writer, enemy, base_enemy, self.enemy_schema)
+        if state.pearls == base.pearls:
+            writer.write(0, 1)
+        else:
+            writer.write(1, 1)
+            writer.write(state.pearls, self.pearl_count)
+        return frame_message(MSG_STATE, writer.to_bytes())
+
+    def decode(self, payload: bytes, previous: Optional[SpectatorState]) -> Optional[SpectatorState]:
+        """Devuelve None si es una diferencia y no hay estado anterior"""
+        reader = BitReader(payload)
+        if reader.read(1):
+            base = self.zero_state
+        elif previous is None:
+            return None
+        else:
+            base = previous
+        header = SnapshotCodec.read_entity(reader, base.header, self.header_schema)
+        player = SnapshotCodec.read_entity(reader, base.player, self.player_schema)
+        enemies = tuple(SnapshotCodec.read_entity(reader, base_enemy, self.enemy_schema)
+                        for base_enemy in base.enemies)
+        pearls = reader.read(self.pearl_count) if reader.read(1) else base.pearls
+        return SpectatorState(header, player, enemies, pearls)
+
+
+def frame_message(kind: int, payload: bytes) -> bytes:
+    return FRAME_HEADER.pack(kind, len(payload)) + payload
+
+
+def encode_level(session: game.SubmarineExplorerGame) -> bytes:
+    """Rejilla del laberinto y tipo y posición inicial de cada entidad"""
+    level = {'config': asdict(session.level_config), 'grid': None}
+    if session.maze is not None:
+        level.update({
+            'grid': [''.join('1' if wall else '0' for wall in row) for row in session.maze.grid],
+            'player': [session.player.x, session.player.y],
+            'enemies': [[type(enemy).__name__, enemy.x, enemy.y] for enemy in session.enemies],
+            'pearls': [[isinstance(pearl, game.GiantPearl), pearl.x, pearl.base_y]
+                       for pearl in session.pearls.placed()]
+        })
+    return frame_message(MSG_LEVEL, json.dumps(level, separators=(',', ':')).encode('utf-8'))
+
+
+class SpectatorServer:
+    """Servidor asyncio en un hilo propio que reparte el estado a los espectadores
+
+    publish() se llama desde el hilo del juego: codifica la diferencia del tick y
+    la entrega al bucle de asyncio con call_soon_threadsafe, sin esperar nunca.
+    """
+
+    def __init__(self, host: str = '0.0.0.0', port: int = DEFAULT_PORT, queue_size: int = QUEUE_SIZE):
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.address = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.server = None
+
+        # Estado del hilo del juego
+        self.level_maze = None
+        self.level_pearls = []
+        self.codec: Optional[SpectatorCodec] = None
+        self.previous: Optional[SpectatorState] = None
+
+        # Estado del hilo de asyncio
+        self.clients: Dict[asyncio.StreamWriter, asyncio.Queue] = {}
+        self.tasks = set()
+        self.level_message: Optional[bytes] = None
+        self.latest = None  # (codec, estado) para el fotograma clave de los nuevos
+        self.dropped = 0
+        self.messages_published = 0
+
+    def start(self):
+        """Arranca el bucle de asyncio y espera a que el servidor escuche"""
+        ready = threading.Event()
+        errors = []
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            try:
+                self.server = self.loop.run_until_complete(
+                    asyncio.start_server(self.handle_client, self.host, self.port))
+                self.address = self.server.sockets[0].getsockname()
+            except OSError as e:
+                errors.append(e)
+                ready.set()
+                return
+            ready.set()
+            self.loop.run_forever()
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run, name='spectator-server', daemon=True)
+        self.thread.start()
+        ready.wait()
+        if errors:
+            raise errors[0]
+
+    def stop(self):
+        if self.loop is None or not self.loop.is_running():
+            return
+        asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop).result(timeout=5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+
+    async def shutdown(self):
+        self.server.close()
+        for writer in list(self.clients):
+            self.drop(writer, slow=False)
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await self.server.wait_closed()
+
+    def publish(self, session: game.SubmarineExplorerGame):
+        """Listener de tick: envía la diferencia respecto al tick anterior (hilo del juego)"""
+        if self.loop is None or self.loop.is_closed():
+            return
+        level_message = None
+        if session.maze is not self.level_maze or self.codec is None:
+            self.level_maze = session.maze
+            self.level_pearls = session.pearls.placed()
+            self.codec = SpectatorCodec(session.level_config, len(session.enemies), len(self.level_pearls))
+            self.previous = None
+            level_message = encode_level(session)
+
+        state = self.codec.capture(session)
+        if state == self.previous:
+            return
+        message = self.codec.encode(state, self.previous)
+        self.previous = state
+        self.loop.call_soon_threadsafe(self.broadcast, level_message, self.codec, state, message)
+
+    def broadcast(self, level_message: Optional[bytes], codec: SpectatorCodec, state: SpectatorState,
+                  message: bytes):
+        """Encola el mensaje para cada espectador; el que tenga la cola llena se desconecta"""
+        if level_message is not None:
+            self.level_message = level_message
+        self.latest = (codec, state)
+        self.messages_published += 1
+        messages = (level_message, message) if level_message is not None else (message,)
+        for writer, queue in list(self.clients.items()):
+            try:
+                for item in messages:
+                    queue.put_nowait(item)
+            except asyncio.QueueFull:
+                self.drop(writer)
+
+    def drop(self, writer: asyncio.StreamWriter, slow: bool = True):
+        queue = self.clients.pop(writer, None)
+        if queue is None:
+            return
+        if slow:
+            self.dropped += 1
+            print(f"* Espectador {writer.get_extra_info('peername')} desconectado por lento")
+        writer.transport.abort()
+        # Despertar a su tarea si está esperando en la cola
+        try:
+            queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER)
+        writer.transport.set_write_buffer_limits(high=SEND_BUFFER)
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        queue = asyncio.Queue(self.queue_size)
+        # Nivel actual y fotograma clave para empezar sin esperar a un cambio de nivel
+        if self.level_message is not None:
+            queue.put_nowait(self.level_message)
+            codec, state = self.latest
+            queue.put_nowait(codec.encode(state, None))
+        self.clients[writer] = queue
+        try:
+            while True:
+                message = await queue.get()
+                if message is None or self.clients.get(writer) is not queue:
+                    break
+                writer.write(message)
+                await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.clients.pop(writer, None)
+            self.tasks.discard(task)
+            writer.close()
+
+    @property
+    def client_count(self) -> int:
+        return len(self.clients)
+
+
+class SpectatorView:
+    """Aplica el flujo a un SubmarineExplorerGame que solo se dibuja"""
+
+    def __init__(self, session: game.SubmarineExplorerGame):
+        self.session = session
+        self.codec: Optional[SpectatorCodec] = None
+        self.state: Optional[SpectatorState] = None
+        self.level_pearls = []
+
+    def on_level(self, payload: bytes):
+        level = json.loads(payload.decode('utf-8'))
+        session = self.session
+        config = GameConfig(**level['config'])
+        session.config = session.level_config = config
+        session.particle_system.clear()
+        session.minimap_surface = None
+        self.state = None
+        self.level_pearls = []
+        if level['grid'] is None:
+            session.maze = session.player = None
+            session.enemies, session.pearls = [], game.PearlStore()
+        else:
+            grid = [[cell == '1' for cell in row] for row in level['grid']]
+            session.maze = game.Maze(len(grid[0]), len(grid), grid)
+            session.player = game.Player(*level['player'], config)
+            enemy_types = {'Shark': game.Shark, 'Jellyfish': game.Jellyfish}
+            session.enemies = [enemy_types[kind](x, y, config) for kind, x, y in level['enemies']]
+            self.level_pearls = [(game.GiantPearl if giant else game.Pearl)(x, y) for giant, x, y in level['pearls']]
+            session.pearls = game.PearlStore(self.level_pearls)
+            session.camera.snap(session.player.x, session.player.y, session.maze)
+        self.codec = SpectatorCodec(config, len(session.enemies), len(self.level_pearls))
+
+    def on_state(self, payload: bytes):
+        if self.codec is None:
+            return
+        state = self.codec.decode(payload, self.state)
+        if state is None:
+            return
+        self.apply(state, self.state)
+        self.state = state
+
+    def apply(self, state: SpectatorState, previous: Optional[SpectatorState]):
+        session = self.session
+        state_index, session.score, session.lives, session.level, session.game_time, shake, demo = state.header
+        session.state = STATES[state_index]
+        session.screen_shake = shake
+        session.demo_mode = bool(demo)
+
+        player = session.player
+        if player is None:
+            return
+        x, y, direction, harpoon, invulnerable = state.player
+        x, y = x / POSITION_SCALE, y / POSITION_SCALE
+        if (x, y) != (player.x, player.y):
+            player.swim()
+        player.x, player.y = x, y
+        player.direction = direction * math.pi / 4
+        player.harpoon_time, player.has_harpoon = harpoon, harpoon > 0
+        player.invulnerable_time, player.invulnerable = invulnerable, invulnerable > 0
+        player.update_rect()
+
+        for enemy, (enemy_x, enemy_y, feared) in zip(session.enemies, state.enemies):
+            enemy.x, enemy.y = enemy_x / POSITION_SCALE, enemy_y / POSITION_SCALE
+            enemy.feared = bool(feared)
+
+        # Efectos de las perlas recogidas y del daño, reconstruidos a partir del estado
+        if previous is not None and state.pearls != previous.pearls:
+            collected = previous.pearls & ~state.pearls
+            pearls = session.pearls
+            for i, pearl in enumerate(self.level_pearls):
+                if collected >> i & 1:
+                    giant = isinstance(pearl, game.GiantPearl)
+                    color = COLORS['giant_pearl'] if giant else COLORS['pearl_white']
+                    session.particle_system.add_explosion(pearls.x[i], pearls.y[i], color)
+        session.pearls.set_alive_mask(state.pearls)
+        if previous is not None and state.header[2] < previous.header[2]:
+            session.particle_system.add_explosion(player.x, player.y, COLORS['danger_red'])
+
+    def animate(self):
+        """Animaciones visuales que la simulación haría en cada tick"""
+        session = self.session
+        session.update_ambient()
+        session.particle_system.update()
+        if session.maze is None or session.state != GameState.PLAYING:
+            return
+        session.camera.follow(session.player.x, session.player.y, session.maze)
+        session.maze.update(session.camera.active_region())
+        session.pearls.update()
+        for enemy in session.enemies:
+            if isinstance(enemy, game.Jellyfish):
+                enemy.animate(tentacle_step=0.1)
+            else:
+                enemy.animate()
+
+
+async def receive(reader: asyncio.StreamReader, view: SpectatorView):
+    """Lee mensajes del flujo hasta que el servidor cierra"""
+    try:
+        while True:
+            kind, length = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+            payload = await reader.readexactly(length)
+            if kind == MSG_LEVEL:
+                view.on_level(payload)
+            elif kind == MSG_STATE:
+                view.on_state(payload)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+
+
+async def watch(host: str, port: int):
+    """Espectador con ventana: lee el flujo y dibuja a FPS fotogramas por segundo"""
+    session = game.SubmarineExplorerGame()
+    pygame.display.set_caption("El Explorador Submarino - Espectador")
+    view = SpectatorView(session)
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError as e:
+        print(f"Error conectando con {host}:{port}: {e}")
+        session.close()
+        return
+    print(f"* Viendo la partida de {host}:{port}")
+    receiver = asyncio.create_task(receive(reader, view))
+
+    interval = 1 / FPS
+    next_frame = time.perf_counter()
+    running = True
+    while running and not receiver.done():
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                session.frame_stats.toggle_overlay()
+
+        session.frame_stats.begin_frame()
+        view.animate()
+        session.draw()
+        session.frame_stats.end_frame()
+
+        next_frame += interval
+        await asyncio.sleep(max(0.0, next_frame - time.perf_counter()))
+
+    receiver.cancel()
+    writer.close()
+    session.close()
+    pygame.quit()
+
+
+def host_game(host: str, port: int, demo: bool):
+    """Partida normal que además se retransmite"""
+    session = game.SubmarineExplorerGame()
+    server = SpectatorServer(host, port)
+    server.start()
+    print(f"* Retransmitiendo en {server.address[0]}:{server.address[1]}")
+    session.add_tick_listener(server.publish)
+    if demo:
+        session.menu_idle_time = session.ATTRACT_DELAY
+    try:
+        session.run()
+    finally:
+        server.stop()
+        print(f"* {server.messages_published} mensajes publicados, {server.dropped} espectadores desconectados por lentos")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Retransmisión de partidas a espectadores")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    host_parser = subparsers.add_parser('host', help="Jugar y retransmitir la partida")
+    host_parser.add_argument('--host', default='0.0.0.0')
+    host_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    host_parser.add_argument('--demo', action='store_true', help="Empezar con el piloto automático")
+
+    watch_parser = subparsers.add_parser('watch', help="Ver una partida retransmitida")
+    watch_parser.add_argument('--host', default='127.0.0.1')
+    watch_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+
+    args = parser.parse_args(argv)
+    if args.command == 'host':
+        host_game(args.host, args.port, args.demo)
+    else:
+        asyncio.run(watch(args.host, args.port))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
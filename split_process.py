@@ -0,0 +1,714 @@
+"""Simulación en un proceso aparte con el estado en memoria compartida
+
+El proceso de simulación ejecuta un SubmarineExplorerGame sin pantalla (estados,
+update_game, piloto automático) y tras cada tick escribe el estado de las
+entidades en uno de los dos búferes de un bloque multiprocessing.shared_memory,
+organizados como arrays de NumPy. El proceso principal solo lee el teclado,
+manda teclas y direcciones por un búfer circular y dibuja a partir del último
+búfer completo. Los dos procesos generan cada nivel a partir de la
+semilla de la sesión, así que por la memoria compartida solo viajan posiciones,
+banderas y contadores.
+
+Uso:
+    python split_process.py play [--seed 7] [--demo]
+    python split_process.py latency [--seconds 10]   # latencia añadida frente a un solo proceso
+"""
+import os
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse
+import multiprocessing
+import random
+import sys
+import time
+import traceback
+from collections import deque
+from enum import IntEnum
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pygame
+
+import submarine_explorer as game
+from submarine_explorer import COLORS, FPS, GameConfig, GameState, PlayerControls
+
+MAX_LEVEL = 99  # Nivel más alto que cabe en el bloque compartido
+INPUT_CAPACITY = 256  # Entradas pendientes antes de descartar
+ERROR_CAPACITY = 2048  # Bytes del mensaje de error de la simulación
+START_TIMEOUT = 30.0
+LATENCY_INTERVAL = 10  # Frames entre entradas sintéticas de la medición
+
+INPUT_KEY, INPUT_CONTROLS = 1, 2
+
+STATES = list(GameState)
+
+
+class Control(IntEnum):
+    """Campos del array de control"""
+    LATEST = 0  # Búfer con el último tick completo
+    STOP = 1  # El proceso principal pide terminar
+    QUIT = 2  # La simulación ha salido desde el menú
+    FAILED = 3  # La simulación ha terminado con una excepción (mensaje en 'error')
+
+
+class Header(IntEnum):
+    """Campos enteros de la cabecera de cada búfer de estado"""
+    TICK = 0
+    STATE = 1
+    SCORE = 2
+    LIVES = 3
+    LEVEL = 4
+    GENERATION = 5  # Cambia con cada nivel creado, aunque se repita el número
+    GAME_TIME = 6
+    SHAKE = 7
+    DEMO = 8
+    ENEMIES = 9
+    PEARLS = 10
+    INPUT_SEQ = 11  # Última entrada aplicada en este tick
+    INPUT_TIME = 12  # perf_counter_ns en que se envió
+    TICK_TIME = 13  # perf_counter_ns al publicar el tick
+    UPDATE_NS = 14  # Duración del update
+
+
+class PlayerField(IntEnum):
+    X = 0
+    Y = 1
+    DIRECTION = 2
+    HARPOON = 3
+    INVULNERABLE = 4
+
+
+class EnemyField(IntEnum):
+    X = 0
+    Y = 1
+    DIRECTION = 2
+    FEARED = 3
+
+
+def encode_controls(controls: PlayerControls) -> int:
+    return sum(bool(pressed) << i for i, pressed in enumerate(controls))
+
+
+def decode_controls(value: int) -> PlayerControls:
+    return PlayerControls(*(bool(value >> i & 1) for i in range(len(PlayerControls._fields))))
+
+
+class SharedLayout:
+    """Posición de cada array en el bloque compartido
+
+    Control, mensaje de error, búfer circular de entrada y dos búferes de
+    estado. Cada array
+    empieza en una línea de caché propia: los índices que escribe cada proceso
+    no comparten línea.
+    """
+
+    ALIGN = 64
+
+    def __init__(self, enemy_capacity: int, pearl_capacity: int, input_capacity: int = INPUT_CAPACITY):
+        self.capacities = (enemy_capacity, pearl_capacity, input_capacity)
+        self.arrays: Dict[str, Tuple[tuple, np.dtype, int]] = {}
+        self.size = 0
+        self.add('control', (len(Control),), np.int64)
+        self.add('error', (ERROR_CAPACITY,), np.uint8)
+        self.add('input_head', (1,), np.int64)
+        self.add('input_tail', (1,), np.int64)
+        self.add('inputs', (input_capacity, 3), np.int64)  # (tipo, valor, instante de envío)
+        for index in range(2):
+            self.add(f'header{index}', (len(Header),), np.int64)
+            self.add(f'player{index}', (len(PlayerField),), np.float64)
+            self.add(f'enemies{index}', (enemy_capacity, len(EnemyField)), np.float64)
+            self.add(f'pearl_y{index}', (pearl_capacity,), np.float64)
+            self.add(f'pearl_alive{index}', (pearl_capacity,), np.uint8)
+
+    @classmethod
+    def for_config(cls, config: GameConfig, max_level: int = MAX_LEVEL) -> 'SharedLayout':
+        """Capacidades suficientes hasta max_level (los niveles solo añaden entidades)"""
+        last = game.level_config(config, max_level)
+        return cls(last.enemy_count, last.pearl_count + last.giant_pearl_count)
+
+    def add(self, name: str, shape: tuple, dtype):
+        dtype = np.dtype(dtype)
+        offset = -(-self.size // self.ALIGN) * self.ALIGN
+        self.arrays[name] = (shape, dtype, offset)
+        self.size = offset + int(np.prod(shape)) * dtype.itemsize
+
+    def views(self, buffer) -> Dict[str, np.ndarray]:
+        return {name: np.ndarray(shape, dtype, buffer=buffer, offset=offset)
+                for name, (shape, dtype, offset) in self.arrays.items()}
+
+
+class StateFrame:
+    """Estado de un tick: cabecera, buzo, enemigos y perlas como arrays de NumPy"""
+
+    ARRAYS = ('header', 'player', 'enemies', 'pearl_y', 'pearl_alive')
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.header = arrays['header']
+        self.player = arrays['player']
+        self.enemies = arrays['enemies']
+        self.pearl_y = arrays['pearl_y']
+        self.pearl_alive = arrays['pearl_alive']
+
+    @classmethod
+    def allocate(cls, layout: SharedLayout) -> 'StateFrame':
+        """Copia local, fuera de la memoria compartida"""
+        return cls({name: np.zeros(layout.arrays[f'{name}0'][0], layout.arrays[f'{name}0'][1])
+                    for name in cls.ARRAYS})
+
+    def copy_from(self, other: 'StateFrame'):
+        for name in self.ARRAYS:
+            np.copyto(getattr(self, name), getattr(other, name))
+
+    def capture(self, session: game.SubmarineExplorerGame, tick: int, generation: int,
+                input_seq: int, input_time: int, update_ns: int):
+        """Escribe el estado de la sesión; ValueError si el nivel no cabe en el bloque"""
+        enemies = session.enemies
+        pearls = session.pearls
+        if len(enemies) > len(self.enemies) or pearls.used > len(self.pearl_y):
+            raise ValueError(f"El nivel {session.level} no cabe en el bloque compartido "
+                             f"({len(enemies)} enemigos, {pearls.used} perlas)")
+
+        player = session.player
+        if player is not None:
+            self.player[:] = (player.x, player.y, player.direction,
+                              player.harpoon_time, player.invulnerable_time)
+        if enemies:
+            self.enemies[:len(enemies)] = [(enemy.x, enemy.y, enemy.direction, enemy.feared)
+                                           for enemy in enemies]
+        used = pearls.used
+        self.pearl_y[:used] = pearls.y[:used]
+        self.pearl_alive[:used] = pearls.alive[:used]
+
+        header = self.header
+        header[Header.TICK] = tick
+        header[Header.STATE] = STATES.index(session.state)
+        header[Header.SCORE] = session.score
+        header[Header.LIVES] = session.lives
+        header[Header.LEVEL] = session.level
+        header[Header.GENERATION] = generation
+        header[Header.GAME_TIME] = session.game_time
+        header[Header.SHAKE] = session.screen_shake
+        header[Header.DEMO] = session.demo_mode
+        header[Header.ENEMIES] = len(enemies)
+        header[Header.PEARLS] = used
+        header[Header.INPUT_SEQ] = input_seq
+        header[Header.INPUT_TIME] = input_time
+        header[Header.UPDATE_NS] = update_ns
+        header[Header.TICK_TIME] = time.perf_counter_ns()
+
+
+class SharedGame:
+    """Bloque compartido entre el proceso principal y el de simulación
+
+    Estado: doble búfer con un multiprocessing.Lock por búfer. La simulación
+    escribe en el búfer que no es el último y lo publica en Control.LATEST sin
+    soltar su cerrojo; el lector copia el último con su cerrojo tomado. Entrada:
+    búfer circular de un productor y un consumidor con un tercer cerrojo. Los
+    cerrojos son las barreras de memoria entre los dos procesos, así que no
+    depende del orden de las escrituras de cada arquitectura. Como la simulación
+    escribe en el otro búfer, el lector solo espera si tarda un tick entero en
+    copiar.
+    """
+
+    def __init__(self, layout: SharedLayout, memory: shared_memory.SharedMemory, locks: tuple,
+                 owner: bool):
+        self.layout = layout
+        self.memory = memory
+        self.locks = locks  # (búfer 0, búfer 1, entrada)
+        self.owner = owner
+        views = layout.views(memory.buf)
+        self.control = views['control']
+        self.error = views['error']
+        self.input_head = views['input_head']
+        self.input_tail = views['input_tail']
+        self.inputs = views['inputs']
+        self.buffers = [StateFrame({name: views[f'{name}{index}'] for name in StateFrame.ARRAYS})
+                        for index in range(2)]
+        self.dropped_inputs = 0
+
+    @classmethod
+    def create(cls, layout: SharedLayout, context=multiprocessing) -> 'SharedGame':
+        """Bloque nuevo (a ceros) del proceso principal, con cerrojos del contexto del hijo"""
+        locks = tuple(context.Lock() for _ in range(3))
+        return cls(layout, shared_memory.SharedMemory(create=True, size=layout.size), locks, True)
+
+    @classmethod
+    def attach(cls, name: str, layout: SharedLayout, locks: tuple) -> 'SharedGame':
+        return cls(layout, shared_memory.SharedMemory(name=name), locks, False)
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    @property
+    def tick(self) -> int:
+        index = int(self.control[Control.LATEST])
+        with self.locks[index]:
+            return int(self.buffers[index].header[Header.TICK])
+
+    @property
+    def failure(self) -> Optional[str]:
+        """Mensaje de la excepción que ha terminado la simulación (tras salir el proceso)"""
+        if not self.control[Control.FAILED]:
+            return None
+        return self.error.tobytes().rstrip(b'\0').decode('utf-8', 'replace')
+
+    def fail(self, message: str):
+        """Deja el error para el proceso principal (proceso de simulación)"""
+        data = message.encode('utf-8')[-len(self.error):]
+        self.error[:] = 0
+        self.error[:len(data)] = np.frombuffer(data, np.uint8)
+        self.control[Control.FAILED] = 1
+
+    def send(self, kind: int, value: int) -> int:
+        """Encola una entrada (proceso principal); devuelve su número o 0 si no cabe"""
+        with self.locks[2]:
+            head = int(self.input_head[0])
+            if head - int(self.input_tail[0]) >= len(self.inputs):
+                self.dropped_inputs += 1
+                return 0
+            self.inputs[head % len(self.inputs)] = (kind, value, time.perf_counter_ns())
+            self.input_head[0] = head + 1
+        return head + 1
+
+    def receive(self) -> List[Tuple[int, int, int, int]]:
+        """Entradas pendientes (proceso de simulación) como (número, tipo, valor, instante)"""
+        with self.locks[2]:
+            tail = int(self.input_tail[0])
+            head = int(self.input_head[0])
+            capacity = len(self.inputs)
+            entries = [(seq + 1, *self.inputs[seq % capacity].tolist()) for seq in range(tail, head)]
+            self.input_tail[0] = head
+        return entries
+
+    def publish(self, session: game.SubmarineExplorerGame, tick: int, generation: int,
+                input_seq: int, input_time: int, update_ns: int):
+        """Escribe el tick en el búfer libre y lo marca como el último (proceso de simulación)"""
+        # Solo este proceso escribe Control.LATEST
+        index = 1 - int(self.control[Control.LATEST])
+        with self.locks[index]:
+            self.buffers[index].capture(session, tick, generation, input_seq, input_time, update_ns)
+            self.control[Control.LATEST] = index
+
+    def read(self, frame: StateFrame) -> bool:
+        """Copia el último tick completo en frame; False si no hay uno nuevo"""
+        # Un índice desfasado solo da el tick anterior, que también está completo
+        index = int(self.control[Control.LATEST])
+        with self.locks[index]:
+            source = self.buffers[index]
+            if source.header[Header.TICK] == frame.header[Header.TICK]:
+                return False
+            frame.copy_from(source)
+        return True
+
+    def close(self):
+        # Las vistas de NumPy impiden cerrar el bloque
+        self.control = self.error = self.input_head = self.input_tail = self.inputs = None
+        self.buffers = []
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+def simulate(name: str, capacities: Tuple[int, int, int], locks: tuple, seed: int, config: GameConfig,
+             demo: bool):
+    """Proceso de simulación: aplica las entradas, hace un update por tick y publica el estado"""
+    shared = SharedGame.attach(name, SharedLayout(*capacities), locks)
+    session = game.SubmarineExplorerGame(seed, config, headless=True)
+    # Las puntuaciones se guardan aquí; las partículas las genera el proceso principal
+    session.score_manager = game.ScoreManager()
+    session.particle_system = game.ParticleSystem(enabled=False)
+    if demo:
+        session.start_demo()
+
+    controls = game.IDLE_CONTROLS
+    input_seq = input_time = 0
+    tick = generation = 0
+    maze = None
+    interval = 1 / FPS
+    next_tick = time.perf_counter()
+    try:
+        while not shared.control[Control.STOP]:
+            for seq, kind, value, sent in shared.receive():
+                if kind == INPUT_KEY and not session.handle_key(value):
+                    shared.control[Control.QUIT] = 1
+                elif kind == INPUT_CONTROLS:
+                    controls = decode_controls(value)
+                input_seq, input_time = seq, sent
+            if shared.control[Control.QUIT]:
+                break
+
+            start = time.perf_counter_ns()
+            session.update(None if session.autopilot else controls)
+            update_ns = time.perf_counter_ns() - start
+            if session.maze is not maze:
+                maze = session.maze
+                generation += 1
+            tick += 1
+            shared.publish(session, tick, generation, input_seq, input_time, update_ns)
+
+            next_tick += interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -interval:
+                next_tick = time.perf_counter()  # Sin ponerse al día a ráfagas tras un parón
+        if session.state == GameState.VICTORY:
+            session.finish_run(True)
+    except Exception:
+        # Sin esto el proceso principal solo vería que la simulación ha desaparecido
+        shared.fail(traceback.format_exc())
+        raise
+    finally:
+        session.close()
+        shared.close()
+
+
+class SplitView:
+    """Aplica el último tick del proceso de simulación a un SubmarineExplorerGame que solo se dibuja"""
+
+    def __init__(self, session: game.SubmarineExplorerGame, shared: SharedGame):
+        self.session = session
+        self.shared = shared
+        self.frame = StateFrame.allocate(shared.layout)
+        self.generation = 0
+        self.frames = 0
+
+    def sync(self) -> bool:
+        """Aplica el tick más reciente; False si no ha llegado ninguno desde el último frame"""
+        if not self.shared.read(self.frame):
+            return False
+        self.apply()
+        return True
+
+    def apply(self):
+        session = self.session
+        header = self.frame.header.tolist()
+        state = STATES[header[Header.STATE]]
+        previous_lives = session.lives
+        new_level = header[Header.GENERATION] != self.generation
+        if new_level:
+            self.generation = header[Header.GENERATION]
+            session.start_level(header[Header.LEVEL])
+        if state != session.state:
+            # Las puntuaciones las guarda el proceso de simulación
+            session.score_manager.high_scores = session.score_manager.load_scores()
+            if state == GameState.VICTORY:
+                session.sound_bank.play('victory')
+        session.state = state
+        session.score = header[Header.SCORE]
+        session.lives = header[Header.LIVES]
+        session.level = header[Header.LEVEL]
+        session.game_time = header[Header.GAME_TIME]
+        session.screen_shake = header[Header.SHAKE]
+        session.demo_mode = bool(header[Header.DEMO])
+
+        player = session.player
+        if player is None:
+            return
+        x, y, direction, harpoon, invulnerable = self.frame.player.tolist()
+        if (x, y) != (player.x, player.y):
+            player.swim()
+        player.x, player.y, player.direction = x, y, direction
+        player.harpoon_time, player.has_harpoon = int(harpoon), harpoon > 0
+        player.invulnerable_time, player.invulnerable = int(invulnerable), invulnerable > 0
+        player.update_rect()
+
+        count = header[Header.ENEMIES]
+        for enemy, (enemy_x, enemy_y, enemy_direction, feared) in zip(session.enemies,
+                                                                     self.frame.enemies[:count].tolist()):
+            enemy.x, enemy.y, enemy.direction = enemy_x, enemy_y, enemy_direction
+            enemy.feared = bool(feared)
+            enemy.update_rect()
+
+        # Efectos de las perlas recogidas y del daño, reconstruidos a partir del estado
+        pearls = session.pearls
+        used = min(pearls.used, header[Header.PEARLS])
+        alive = self.frame.pearl_alive[:used].astype(bool)
+        if not new_level:
+            for index in np.flatnonzero(pearls.alive[:used] & ~alive).tolist():
+                giant = bool(pearls.kind[index])
+                color = COLORS['giant_pearl'] if giant else COLORS['pearl_white']
+                session.particle_system.add_explosion(pearls.x[index], pearls.y[index], color)
+                session.sound_bank.play('giant_pearl' if giant else 'pearl')
+            if session.lives < previous_lives:
+                session.particle_system.add_explosion(player.x, player.y, COLORS['danger_red'])
+                session.sound_bank.play('damage')
+        pearls.set_alive(alive)
+        pearls.y[:used] = self.frame.pearl_y[:used]
+
+    def animate(self):
+        """Animaciones y partículas que la simulación haría en cada tick"""
+        session = self.session
+        session.update_ambient()
+        session.particle_system.update()
+        if session.maze is None or session.state != GameState.PLAYING:
+            return
+        self.frames += 1
+        session.camera.follow(session.player.x, session.player.y, session.maze)
+        session.maze.update(session.camera.active_region())
+        # Las fases de brillo avanzan aquí; el balanceo es el de la simulación
+        pearls = session.pearls
+        used = min(pearls.used, int(self.frame.header[Header.PEARLS]))
+        pearls.update()
+        pearls.y[:used] = self.frame.pearl_y[:used]
+        for enemy in session.enemies:
+            enemy.animate()
+
+        bubble_pos = session.player.exhale()
+        if bubble_pos and random.random() < 0.3:
+            session.particle_system.add_bubble(bubble_pos[0], bubble_pos[1])
+        if self.frames % session.level_config.bubble_spawn_rate == 0:
+            view = session.camera.rect()
+            session.particle_system.add_bubble(random.randint(view.left, view.right), view.bottom + 10)
+
+
+class LatencyLog:
+    """Latencia de cada entrada hasta el frame que la muestra, en ms
+
+    total = entrada a tick (espera en el búfer circular y update) + tick a
+    pantalla (espera al siguiente frame y dibujo).
+    """
+
+    def __init__(self):
+        self.pending = deque()
+        self.total: List[float] = []
+        self.to_tick: List[float] = []
+        self.to_screen: List[float] = []
+
+    def sent(self, seq: int):
+        if seq:
+            self.pending.append((seq, time.perf_counter_ns()))
+
+    def presented(self, header: np.ndarray):
+        """Llamar tras dibujar el frame con esta cabecera"""
+        now = time.perf_counter_ns()
+        acked = int(header[Header.INPUT_SEQ])
+        tick_time = int(header[Header.TICK_TIME])
+        while self.pending and self.pending[0][0] <= acked:
+            _, sent = self.pending.popleft()
+            self.total.append((now - sent) / 1e6)
+            self.to_tick.append((tick_time - sent) / 1e6)
+            self.to_screen.append((now - tick_time) / 1e6)
+
+    @property
+    def last_ms(self) -> float:
+        return self.total[-1] if self.total else 0.0
+
+
+def percentiles(values: List[float]) -> Tuple[float, float, float]:
+    """Mediana, p95 y máximo (NaN sin muestras)"""
+    if not values:
+        return float('nan'), float('nan'), float('nan')
+    p50, p95 = np.percentile(values, [50, 95])
+    return float(p50), float(p95), float(max(values))
+
+
+def start_simulation(session: game.SubmarineExplorerGame, demo: bool = False
+                     ) -> Tuple[SharedGame, multiprocessing.Process]:
+    """Crea el bloque compartido, arranca la simulación y espera su primer tick"""
+    layout = SharedLayout.for_config(session.config)
+    # spawn: el proceso hijo no hereda el estado de SDL del principal
+    context = multiprocessing.get_context('spawn')
+    shared = SharedGame.create(layout, context)
+    process = context.Process(target=simulate, name='submarine-simulation', daemon=True,
+                              args=(shared.name, layout.capacities, shared.locks, session.seed,
+                                    session.config, demo))
+    try:
+        process.start()
+    except BaseException:
+        shared.close()
+        raise
+    deadline = time.perf_counter() + START_TIMEOUT
+    while shared.tick == 0:
+        if not process.is_alive() or time.perf_counter() > deadline:
+            failure = stop_simulation(shared, process)
+            raise RuntimeError(failure or "El proceso de simulación no ha arrancado")
+        time.sleep(0.01)
+    return shared, process
+
+
+def stop_simulation(shared: SharedGame, process: multiprocessing.Process) -> Optional[str]:
+    """Para la simulación y cierra el bloque; devuelve su error, si ha fallado"""
+    shared.control[Control.STOP] = 1
+    process.join(timeout=5)
+    if process.is_alive():
+        process.terminate()
+        process.join()
+    failure = shared.failure
+    shared.close()
+    return failure
+
+
+def print_latency(label: str, values: List[float]):
+    p50, p95, worst = percentiles(values)
+    print(f"  {label:<26} {p50:7.2f} {p95:7.2f} {worst:7.2f}")
+
+
+def play(seed: Optional[int], demo: bool) -> bool:
+    """Partida con ventana: este proceso lee el teclado y dibuja; el otro simula
+
+    Devuelve False si la simulación ha terminado con un error.
+    """
+    session = game.SubmarineExplorerGame(seed)
+    pygame.display.set_caption("El Explorador Submarino - Simulación en otro proceso")
+    shared, process = start_simulation(session, demo)
+    view = SplitView(session, shared)
+    latency = LatencyLog()
+    stats = session.frame_stats
+    governor = session.quality_governor
+    controls = game.IDLE_CONTROLS
+    print(f"* Simulación en el proceso {process.pid} (semilla {session.seed})")
+
+    running = True
+    try:
+        while running and process.is_alive() and not shared.control[Control.QUIT]:
+            stats.begin_frame()
+            governor.begin_frame()
+            with stats.section('events'):
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        running = False
+                    elif event.type == pygame.KEYDOWN:
+                        # El overlay y la iluminación son solo de dibujo
+                        if event.key == pygame.K_F3:
+                            stats.toggle_overlay()
+                        elif (event.key == pygame.K_l and session.state == GameState.PLAYING
+                              and not session.demo_mode):
+                            session.lighting.toggle()
+                        latency.sent(shared.send(INPUT_KEY, event.key))
+                pressed = PlayerControls.from_keys(pygame.key.get_pressed())
+                if pressed != controls:
+                    controls = pressed
+                    latency.sent(shared.send(INPUT_CONTROLS, encode_controls(controls)))
+            with stats.section('sync'):
+                view.sync()
+            with stats.section('update'):
+                view.animate()
+            with stats.section('draw'):
+                session.draw()
+            latency.presented(view.frame.header)
+            stats.set_gauge('sim.update_ms', view.frame.header[Header.UPDATE_NS] / 1e6)
+            stats.set_gauge('sim.latency_ms', latency.last_ms)
+            governor.end_frame()
+            stats.set_gauge('quality.level', governor.level)
+            stats.end_frame()
+            session.clock.tick(FPS)
+    finally:
+        failure = stop_simulation(shared, process)
+        session.close()
+        pygame.quit()
+
+    if latency.total:
+        print("Latencia entrada → pantalla (ms)    p50     p95    máx")
+        print_latency("total", latency.total)
+        print_latency("entrada → tick", latency.to_tick)
+        print_latency("tick → pantalla", latency.to_screen)
+    if shared.dropped_inputs:
+        print(f"* {shared.dropped_inputs} entradas descartadas con el búfer circular lleno")
+    if failure:
+        print(f"La simulación ha fallado:\n{failure}", file=sys.stderr)
+        return False
+    return True
+
+
+def measure_latency(seconds: float, seed: int) -> Dict[str, List[float]]:
+    """Misma demostración y mismas entradas sintéticas en uno y en dos procesos (sin ventana)
+
+    En un solo proceso la entrada leída al empezar el frame se simula y se dibuja
+    en ese mismo frame; la diferencia con el modo en dos procesos es lo que añade
+    este último. El piloto automático lleva al buzo: las entradas solo se miden.
+    """
+    frames = max(1, round(seconds * FPS))
+    results = {}
+
+    session = game.SubmarineExplorerGame(seed, headless=True)
+    session.start_demo()
+    single, update_ms, draw_ms = [], [], []
+    for frame in range(frames):
+        start = time.perf_counter_ns()
+        session.update()
+        updated = time.perf_counter_ns()
+        session.draw()
+        end = time.perf_counter_ns()
+        update_ms.append((updated - start) / 1e6)
+        draw_ms.append((end - updated) / 1e6)
+        if frame % LATENCY_INTERVAL == 0:
+            single.append((end - start) / 1e6)
+        session.clock.tick(FPS)
+    session.close()
+    results.update({'single': single, 'single.update': update_ms, 'single.draw': draw_ms})
+
+    session = game.SubmarineExplorerGame(seed, headless=True)
+    shared, process = start_simulation(session, demo=True)
+    view = SplitView(session, shared)
+    latency = LatencyLog()
+    draw_ms, sim_ms, repeated = [], [], 0
+    try:
+        for frame in range(frames):
+            if not process.is_alive():
+                break
+            if frame % LATENCY_INTERVAL == 0:
+                direction = PlayerControls(*(i == frame // LATENCY_INTERVAL % 4 for i in range(4)))
+                latency.sent(shared.send(INPUT_CONTROLS, encode_controls(direction)))
+            start = time.perf_counter_ns()
+            if view.sync():
+                sim_ms.append(view.frame.header[Header.UPDATE_NS] / 1e6)
+            else:
+                repeated += 1
+            view.animate()
+            session.draw()
+            draw_ms.append((time.perf_counter_ns() - start) / 1e6)
+            latency.presented(view.frame.header)
+            session.clock.tick(FPS)
+    finally:
+        failure = stop_simulation(shared, process)
+        session.close()
+    if failure:
+        raise RuntimeError(f"La simulación ha fallado:\n{failure}")
+    results.update({'split': latency.total, 'split.to_tick': latency.to_tick,
+                    'split.to_screen': latency.to_screen, 'split.update': sim_ms,
+                    'split.draw': draw_ms, 'split.repeated': [repeated]})
+    return results
+
+
+def print_measurement(results: Dict[str, List[float]], frames: int):
+    print("Latencia entrada → pantalla (ms)    p50     p95    máx")
+    print_latency("un proceso", results['single'])
+    print_latency("dos procesos", results['split'])
+    print_latency("  entrada → tick", results['split.to_tick'])
+    print_latency("  tick → pantalla", results['split.to_screen'])
+    print(f"Añadida (p50): {percentiles(results['split'])[0] - percentiles(results['single'])[0]:+.2f} ms")
+    print("Tiempo por frame (ms)               p50     p95    máx")
+    print_latency("un proceso: update", results['single.update'])
+    print_latency("un proceso: dibujo", results['single.draw'])
+    print_latency("simulación: update", results['split.update'])
+    print_latency("principal: sync + dibujo", results['split.draw'])
+    print(f"Frames sin tick nuevo: {results['split.repeated'][0]} de {frames}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Simulación en un proceso aparte con memoria compartida")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    play_parser = subparsers.add_parser('play', help="Jugar con la simulación en otro proceso")
+    play_parser.add_argument('--seed', type=int, default=None)
+    play_parser.add_argument('--demo', action='store_true', help="Empezar con el piloto automático")
+
+    latency_parser = subparsers.add_parser('latency', help="Medir la latencia añadida (sin ventana)")
+    latency_parser.add_argument('--seconds', type=float, default=10.0)
+    latency_parser.add_argument('--seed', type=int, default=7)
+
+    args = parser.parse_args(argv)
+    if args.command == 'play':
+        return 0 if play(args.seed, args.demo) else 1
+    else:
+        results = measure_latency(args.seconds, args.seed)
+        print_measurement(results, max(1, round(args.seconds * FPS)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
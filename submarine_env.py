@@ -0,0 +1,481 @@
+"""Entorno vectorizado estilo Gym para entrenar agentes en El Explorador Submarino
+
+Avanza N partidas a la vez con las mismas reglas que SubmarineExplorerGame.update_game,
+pero con el estado de todas ellas en arrays de NumPy: no hay objetos por entidad,
+ni pantalla, ni fuentes. Solo la generación de niveles (al reiniciar) usa las
+clases del juego.
+
+    env = SubmarineVecEnv(num_envs=256)
+    obs = env.reset(seed=0)
+    obs, rewards, terminated, truncated, info = env.step(actions)
+
+Los arrays devueltos están preasignados y se reutilizan en cada paso: hay que
+copiarlos si se quieren guardar.
+
+    python submarine_env.py --bench    # pasos de entorno por segundo con N = 1, 16 y 256
+"""
+import os
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse
+import math
+import random
+import sys
+import time
+from typing import Optional
+
+import numpy as np
+
+import submarine_explorer as game
+from submarine_explorer import CELL_SIZE, GameConfig
+
+# Acciones discretas: (izquierda, derecha, arriba, abajo)
+ACTIONS = np.array([
+    (0, 0, 0, 0),  # 0: quieto
+    (0, 0, 1, 0),  # 1: arriba
+    (0, 0, 0, 1),  # 2: abajo
+    (1, 0, 0, 0),  # 3: izquierda
+    (0, 1, 0, 0),  # 4: derecha
+    (1, 0, 1, 0),  # 5: arriba-izquierda
+    (0, 1, 1, 0),  # 6: arriba-derecha
+    (1, 0, 0, 1),  # 7: abajo-izquierda
+    (0, 1, 0, 1),  # 8: abajo-derecha
+], dtype=bool)
+NUM_ACTIONS = len(ACTIONS)
+
+STARTING_LIVES = 3
+PLAYER_SIZE = 24
+INVULNERABLE_FRAMES = 120
+FEAR_DISTANCE = 120
+SIGHT_DISTANCE = 200
+FEAR_FRAMES = 180
+PATROL_RADIUS = 150
+PATCH_RADIUS = 2  # Parche de paredes de 5x5 celdas alrededor del jugador
+
+REWARD_SCALE = 0.1  # Recompensa = puntos * escala - penalización por vida perdida
+DAMAGE_PENALTY = 5.0
+
+
+class SubmarineVecEnv:
+    """N partidas avanzadas en paralelo con arrays de NumPy"""
+
+    def __init__(self, num_envs: int, config: Optional[GameConfig] = None, max_steps: int = 180 * game.FPS):
+        self.num_envs = num_envs
+        self.config = config or GameConfig()
+        self.max_steps = max_steps
+        self.rng = np.random.default_rng()
+
+        n = num_envs
+        e = self.config.enemy_count
+        p = self.config.pearl_count + self.config.giant_pearl_count
+        h, w = self.config.maze_height, self.config.maze_width
+        self.num_enemies = e
+        self.num_pearls = p
+        self.env_index = np.arange(n)
+        # Límites del mundo en unidades lógicas
+        self.world_width = w * CELL_SIZE
+        self.world_height = h * CELL_SIZE
+
+        # Laberintos (con un borde de paredes extra para recortar el parche de observación)
+        self.walls = np.ones((n, h, w), dtype=bool)
+        self.walls_padded = np.ones((n, h + 2 * PATCH_RADIUS, w + 2 * PATCH_RADIUS), dtype=bool)
+
+        # Celdas de cada rayo de visión por desplazamiento (índices planos, rellenados hasta el más largo)
+        reach = SIGHT_DISTANCE // CELL_SIZE + 1
+        rays = [list(game.LineOfSight.ray_cells((0, 0), (ray_x, ray_y)))
+                for ray_y in range(-reach, reach + 1) for ray_x in range(-reach, reach + 1)]
+        longest = max(len(ray) for ray in rays)
+        self.sight_reach = reach
+        self.ray_offsets = np.zeros((len(rays), longest), dtype=np.intp)
+        self.ray_valid = np.zeros((len(rays), longest), dtype=bool)
+        for i, ray in enumerate(rays):
+            self.ray_offsets[i, :len(ray)] = [cell_y * w + cell_x for cell_x, cell_y in ray]
+            self.ray_valid[i, :len(ray)] = True
+
+        # Jugador
+        self.player_x = np.zeros(n)
+        self.player_y = np.zeros(n)
+        self.player_vx = np.zeros(n)
+        self.player_vy = np.zeros(n)
+        self.harpoon_time = np.zeros(n, dtype=np.int32)
+        self.invulnerable_time = np.zeros(n, dtype=np.int32)
+        self.lives = np.zeros(n, dtype=np.int32)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.steps = np.zeros(n, dtype=np.int32)
+
+        # Enemigos
+        self.enemy_x = np.zeros((n, e))
+        self.enemy_y = np.zeros((n, e))
+        self.enemy_last_x = np.zeros((n, e))
+        self.enemy_last_y = np.zeros((n, e))
+        self.enemy_dir = np.zeros((n, e))
+        self.enemy_speed = np.zeros((n, e))
+        self.enemy_size = np.zeros((n, e), dtype=np.int32)
+        self.enemy_is_shark = np.zeros((n, e), dtype=bool)
+        self.enemy_timer = np.zeros((n, e), dtype=np.int32)
+        self.enemy_stuck = np.zeros((n, e), dtype=np.int32)
+        self.enemy_feared = np.zeros((n, e), dtype=bool)
+        self.enemy_fear_timer = np.zeros((n, e), dtype=np.int32)
+        self.patrol_x = np.zeros((n, e))
+        self.patrol_y = np.zeros((n, e))
+
+        # Perlas
+        self.pearl_x = np.zeros((n, p))
+        self.pearl_y = np.zeros((n, p))
+        self.pearl_base_y = np.zeros((n, p))
+        self.pearl_bob_phase = np.zeros((n, p))
+        self.pearl_alive = np.zeros((n, p), dtype=bool)
+        self.pearl_giant = np.zeros((n, p), dtype=bool)
+        giant = np.arange(p) >= self.config.pearl_count
+        self.pearl_giant[:] = giant
+        self.pearl_points = np.where(giant, 50, 10)
+        self.pearl_size = np.where(giant, 24, 14)
+        self.pearl_bob_speed = np.where(giant, 0.03, 0.05)
+        self.pearl_bob_amplitude = np.where(giant, 5.0, 3.0)
+
+        # Salidas preasignadas
+        patch = 2 * PATCH_RADIUS + 1
+        self.observation_size = 7 + 4 * e + 4 * p + patch * patch
+        self.observations = np.zeros((n, self.observation_size), dtype=np.float32)
+        self.rewards = np.zeros(n, dtype=np.float32)
+        self.terminated = np.zeros(n, dtype=bool)
+        self.truncated = np.zeros(n, dtype=bool)
+        self.final_score = np.zeros(n, dtype=np.int64)
+        self.score_delta = np.zeros(n, dtype=np.int64)
+        self.patch_offsets = np.arange(patch)
+
+    # --- Reinicio ---
+
+    def reset(self, seed: Optional[int] = None) -> np.ndarray:
+        """Genera un nivel nuevo en cada entorno y devuelve las observaciones"""
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        for i in range(self.num_envs):
+            self.reset_env(i, None if seed is None else seed + i)
+        self.write_observations()
+        return self.observations
+
+    def reset_env(self, i: int, seed: Optional[int] = None):
+        """Carga en la ranura i un nivel generado con spawn_level"""
+        if seed is not None:
+            random.seed(seed)
+        level = game.spawn_level(self.config)
+
+        self.walls[i] = level.maze.grid
+        self.walls_padded[i, PATCH_RADIUS:-PATCH_RADIUS, PATCH_RADIUS:-PATCH_RADIUS] = self.walls[i]
+
+        player = level.player
+        self.player_x[i] = player.x
+        self.player_y[i] = player.y
+        self.player_vx[i] = 0
+        self.player_vy[i] = 0
+        self.harpoon_time[i] = 0
+        self.invulnerable_time[i] = 0
+        self.lives[i] = STARTING_LIVES
+        self.score[i] = 0
+        self.steps[i] = 0
+
+        for j, enemy in enumerate(level.enemies):
+            self.enemy_x[i, j] = self.enemy_last_x[i, j] = self.patrol_x[i, j] = enemy.x
+            self.enemy_y[i, j] = self.enemy_last_y[i, j] = self.patrol_y[i, j] = enemy.y
+            self.enemy_dir[i, j] = enemy.direction
+            self.enemy_speed[i, j] = enemy.speed
+            self.enemy_size[i, j] = enemy.size
+            self.enemy_is_shark[i, j] = isinstance(enemy, game.Shark)
+            self.enemy_timer[i, j] = enemy.change_direction_timer
+        self.enemy_stuck[i] = 0
+        self.enemy_feared[i] = False
+        self.enemy_fear_timer[i] = 0
+
+        for j, pearl in enumerate(level.pearls):
+            self.pearl_x[i, j] = pearl.x
+            self.pearl_y[i, j] = pearl.y
+            self.pearl_base_y[i, j] = pearl.base_y
+            self.pearl_bob_phase[i, j] = pearl.bob_phase
+        self.pearl_alive[i] = True
+
+    # --- Paso ---
+
+    def step(self, actions: np.ndarray):
+        """Avanza un frame en todos los entornos; los terminados se reinician solos
+
+        Devuelve (observaciones, recompensas, terminados, truncados, info). Para los
+        entornos reiniciados la observación ya es la del nivel nuevo e
+        info['final_score'] guarda la puntuación del episodio que acaba de terminar.
+        """
+        score_before = self.score.copy()
+        lives_before = self.lives.copy()
+
+        self.step_player(np.asarray(actions))
+        self.step_enemies()
+        self.step_pearls()
+        self.resolve_collisions()
+        self.steps += 1
+
+        np.subtract(self.score, score_before, out=self.score_delta)
+        self.rewards[:] = self.score_delta * REWARD_SCALE - (lives_before - self.lives) * DAMAGE_PENALTY
+
+        self.terminated[:] = (self.lives <= 0) | ~self.pearl_alive.any(axis=1)
+        self.truncated[:] = ~self.terminated & (self.steps >= self.max_steps)
+        self.final_score[:] = self.score
+
+        for i in np.flatnonzero(self.terminated | self.truncated):
+            self.reset_env(i)
+
+        self.write_observations()
+        info = {'final_score': self.final_score}
+        return self.observations, self.rewards, self.terminated, self.truncated, info
+
+    def is_wall(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Maze.is_wall vectorizado; x e y tienen forma (N,) o (N, k)"""
+        grid_x = np.floor_divide(x, CELL_SIZE).astype(np.intp)
+        grid_y = np.floor_divide(y, CELL_SIZE).astype(np.intp)
+        height, width = self.walls.shape[1:]
+        inside = (grid_x >= 0) & (grid_x < width) & (grid_y >= 0) & (grid_y < height)
+        env = self.env_index if x.ndim == 1 else self.env_index[:, None]
+        env = np.broadcast_to(env, x.shape)
+        result = np.ones(x.shape, dtype=bool)
+        result[inside] = self.walls[env[inside], grid_y[inside], grid_x[inside]]
+        return result
+
+    def line_of_sight(self, x0: np.ndarray, y0: np.ndarray, x1: np.ndarray, y1: np.ndarray,
+                      candidates: np.ndarray) -> np.ndarray:
+        """LineOfSight.trace vectorizado para pares candidatos a menos de SIGHT_DISTANCE
+
+        Las celdas que cruza la DDA solo dependen del desplazamiento entre las dos
+        celdas, así que se leen de una tabla precalculada y cada par es una sola
+        lectura indexada de self.walls.
+        """
+        result = np.zeros(candidates.shape, dtype=bool)
+        if not candidates.any():
+            return result
+        height, width = self.walls.shape[1:]
+        start_x = np.floor_divide(x0[candidates], CELL_SIZE).astype(np.intp)
+        start_y = np.floor_divide(y0[candidates], CELL_SIZE).astype(np.intp)
+        offset_x = np.floor_divide(x1[candidates], CELL_SIZE).astype(np.intp) - start_x
+        offset_y = np.floor_divide(y1[candidates], CELL_SIZE).astype(np.intp) - start_y
+        reach = self.sight_reach
+        ray = (offset_y + reach) * (2 * reach + 1) + offset_x + reach
+        env = np.broadcast_to(self.env_index[:, None], candidates.shape)[candidates]
+        cells = ((env * height + start_y) * width + start_x)[:, None] + self.ray_offsets[ray]
+        blocked = self.walls.reshape(-1)[cells] & self.ray_valid[ray]
+        result[candidates] = ~blocked.any(axis=1)
+        return result
+
+    def step_player(self, actions: np.ndarray):
+        """Player.update con aceleración suavizada y colisión por ejes"""
+        speed = self.config.player_speed
+        controls = ACTIONS[actions]
+        target_vx = (controls[:, 1].astype(float) - controls[:, 0]) * speed
+        target_vy = (controls[:, 3].astype(float) - controls[:, 2]) * speed
+        diagonal = (target_vx != 0) & (target_vy != 0)
+        target_vx[diagonal] *= 0.707
+        target_vy[diagonal] *= 0.707
+
+        self.player_vx += (target_vx - self.player_vx) * 0.2
+        self.player_vy += (target_vy - self.player_vy) * 0.2
+
+        new_x = self.player_x + self.player_vx
+        blocked = self.is_wall(new_x, self.player_y)
+        self.player_x = np.where(blocked, self.player_x, new_x)
+        self.player_vx[blocked] = 0
+
+        new_y = self.player_y + self.player_vy
+        blocked = self.is_wall(self.player_x, new_y)
+        self.player_y = np.where(blocked, self.player_y, new_y)
+        self.player_vy[blocked] = 0
+
+        half = PLAYER_SIZE // 2
+        np.clip(self.player_x, half, self.world_width - half, out=self.player_x)
+        np.clip(self.player_y, half, self.world_height - half, out=self.player_y)
+
+        self.harpoon_time[self.harpoon_time > 0] -= 1
+        self.invulnerable_time[self.invulnerable_time > 0] -= 1
+
+    def step_enemies(self):
+        """Enemy.update: atascos, patrulla, reacción con visión, rebotes en paredes y bordes"""
+        rng = self.rng
+        shape = self.enemy_x.shape
+        x, y, direction = self.enemy_x, self.enemy_y, self.enemy_dir
+
+        # Atascos
+        still = (np.abs(x - self.enemy_last_x) < 1) & (np.abs(y - self.enemy_last_y) < 1)
+        self.enemy_stuck = np.where(still, self.enemy_stuck + 1, 0)
+        unstick = self.enemy_stuck > 30
+        direction += np.where(unstick, rng.uniform(math.pi / 2, math.pi, shape), 0)
+        self.enemy_stuck[unstick] = 0
+        self.enemy_last_x[:] = x
+        self.enemy_last_y[:] = y
+
+        # Cambios de dirección con tendencia a volver a la zona de patrulla
+        self.enemy_timer -= 1
+        change = self.enemy_timer <= 0
+        if change.any():
+            to_center_x = self.patrol_x - x
+            to_center_y = self.patrol_y - y
+            far = np.hypot(to_center_x, to_center_y) > PATROL_RADIUS
+            home = np.arctan2(to_center_y, to_center_x) + rng.uniform(-0.5, 0.5, shape)
+            wander = direction + rng.uniform(-1, 1, shape)
+            direction[:] = np.where(change, np.where(far, home, wander), direction)
+            self.enemy_timer[change] = rng.integers(60, 181, int(change.sum()))
+
+        # Reacción al jugador solo con línea de visión. Solo se trazan los pares en
+        # los que ver al buzo cambia algo: huir del arpón o, un tiburón, perseguirlo
+        away_x = x - self.player_x[:, None]
+        away_y = y - self.player_y[:, None]
+        distance = np.hypot(away_x, away_y)
+        has_harpoon = (self.harpoon_time > 0)[:, None]
+        reacts = ~self.enemy_feared & np.where(has_harpoon, distance < FEAR_DISTANCE,
+                                               self.enemy_is_shark & (distance < SIGHT_DISTANCE))
+        player_x = np.broadcast_to(self.player_x[:, None], shape)
+        player_y = np.broadcast_to(self.player_y[:, None], shape)
+        sees = self.line_of_sight(x, y, player_x, player_y, reacts)
+
+        # Miedo al arpón
+        scared = sees & has_harpoon & (distance < FEAR_DISTANCE) & ~self.enemy_feared
+        if scared.any():
+            flee = np.arctan2(away_y, away_x) + rng.uniform(-0.3, 0.3, shape)
+            direction[:] = np.where(scared, flee, direction)
+            self.enemy_feared |= scared
+            self.enemy_fear_timer[scared] = FEAR_FRAMES
+        # Los tiburones persiguen al buzo que ven si no lleva el arpón
+        chase = sees & self.enemy_is_shark & ~self.enemy_feared & ~has_harpoon
+        direction[:] = np.where(chase, np.arctan2(-away_y, -away_x), direction)
+        self.enemy_fear_timer[self.enemy_feared] -= 1
+        self.enemy_feared &= self.enemy_fear_timer > 0
+
+        # Movimiento con rebote en las paredes
+        speed = self.enemy_speed * np.where(self.enemy_feared, 2.5, 1.0)
+        new_x = x + np.cos(direction) * speed
+        new_y = y + np.sin(direction) * speed
+
+        blocked = self.is_wall(new_x, y)
+        x[:] = np.where(blocked, x, new_x)
+        direction[:] = np.where(blocked, math.pi - direction + rng.uniform(-0.3, 0.3, shape), direction)
+
+        blocked = self.is_wall(x, new_y)
+        y[:] = np.where(blocked, y, new_y)
+        direction[:] = np.where(blocked, -direction + rng.uniform(-0.3, 0.3, shape), direction)
+
+        # Mantener dentro del laberinto
+        size = self.enemy_size
+        direction[:] = np.where((x <= size) | (x >= self.world_width - size), math.pi - direction, direction)
+        direction[:] = np.where((y <= size) | (y >= self.world_height - size), -direction, direction)
+        np.clip(x, size, self.world_width - size, out=x)
+        np.clip(y, size, self.world_height - size, out=y)
+
+    def step_pearls(self):
+        """Balanceo vertical de las perlas"""
+        self.pearl_bob_phase += self.pearl_bob_speed
+        np.multiply(np.sin(self.pearl_bob_phase), self.pearl_bob_amplitude, out=self.pearl_y)
+        self.pearl_y += self.pearl_base_y
+
+    @staticmethod
+    def rects_overlap(ax, ay, a_size, bx, by, b_size) -> np.ndarray:
+        """Rect.colliderect de rectángulos centrados en posiciones enteras"""
+        a_left = ax.astype(np.int64) - a_size // 2
+        a_top = ay.astype(np.int64) - a_size // 2
+        b_left = bx.astype(np.int64) - b_size // 2
+        b_top = by.astype(np.int64) - b_size // 2
+        return ((a_left < b_left + b_size) & (b_left < a_left + a_size) &
+                (a_top < b_top + b_size) & (b_top < a_top + a_size))
+
+    def resolve_collisions(self):
+        """Recogida de perlas, daño de enemigos y bonus de victoria"""
+        px = self.player_x[:, None]
+        py = self.player_y[:, None]
+
+        collected = self.pearl_alive & self.rects_overlap(
+            px, py, PLAYER_SIZE, self.pearl_x, self.pearl_y, self.pearl_size)
+        if collected.any():
+            self.score += (collected * self.pearl_points).sum(axis=1)
+            got_harpoon = (collected & self.pearl_giant).any(axis=1)
+            self.harpoon_time[got_harpoon] = self.config.harpoon_duration
+            self.pearl_alive &= ~collected
+
+        hit = self.rects_overlap(px, py, PLAYER_SIZE, self.enemy_x, self.enemy_y, self.enemy_size).any(axis=1)
+        damaged = hit & (self.invulnerable_time <= 0)
+        self.lives -= damaged
+        self.invulnerable_time[damaged] = INVULNERABLE_FRAMES
+
+        # La victoria solo cuenta si el jugador sigue vivo
+        cleared = ~self.pearl_alive.any(axis=1) & (self.lives > 0) & collected.any(axis=1)
+        self.score[cleared] += 1000 + self.lives[cleared] * 200
+
+    # --- Observaciones ---
+
+    def write_observations(self):
+        """Rellena el array de observaciones preasignado
+
+        Jugador (7), enemigos relativos al jugador (4 por enemigo), perlas relativas
+        (4 por perla) y un parche 5x5 de paredes centrado en la celda del jugador.
+        """
+        obs = self.observations
+        e4 = 4 * self.num_enemies
+        p4 = 4 * self.num_pearls
+        speed = self.config.player_speed
+
+        obs[:, 0] = self.player_x / self.world_width
+        obs[:, 1] = self.player_y / self.world_height
+        obs[:, 2] = self.player_vx / speed
+        obs[:, 3] = self.player_vy / speed
+        obs[:, 4] = self.harpoon_time / max(1, self.config.harpoon_duration)
+        obs[:, 5] = self.invulnerable_time / INVULNERABLE_FRAMES
+        obs[:, 6] = self.lives / STARTING_LIVES
+
+        enemies = obs[:, 7:7 + e4].reshape(self.num_envs, self.num_enemies, 4)
+        enemies[:, :, 0] = (self.enemy_x - self.player_x[:, None]) / self.world_width
+        enemies[:, :, 1] = (self.enemy_y - self.player_y[:, None]) / self.world_height
+        enemies[:, :, 2] = self.enemy_feared
+        enemies[:, :, 3] = self.enemy_is_shark
+
+        pearls = obs[:, 7 + e4:7 + e4 + p4].reshape(self.num_envs, self.num_pearls, 4)
+        pearls[:, :, 0] = (self.pearl_x - self.player_x[:, None]) / self.world_width
+        pearls[:, :, 1] = (self.pearl_y - self.player_y[:, None]) / self.world_height
+        pearls[:, :, 2] = self.pearl_alive
+        pearls[:, :, 3] = self.pearl_giant
+
+        # Con el borde extra, la celda (cx, cy) del jugador queda en el centro del parche
+        cell_x = (self.player_x // CELL_SIZE).astype(np.intp)
+        cell_y = (self.player_y // CELL_SIZE).astype(np.intp)
+        rows = cell_y[:, None] + self.patch_offsets
+        cols = cell_x[:, None] + self.patch_offsets
+        patch = self.walls_padded[self.env_index[:, None, None], rows[:, :, None], cols[:, None, :]]
+        obs[:, 7 + e4 + p4:] = patch.reshape(self.num_envs, -1)
+
+
+def benchmark(sizes=(1, 16, 256), seconds: float = 2.0):
+    """Mide pasos de entorno por segundo con acciones aleatorias"""
+    print(f"{'N':>5} {'pasos/s':>12} {'entornos·pasos/s':>18}")
+    for num_envs in sizes:
+        env = SubmarineVecEnv(num_envs)
+        env.reset(seed=0)
+        rng = np.random.default_rng(0)
+        actions = rng.integers(0, NUM_ACTIONS, (256, num_envs))
+
+        steps = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < seconds:
+            env.step(actions[steps % len(actions)])
+            steps += 1
+        elapsed = time.perf_counter() - started
+        print(f"{num_envs:>5} {steps / elapsed:>12.0f} {steps * num_envs / elapsed:>18.0f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Entorno vectorizado de El Explorador Submarino")
+    parser.add_argument('--bench', action='store_true', help="Mide el rendimiento con N = 1, 16 y 256")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 16, 256])
+    parser.add_argument('--seconds', type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        benchmark(args.sizes, args.seconds)
+    else:
+        parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,19 +4,39 @@ import math
 import numpy as np
 import json
 import os
-from enum import Enum
-from typing import List, Tuple, Optional
-from dataclasses import dataclass
+import csv
+import gzip
+import io
+import queue
+import struct
+import sys
+import threading
+import time
+import wave
+import zlib
+import cProfile
+import linecache
+import pstats
+import tracemalloc
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from enum import Enum, IntEnum
+from typing import List, Tuple, Optional, Dict, Callable, Iterable, NamedTuple
+from dataclasses import dataclass, asdict, replace
 
-# Inicializar Pygame
-pygame.init()
-pygame.mixer.init()
+def init_pygame():
+    """Inicializa Pygame (pantalla, fuentes y sonido)"""
+    pygame.init()
+    pygame.mixer.init()
 
 # Constantes del juego
+# Resolución lógica: coordenadas de la interfaz (la ventana real se configura con DisplaySettings)
 SCREEN_WIDTH = 1200
 SCREEN_HEIGHT = 800
 FPS = 60
 CELL_SIZE = 40
+CHUNK_CELLS = 8  # Lado en celdas de los bloques en que se divide el laberinto
 
 # Colores temáticos submarinos
 COLORS = {
@@ -64,17 +84,284 @@ class GameConfig:
     maze_width: int = 30
     maze_height: int = 20
 
+@dataclass
+class QualitySettings:
+    """Nivel de detalle visual; el regulador de calidad lo ajusta en tiempo real"""
+    tentacle_segments: int = 5
+    jellyfish_rings: int = 3
+    aura_layers: int = 3
+    pearl_sparkles: int = 6
+    particle_spawn_rate: float = 1.0  # Fracción de partículas que se generan
+    particle_cap: Optional[int] = None  # Máximo de partículas vivas (None = sin límite)
+    coral_animation: bool = True
+    minimap_interval: int = 1  # Frames entre redibujados del mini mapa
+
+    def apply(self, other: 'QualitySettings'):
+        """Copia los valores de otro nivel sin cambiar de objeto"""
+        for name, value in asdict(other).items():
+            setattr(self, name, value)
+
+# Niveles de calidad de mayor a menor detalle (el 0 es el aspecto original)
+QUALITY_LEVELS = [
+    QualitySettings(),
+    QualitySettings(4, 2, 2, 4, 0.75, 1500, True, 2),
+    QualitySettings(3, 1, 1, 3, 0.5, 800, True, 4),
+    QualitySettings(2, 0, 1, 2, 0.35, 400, False, 6),
+    QualitySettings(2, 0, 0, 0, 0.2, 200, False, 10)
+]
+
+# Calidad activa, compartida por todas las rutinas de dibujo
+QUALITY = QualitySettings()
+
+@dataclass
+class DisplaySettings:
+    """Resolución de la ventana y escala del renderizado interno"""
+    window_size: Tuple[int, int] = (SCREEN_WIDTH, SCREEN_HEIGHT)
+    render_scale: float = 1.0  # Resolución interna respecto a la ventana
+    smooth: bool = False  # Escalar a la ventana con smoothscale en lugar de scale
+
+    @property
+    def render_size(self) -> Tuple[int, int]:
+        """Tamaño de la superficie en la que se dibuja el juego"""
+        return (max(1, round(self.window_size[0] * self.render_scale)),
+                max(1, round(self.window_size[1] * self.render_scale)))
+
+    @classmethod
+    def from_env(cls) -> 'DisplaySettings':
+        """Lee SUBMARINE_RESOLUTION (ANCHOxALTO), SUBMARINE_RENDER_SCALE y SUBMARINE_SMOOTH_SCALE"""
+        settings = cls()
+        try:
+            resolution = os.environ.get('SUBMARINE_RESOLUTION')
+            if resolution:
+                width, height = resolution.lower().split('x')
+                settings.window_size = (int(width), int(height))
+            render_scale = os.environ.get('SUBMARINE_RENDER_SCALE')
+            if render_scale:
+                settings.render_scale = min(1.0, max(0.1, float(render_scale)))
+        except ValueError as e:
+            print(f"Error leyendo la resolución: {e}")
+        settings.smooth = os.environ.get('SUBMARINE_SMOOTH_SCALE', '') not in ('', '0')
+        return settings
+
+class Viewport:
+    """Transformación del espacio lógico a píxeles de la superficie de render
+
+    El mundo y la interfaz se describen en un espacio lógico de SCREEN_WIDTH x
+    SCREEN_HEIGHT. La vista lo escala para llenar la superficie de render
+    manteniendo la proporción, con bandas si la proporción es distinta.
+    """
+
+    def __init__(self):
+        self.scale = 1.0
+        self.offset_x = 0
+        self.offset_y = 0
+        # Área lógica visible (la del mundo mientras dura world())
+        self.visible = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+
+    def fit(self, size: Tuple[int, int]):
+        """Ajusta la escala y el desplazamiento a una superficie del tamaño indicado"""
+        self.scale = min(size[0] / SCREEN_WIDTH, size[1] / SCREEN_HEIGHT)
+        # Bandas de un número entero de píxeles: así VIEW.rect redondea igual en toda la vista
+        self.offset_x = round((size[0] - SCREEN_WIDTH * self.scale) / 2)
+        self.offset_y = round((size[1] - SCREEN_HEIGHT * self.scale) / 2)
+
+    def point(self, x: float, y: float) -> Tuple[float, float]:
+        return self.offset_x + x * self.scale, self.offset_y + y * self.scale
+
+    def points(self, points: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+        scale = self.scale
+        return [(self.offset_x + x * scale, self.offset_y + y * scale) for x, y in points]
+
+    def rect(self, x: float, y: float, width: float, height: float) -> pygame.Rect:
+        """Rectángulo en píxeles; los bordes se redondean hacia abajo para que celdas vecinas no dejen huecos"""
+        left = math.floor(self.offset_x + x * self.scale)
+        top = math.floor(self.offset_y + y * self.scale)
+        right = math.floor(self.offset_x + (x + width) * self.scale)
+        bottom = math.floor(self.offset_y + (y + height) * self.scale)
+        return pygame.Rect(left, top, right - left, bottom - top)
+
+    def length(self, value: float) -> float:
+        return value * self.scale
+
+    def line_width(self, value: int) -> int:
+        """Grosor de línea escalado (al menos un píxel)"""
+        return max(1, round(value * self.scale))
+
+    @contextmanager
+    def world(self, camera: 'Camera'):
+        """Dentro del bloque las coordenadas son del mundo, vistas desde la cámara
+
+        El desplazamiento se redondea a píxeles enteros para que los bloques
+        horneados del laberinto encajen con lo que se dibuja directamente.
+        """
+        saved = self.offset_x, self.offset_y, self.visible
+        self.offset_x = round(self.offset_x - camera.x * self.scale)
+        self.offset_y = round(self.offset_y - camera.y * self.scale)
+        self.visible = camera.rect()
+        try:
+            yield
+        finally:
+            self.offset_x, self.offset_y, self.visible = saved
+
+# Vista activa, compartida por todas las rutinas de dibujo
+VIEW = Viewport()
+
+class Camera:
+    """Esquina superior izquierda de la vista en el mundo; sigue al buzo sin salirse del laberinto"""
+
+    SMOOTHING = 0.2  # Fracción de la distancia al objetivo que se recorre por frame
+
+    def __init__(self):
+        self.x = 0.0
+        self.y = 0.0
+
+    def follow(self, x: float, y: float, maze: 'Maze', smoothing: float = SMOOTHING):
+        """Acerca la vista a la centrada en (x, y)"""
+        target_x = min(max(x - SCREEN_WIDTH / 2, 0), max(0, maze.pixel_width - SCREEN_WIDTH))
+        target_y = min(max(y - SCREEN_HEIGHT / 2, 0), max(0, maze.pixel_height - SCREEN_HEIGHT))
+        self.x += (target_x - self.x) * smoothing
+        self.y += (target_y - self.y) * smoothing
+
+    def snap(self, x: float, y: float, maze: 'Maze'):
+        """Centra la vista de golpe (al empezar un nivel)"""
+        self.follow(x, y, maze, 1.0)
+
+    def rect(self) -> pygame.Rect:
+        return pygame.Rect(int(self.x), int(self.y), SCREEN_WIDTH, SCREEN_HEIGHT)
+
+    def active_region(self) -> pygame.Rect:
+        """Zona que se simula: la vista más un bloque de margen por cada lado"""
+        margin = CHUNK_CELLS * CELL_SIZE
+        return self.rect().inflate(2 * margin, 2 * margin)
+
+    def sees(self, x: float, y: float, margin: float = 0) -> bool:
+        """Si algo en el punto (con margin de sprite) cae dentro de la vista"""
+        return (self.x - margin < x < self.x + SCREEN_WIDTH + margin
+                and self.y - margin < y < self.y + SCREEN_HEIGHT + margin)
+
+# Fases y ángulos de animación en punto fijo: TRIG_STEPS pasos por vuelta.
+# Avanzar una fase es una suma entera con máscara y el seno se lee de una tabla.
+TRIG_STEPS = 4096
+TRIG_MASK = TRIG_STEPS - 1
+STEPS_PER_RADIAN = TRIG_STEPS / (2 * math.pi)
+SIN_TABLE = np.sin(np.arange(TRIG_STEPS) / STEPS_PER_RADIAN)
+COS_TABLE = np.cos(np.arange(TRIG_STEPS) / STEPS_PER_RADIAN)
+# Para consultas sueltas: indexar una lista con un int es más rápido que un array
+SIN_LOOKUP = SIN_TABLE.tolist()
+COS_LOOKUP = COS_TABLE.tolist()
+
+def to_steps(radians: float) -> int:
+    """Ángulo en radianes a pasos de tabla"""
+    return round(radians * STEPS_PER_RADIAN) & TRIG_MASK
+
+def steps_array(radians: np.ndarray) -> np.ndarray:
+    """Versión vectorizada de to_steps"""
+    return np.rint(radians * STEPS_PER_RADIAN).astype(np.intp) & TRIG_MASK
+
+def sin_cos(steps: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Senos y cosenos de muchos ángulos en pasos, aunque se salgan de la vuelta"""
+    steps = steps & TRIG_MASK
+    return SIN_TABLE[steps], COS_TABLE[steps]
+
+# Color transparente de los sprites: colorkey con RLE, bastante más rápido de copiar que el alfa
+SPRITE_KEY = (255, 0, 255)
+
+def sprite_surface(width: int, height: int) -> pygame.Surface:
+    """Superficie para un sprite opaco con fondo transparente"""
+    surface = pygame.Surface((width, height))
+    surface.fill(SPRITE_KEY)
+    surface.set_colorkey(SPRITE_KEY, pygame.RLEACCEL)
+    return surface
+
+class RenderLayer(IntEnum):
+    """Capas de la cola de dibujo, de atrás adelante"""
+    PEARLS = 0
+    PEARL_SPARKLES = 1  # Siempre encima de los fotogramas de las perlas
+    ENEMIES = 2
+    PLAYER = 3
+    PARTICLES = 4
+    HUD_PANEL = 5
+    HUD = 6
+    HUD_TEXT = 7
+
+class RenderQueue:
+    """Órdenes de dibujo de un frame, volcadas por capas
+    
+    Los sprites se envían como (capa, superficie, posición en píxeles). Al volcar
+    se descartan los que caen fuera del recorte del destino, se agrupan por
+    textura dentro de cada envío (los envíos de una capa conservan su orden) y
+    cada capa se dibuja con un solo Surface.blits. Lo que se pinta con
+    primitivas (buzo, enemigos, barras) entra como función de dibujo con su
+    rectángulo: se recorta igual y va antes que los sprites de su capa.
+    """
+    
+    def __init__(self):
+        # Por capa, un grupo de sprites por envío
+        self.sprites: Dict[int, List[List[Tuple[pygame.Surface, Tuple[float, float]]]]] = {}
+        self.draws: Dict[int, List[Tuple[pygame.Rect, Callable[[pygame.Surface], None]]]] = {}
+        # Órdenes enviadas y descartadas desde la última llamada a take_counts
+        self.submitted = 0
+        self.culled = 0
+    
+    def submit(self, layer: RenderLayer, surface: pygame.Surface, position: Tuple[float, float]):
+        self.submitted += 1
+        self.sprites.setdefault(layer, []).append([(surface, position)])
+    
+    def submit_many(self, layer: RenderLayer, sprites: List[Tuple[pygame.Surface, Tuple[float, float]]],
+                    culled: int = 0):
+        """Envía varios sprites; culled cuenta los que quien los envía ya descartó (p. ej. con NumPy)"""
+        self.submitted += len(sprites) + culled
+        self.culled += culled
+        if sprites:
+            self.sprites.setdefault(layer, []).append(sprites)
+    
+    def submit_draw(self, layer: RenderLayer, rect: pygame.Rect, draw: Callable[[pygame.Surface], None]):
+        """Envía un dibujo hecho con primitivas que ocupa rect (en píxeles del destino)"""
+        self.submitted += 1
+        self.draws.setdefault(layer, []).append((rect, draw))
+    
+    def flush(self, target: pygame.Surface):
+        """Dibuja y vacía la cola, capa a capa"""
+        bounds = target.get_clip()
+        left, top, right, bottom = bounds.left, bounds.top, bounds.right, bounds.bottom
+        for layer in sorted(self.sprites.keys() | self.draws.keys()):
+            for rect, draw in self.draws.get(layer, ()):
+                if rect.colliderect(bounds):
+                    draw(target)
+                else:
+                    self.culled += 1
+            
+            visible = []
+            for sprites in self.sprites.get(layer, ()):
+                group = [(surface, position) for surface, position in sprites
+                         if position[0] < right and position[1] < bottom
+                         and position[0] + surface.get_width() > left and position[1] + surface.get_height() > top]
+                self.culled += len(sprites) - len(group)
+                group.sort(key=lambda command: id(command[0]))
+                visible.extend(group)
+            if visible:
+                target.blits(visible, False)
+        self.sprites.clear()
+        self.draws.clear()
+    
+    def take_counts(self) -> Tuple[int, int]:
+        """(enviadas, descartadas) desde la última llamada, y pone los contadores a cero"""
+        counts = self.submitted, self.culled
+        self.submitted = self.culled = 0
+        return counts
+
 class ScoreManager:
     """Sistema de gestión de puntuaciones"""
     
-    def __init__(self):
-        self.scores_file = "submarine_high_scores.json"
+    def __init__(self, scores_file: Optional[str] = "submarine_high_scores.json"):
+        # Sin archivo las puntuaciones solo se guardan en memoria
+        self.scores_file = scores_file
         self.high_scores = self.load_scores()
     
     def load_scores(self) -> List[dict]:
         """Carga las puntuaciones desde archivo"""
         try:
-            if os.path.exists(self.scores_file):
+            if self.scores_file and os.path.exists(self.scores_file):
                 with open(self.scores_file, 'r', encoding='utf-8') as f:
                     data = json.load(f)
                     return data.get('scores', [])
@@ -95,6 +382,9 @@ class ScoreManager:
         self.high_scores.sort(key=lambda x: x['score'], reverse=True)
         self.high_scores = self.high_scores[:10]  # Top 10
         
+        if not self.scores_file:
+            return
+        
         try:
             with open(self.scores_file, 'w', encoding='utf-8') as f:
                 json.dump({'scores': self.high_scores}, f, indent=2, ensure_ascii=False)
@@ -109,33 +399,1277 @@ class ScoreManager:
         """Obtiene las mejores puntuaciones"""
         return self.high_scores[:count]
 
+class _TimedSection:
+    """Cronómetro reutilizable de una sección instrumentada"""
+
+    __slots__ = ('stats', 'name', 'start')
+
+    def __init__(self, stats: 'FrameStats', name: str):
+        self.stats = stats
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        totals = self.stats.frame_totals
+        totals[self.name] = totals.get(self.name, 0.0) + elapsed
+        return False
+
+# Contexto vacío compartido: es lo único que cuesta la instrumentación desactivada
+_NO_TIMING = nullcontext()
+
+class FrameStats:
+    """Instrumentación de tiempos por fase con buffers circulares de tamaño fijo"""
+
+    FRAME_BUDGET_MS = 1000 / FPS
+    OVERLAY_REFRESH = 15  # Frames entre recálculos del overlay
+    OVERLAY_WIDTH = 380
+    GRAPH_HEIGHT = 60
+    SECTION_ORDER = {'total': 0, 'events': 1, 'update': 2, 'draw': 3, 'present': 4, 'capture': 5}
+
+    def __init__(self, capacity: int = 600, export_path: Optional[str] = None):
+        self.capacity = capacity
+        self.export_path = export_path
+        self.enabled = export_path is not None
+        self.show_overlay = False
+        self.buffers: Dict[str, np.ndarray] = {}
+        self.frame_totals: Dict[str, float] = {}
+        # Indicadores por frame que no son tiempos (p. ej. el nivel de calidad)
+        self.gauges: Dict[str, np.ndarray] = {}
+        self.frame_gauges: Dict[str, float] = {}
+        self.sections: Dict[str, _TimedSection] = {}
+        self.frames_recorded = 0
+        self.frame_start = 0.0
+        self.overlay_surface = None
+        self.overlay_age = 0
+
+    def section(self, name: str):
+        """Devuelve un contexto que acumula el tiempo de la sección indicada"""
+        if not self.enabled:
+            return _NO_TIMING
+        timer = self.sections.get(name)
+        if timer is None:
+            timer = self.sections[name] = _TimedSection(self, name)
+        return timer
+
+    def set_gauge(self, name: str, value: float):
+        """Registra el valor de un indicador para el frame actual"""
+        if self.enabled:
+            self.frame_gauges[name] = value
+
+    def begin_frame(self):
+        """Marca el inicio de un frame"""
+        if self.enabled:
+            self.frame_totals.clear()
+            self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        """Guarda los tiempos del frame en los buffers circulares (en ms)"""
+        if not self.enabled:
+            return
+        totals = self.frame_totals
+        totals['total'] = time.perf_counter() - self.frame_start
+
+        for name in totals:
+            if name not in self.buffers:
+                self.buffers[name] = np.zeros(self.capacity)
+
+        index = self.frames_recorded % self.capacity
+        for name, buffer in self.buffers.items():
+            buffer[index] = totals.get(name, 0.0) * 1000
+
+        for name, value in self.frame_gauges.items():
+            if name not in self.gauges:
+                self.gauges[name] = np.zeros(self.capacity)
+            self.gauges[name][index] = value
+        self.frames_recorded += 1
+
+    def toggle_overlay(self):
+        """Muestra u oculta el overlay; la medición solo sigue activa si hace falta"""
+        self.show_overlay = not self.show_overlay
+        self.enabled = self.show_overlay or self.export_path is not None
+        self.overlay_surface = None
+
+    def sample_count(self) -> int:
+        """Número de frames válidos en los buffers"""
+        return min(self.frames_recorded, self.capacity)
+
+    def ordered_samples(self, name: str) -> np.ndarray:
+        """Muestras de una sección (o indicador) en orden cronológico"""
+        buffer = self.buffers[name] if name in self.buffers else self.gauges[name]
+        if self.frames_recorded <= self.capacity:
+            return buffer[:self.frames_recorded]
+        return np.roll(buffer, -(self.frames_recorded % self.capacity))
+
+    def section_names(self) -> List[str]:
+        """Nombres de sección ordenados por fase"""
+        def sort_key(name):
+            phase = name.split('.')[0]
+            return (self.SECTION_ORDER.get(phase, len(self.SECTION_ORDER)), '.' in name, name)
+        return sorted(self.buffers, key=sort_key)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Media, p95, p99 y máximo de cada sección en ms"""
+        count = self.sample_count()
+        result = {}
+        if count == 0:
+            return result
+
+        for name in self.section_names():
+            samples = self.buffers[name][:count]
+            p95, p99 = np.percentile(samples, [95, 99])
+            result[name] = {
+                'avg': float(samples.mean()),
+                'p95': float(p95),
+                'p99': float(p99),
+                'max': float(samples.max())
+            }
+        return result
+
+    def draw_overlay(self, screen: pygame.Surface, font: pygame.font.Font):
+        """Dibuja el overlay de tiempos (re-renderizado cada pocos frames)"""
+        self.overlay_age -= 1
+        if self.overlay_surface is None or self.overlay_age <= 0:
+            self.overlay_surface = self.render_overlay(font)
+            self.overlay_age = self.OVERLAY_REFRESH
+
+        overlay_y = screen.get_height() - self.overlay_surface.get_height() - 10
+        screen.blit(self.overlay_surface, (10, overlay_y))
+
+    def render_overlay(self, font: pygame.font.Font) -> pygame.Surface:
+        """Renderiza la tabla de estadísticas y la gráfica de frame time"""
+        summary = self.summary()
+        line_height = font.get_linesize()
+        height = (len(summary) + len(self.gauges) + 1) * line_height + self.GRAPH_HEIGHT + 20
+
+        overlay = pygame.Surface((self.OVERLAY_WIDTH, height))
+        overlay.set_alpha(210)
+        overlay.fill((0, 0, 0))
+
+        # Tabla de estadísticas
+        headers = ["sección", "media", "p95", "p99"]
+        column_x = [8, 190, 250, 310]
+        for header, x in zip(headers, column_x):
+            overlay.blit(font.render(header, True, COLORS['text_gold']), (x, 4))
+
+        for row, (name, stats) in enumerate(summary.items(), start=1):
+            y = 4 + row * line_height
+            color = COLORS['danger_red'] if stats['p95'] > self.FRAME_BUDGET_MS else COLORS['text_white']
+            overlay.blit(font.render(name, True, color), (column_x[0], y))
+            for value, x in zip((stats['avg'], stats['p95'], stats['p99']), column_x[1:]):
+                overlay.blit(font.render(f"{value:.2f}", True, color), (x, y))
+
+        # Indicadores: valor del último frame registrado
+        last_index = (self.frames_recorded - 1) % self.capacity
+        for row, (name, buffer) in enumerate(sorted(self.gauges.items()), start=len(summary) + 1):
+            y = 4 + row * line_height
+            overlay.blit(font.render(name, True, COLORS['text_gold']), (column_x[0], y))
+            overlay.blit(font.render(f"{buffer[last_index]:g}", True, COLORS['text_white']), (column_x[1], y))
+
+        # Gráfica de frame time con línea de presupuesto
+        graph_top = height - self.GRAPH_HEIGHT - 8
+        graph_rect = pygame.Rect(8, graph_top, self.OVERLAY_WIDTH - 16, self.GRAPH_HEIGHT)
+        pygame.draw.rect(overlay, (30, 30, 60), graph_rect)
+
+        graph_max_ms = self.FRAME_BUDGET_MS * 2
+        budget_y = graph_rect.bottom - int(graph_rect.height / 2)
+        pygame.draw.line(overlay, COLORS['success_green'], (graph_rect.left, budget_y), (graph_rect.right, budget_y))
+
+        if 'total' in self.buffers and self.frames_recorded > 1:
+            samples = self.ordered_samples('total')[-graph_rect.width:]
+            xs = graph_rect.right - len(samples) + np.arange(len(samples))
+            ys = graph_rect.bottom - np.minimum(samples / graph_max_ms, 1.0) * (graph_rect.height - 1)
+            points = list(zip(xs.tolist(), ys.astype(int).tolist()))
+            pygame.draw.lines(overlay, COLORS['text_gold'], False, points)
+
+        return overlay
+
+    def export(self, path: str):
+        """Exporta las muestras a CSV (una columna por sección e indicador) o JSON"""
+        names = self.section_names()
+        gauge_names = sorted(self.gauges)
+        try:
+            if path.lower().endswith('.csv'):
+                columns = [self.ordered_samples(name) for name in names + gauge_names]
+                with open(path, 'w', newline='', encoding='utf-8') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(['frame'] + names + gauge_names)
+                    for frame, row in enumerate(zip(*columns)):
+                        writer.writerow([frame] + [f"{value:.4f}" for value in row[:len(names)]]
+                                        + [f"{value:g}" for value in row[len(names):]])
+            else:
+                data = {
+                    'frame_budget_ms': self.FRAME_BUDGET_MS,
+                    'frames_recorded': self.frames_recorded,
+                    'capacity': self.capacity,
+                    'summary': self.summary(),
+                    'samples_ms': {name: self.ordered_samples(name).round(4).tolist() for name in names},
+                    'gauges': {name: self.ordered_samples(name).tolist() for name in gauge_names}
+                }
+                with open(path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=2)
+            print(f"* Tiempos por frame exportados a {path}")
+        except Exception as e:
+            print(f"Error exportando tiempos por frame: {e}")
+
+class QualityGovernor:
+    """Regulador que baja o sube el nivel de detalle según el tiempo de frame medido
+
+    Usa histéresis: baja calidad en cuanto la media de una ventana se acerca al
+    presupuesto, pero solo la recupera tras un margen amplio sostenido. Si una
+    subida provoca otra bajada enseguida, la espera para volver a subir se duplica.
+    """
+
+    WINDOW = 30  # Frames por decisión
+    DEGRADE_RATIO = 0.9  # Bajar calidad por encima del 90% del presupuesto
+    RESTORE_RATIO = 0.6  # Subir calidad solo por debajo del 60%
+    RESTORE_HOLD = 2 * FPS  # Frames de margen sostenido antes de subir
+    MAX_RESTORE_HOLD = 32 * FPS
+    REBOUND_FRAMES = 5 * FPS  # Una bajada tan pronto tras una subida es una oscilación
+    STABLE_FRAMES = 30 * FPS  # Tras este tiempo sin cambios se olvida el historial
+
+    def __init__(self, level: int = 0, enabled: bool = True, budget_ms: float = 1000 / FPS):
+        self.enabled = enabled
+        self.budget_ms = budget_ms
+        self.samples = np.zeros(self.WINDOW)
+        self.sample_index = 0
+        self.frame_start = 0.0
+        self.headroom_frames = 0
+        self.frames_since_change = 0
+        self.restore_hold = self.RESTORE_HOLD
+        self.last_change = 0  # +1 al bajar calidad, -1 al subirla
+        self.level = 0
+        self.set_level(level)
+
+    @property
+    def max_level(self) -> int:
+        return len(QUALITY_LEVELS) - 1
+
+    def set_level(self, level: int):
+        """Aplica un nivel de QUALITY_LEVELS a la calidad global"""
+        self.level = max(0, min(self.max_level, level))
+        QUALITY.apply(QUALITY_LEVELS[self.level])
+
+    def begin_frame(self):
+        """Marca el inicio del trabajo del frame"""
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        """Mide el trabajo del frame (sin la espera del reloj) y decide cada WINDOW frames"""
+        if not self.enabled:
+            return
+        self.record((time.perf_counter() - self.frame_start) * 1000)
+
+    def record(self, frame_ms: float):
+        """Añade una muestra de tiempo de frame en ms"""
+        self.samples[self.sample_index] = frame_ms
+        self.sample_index += 1
+        self.frames_since_change += 1
+        if self.sample_index < self.WINDOW:
+            return
+        self.sample_index = 0
+        self.decide(float(self.samples.mean()))
+
+    def decide(self, average_ms: float):
+        """Aplica la histéresis sobre la media de la última ventana"""
+        if self.frames_since_change > self.STABLE_FRAMES:
+            self.restore_hold = self.RESTORE_HOLD
+
+        if average_ms > self.budget_ms * self.DEGRADE_RATIO:
+            self.headroom_frames = 0
+            if self.level < self.max_level:
+                if self.last_change < 0 and self.frames_since_change < self.REBOUND_FRAMES:
+                    self.restore_hold = min(self.restore_hold * 2, self.MAX_RESTORE_HOLD)
+                self.change_level(+1)
+        elif average_ms < self.budget_ms * self.RESTORE_RATIO and self.level > 0:
+            self.headroom_frames += self.WINDOW
+            if self.headroom_frames >= self.restore_hold:
+                self.change_level(-1)
+        else:
+            self.headroom_frames = 0
+
+    def change_level(self, step: int):
+        self.set_level(self.level + step)
+        self.last_change = step
+        self.frames_since_change = 0
+        self.headroom_frames = 0
+
+class ProfilerCapture:
+    """Captura de cProfile sobre el bucle principal, acotada a un número de frames"""
+
+    DEFAULT_FRAMES = 600  # 10 segundos a 60 FPS
+    SUMMARY_LINES = 40
+
+    def __init__(self, output_dir: str = "profiles"):
+        self.output_dir = output_dir
+        self.profiler = None
+        self.pending_frames = 0
+        self.frames_left = 0
+        self.frames_captured = 0
+        self.start_time = 0.0
+
+    @property
+    def active(self) -> bool:
+        return self.profiler is not None
+
+    def request(self, frames: int = DEFAULT_FRAMES):
+        """Programa una captura que empezará en el siguiente frame"""
+        self.pending_frames = max(1, frames)
+
+    def toggle(self):
+        """Inicia o detiene la captura (tecla de diagnóstico)"""
+        if self.active:
+            self.frames_left = 0
+        else:
+            self.request()
+
+    def begin_frame(self):
+        """Arranca el perfilador en el límite de frame si hay una captura pendiente"""
+        if self.pending_frames and not self.active:
+            self.profiler = cProfile.Profile()
+            try:
+                self.profiler.enable()
+            except ValueError as e:
+                # Otro perfilador ya está activo en este hilo
+                print(f"Error iniciando el perfilador: {e}")
+                self.profiler = None
+                self.pending_frames = 0
+                return
+            self.frames_left = self.pending_frames
+            self.frames_captured = 0
+            self.pending_frames = 0
+            self.start_time = time.perf_counter()
+            print(f"* Capturando perfil durante {self.frames_left} frames...")
+
+    def end_frame(self, metadata_source: Callable[[], dict]):
+        """Cuenta el frame y guarda la captura cuando se agota el presupuesto"""
+        if not self.active:
+            return
+        self.frames_captured += 1
+        self.frames_left -= 1
+        if self.frames_left <= 0:
+            self.stop(metadata_source())
+
+    def stop(self, metadata: dict):
+        """Detiene la captura y escribe el .pstats y el resumen de texto"""
+        if not self.active:
+            return
+        self.profiler.disable()
+        profiler, self.profiler = self.profiler, None
+        elapsed = time.perf_counter() - self.start_time
+
+        base_name = time.strftime("submarine_%Y%m%d_%H%M%S") + f"_seed{metadata.get('seed')}"
+        stats_path = os.path.join(self.output_dir, base_name + ".pstats")
+        summary_path = os.path.join(self.output_dir, base_name + ".txt")
+
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            profiler.dump_stats(stats_path)
+
+            stream = io.StringIO()
+            stats = pstats.Stats(profiler, stream=stream)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.SUMMARY_LINES)
+
+            header = dict(metadata, frames_captured=self.frames_captured,
+                          seconds=round(elapsed, 3), pstats_file=os.path.basename(stats_path))
+            with open(summary_path, 'w', encoding='utf-8') as f:
+                f.write("# Captura de perfil - El Explorador Submarino\n")
+                f.write(json.dumps(header, indent=2, ensure_ascii=False))
+                f.write("\n\n")
+                f.write(stream.getvalue())
+            print(f"* Perfil guardado en {stats_path} ({self.frames_captured} frames)")
+        except Exception as e:
+            print(f"Error guardando el perfil: {e}")
+
+class AllocationTracker:
+    """Seguimiento de asignaciones con tracemalloc sobre una ventana de frames
+
+    Por frame se mide el pico de memoria por encima del inicio del frame (los
+    objetos temporales) y lo que queda vivo al terminar. Los temporales se
+    liberan antes de acabar el frame, así que para atribuirlos a líneas se
+    vigila uno de cada SAMPLE_EVERY frames: un gancho de traza toma una
+    instantánea cada vez que la memoria crece cerca del pico y, al acabar el
+    frame, la última se compara con la del inicio. Desde Python 3.12 el gancho
+    se pone en todos los hilos (también en los del grupo de ParallelUpdater);
+    antes solo en el que llama y en los que arrancan durante el frame, y el
+    informe lo indica en peak_threads. Lo que sigue vivo al
+    cerrar la ventana (cachés, fugas) se atribuye aparte como retenido,
+    comparando las instantáneas inicial y final. Solo cuentan las líneas de
+    los módulos indicados (por defecto, este).
+    """
+
+    DEFAULT_FRAMES = 300
+    TOP_SITES = 15
+    SAMPLE_EVERY = 10
+    # Crecimiento mínimo (bytes, o una décima parte de lo ya crecido) para otra instantánea del pico
+    SAMPLE_STEP = 4096
+    # threading.settrace_all_threads (3.12+) alcanza también a los hilos ya arrancados
+    ALL_THREADS = hasattr(threading, 'settrace_all_threads')
+
+    def __init__(self, output_dir: str = "profiles", sources: Iterable[str] = (__file__,)):
+        self.output_dir = output_dir
+        self.sources = {os.path.abspath(path) for path in sources}
+        # Líneas del propio registro por frame, que no deben salir en el informe
+        self.own_lines = {(method.__code__.co_filename, line)
+                          for method in (self.begin_frame, self.end_frame, self.set_hook, self.watch_calls,
+                                         self.watch_peak, self.attribute_peak)
+                          for *_, line in method.__code__.co_lines() if line}
+        self.pending_frames = 0
+        self.frames_left = 0
+        self.tracing = False
+        self.baseline = None
+        self.frame_start = 0
+        self.frame_peaks = np.zeros(0, dtype=np.int64)
+        self.frame_retained = np.zeros(0, dtype=np.int64)
+        self.frames_recorded = 0
+        self.start_time = 0.0
+        # Frames vigilados: instantánea del inicio, la del pico y lo acumulado por línea
+        self.frame_snapshot = None
+        self.peak_snapshot = None
+        self.peak_threshold = 0
+        # Los hilos de trabajo también llegan al gancho
+        self.peak_lock = threading.Lock()
+        self.sampled_frames = 0
+        self.frames_seen = 0
+        self.sites: Dict[Tuple[str, int], List[int]] = {}
+
+    @property
+    def active(self) -> bool:
+        return self.tracing
+
+    def request(self, frames: int = DEFAULT_FRAMES):
+        """Programa un seguimiento que empezará en el siguiente frame"""
+        self.pending_frames = max(1, frames)
+
+    def toggle(self):
+        """Inicia o detiene el seguimiento (tecla de diagnóstico)"""
+        if self.active:
+            self.frames_left = 0
+        else:
+            self.request()
+
+    def start(self, frames: int) -> bool:
+        """Empieza a trazar ya; devuelve False si tracemalloc estaba en uso"""
+        if tracemalloc.is_tracing():
+            print("Error iniciando el seguimiento de memoria: tracemalloc ya está activo")
+            return False
+        tracemalloc.start()
+        self.tracing = True
+        self.frames_left = frames
+        # Preasignados para que el propio registro no asigne nada en cada frame
+        self.frame_peaks = np.zeros(frames, dtype=np.int64)
+        self.frame_retained = np.zeros(frames, dtype=np.int64)
+        self.reset_window()
+        return True
+
+    def reset_window(self):
+        """Descarta los frames registrados y toma una nueva instantánea de referencia"""
+        self.frames_recorded = 0
+        self.frames_seen = 0
+        self.sampled_frames = 0
+        self.sites = {}
+        self.start_time = time.perf_counter()
+        self.baseline = tracemalloc.take_snapshot()
+
+    def begin_frame(self):
+        """Arranca si hay un seguimiento pendiente y marca el inicio del frame"""
+        if self.pending_frames and not self.active:
+            frames, self.pending_frames = self.pending_frames, 0
+            if self.start(frames):
+                print(f"* Siguiendo asignaciones durante {frames} frames...")
+        if self.active:
+            # Las instantáneas sin filtrar no cuentan en la memoria trazada
+            if (self.frames_seen % self.SAMPLE_EVERY == 0
+                    and sys.gettrace() is None and sys.getprofile() is None):
+                self.frame_snapshot = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            self.frame_start = tracemalloc.get_traced_memory()[0]
+            if self.frame_snapshot is not None:
+                self.peak_snapshot = None
+                self.peak_threshold = self.frame_start + self.SAMPLE_STEP
+                self.set_hook(self.watch_calls)
+
+    def set_hook(self, hook: Optional[Callable]):
+        """Pone (o quita, con None) el gancho de traza en los hilos que se pueda"""
+        if self.ALL_THREADS:
+            threading.settrace_all_threads(hook)
+        else:
+            threading.settrace(hook)
+            sys.settrace(hook)
+
+    def watch_calls(self, frame, event: str, arg):
+        """Gancho de traza de los frames vigilados: solo sigue los retornos de cada función"""
+        if self.frame_snapshot is None:
+            # Hilo arrancado durante un frame vigilado que conserva el gancho (antes de 3.12)
+            return None
+        frame.f_trace_lines = False
+        return self.watch_peak
+
+    def watch_peak(self, frame, event: str, arg):
+        """Al volver de una función sus temporales siguen vivos: instantánea si la memoria ha crecido"""
+        if event == 'return' and tracemalloc.get_traced_memory()[0] >= self.peak_threshold:
+            with self.peak_lock:
+                current = tracemalloc.get_traced_memory()[0]
+                if current >= self.peak_threshold:
+                    self.peak_snapshot = tracemalloc.take_snapshot()
+                    self.peak_threshold = current + max(self.SAMPLE_STEP, (current - self.frame_start) // 10)
+        return self.watch_peak
+
+    def end_frame(self, metadata_source: Optional[Callable[[], dict]] = None):
+        """Registra el frame y guarda el informe cuando se agota la ventana"""
+        if not self.active:
+            return
+        if self.frame_snapshot is not None:
+            self.set_hook(None)
+        current, peak = tracemalloc.get_traced_memory()
+        if self.frames_recorded < len(self.frame_peaks):
+            self.frame_peaks[self.frames_recorded] = peak - self.frame_start
+            self.frame_retained[self.frames_recorded] = current - self.frame_start
+            self.frames_recorded += 1
+        self.frames_seen += 1
+        self.attribute_peak()
+        self.frames_left -= 1
+        if self.frames_left <= 0 and metadata_source is not None:
+            self.stop(metadata_source())
+
+    def attribute_peak(self):
+        """Suma por línea lo que había vivo en el pico del frame vigilado y no al empezarlo"""
+        start, peak = self.frame_snapshot, self.peak_snapshot
+        self.frame_snapshot = self.peak_snapshot = None
+        if start is None:
+            return
+        self.sampled_frames += 1
+        if peak is None:
+            return
+        for diff in self.growth(peak, start):
+            frame = diff.traceback[0]
+            totals = self.sites.setdefault((frame.filename, frame.lineno), [0, 0])
+            totals[0] += diff.count_diff
+            totals[1] += diff.size_diff
+
+    def growth(self, snapshot: tracemalloc.Snapshot, reference: tracemalloc.Snapshot) -> list:
+        """Diferencias por línea que crecen entre dos instantáneas, sin las del propio registro
+        
+        Se comparan las instantáneas completas y se filtran después las líneas: filtrar
+        antes cada traza con filter_traces es mucho más lento.
+        """
+        return [diff for diff in snapshot.compare_to(reference, 'lineno')
+                if (diff.count_diff > 0 or diff.size_diff > 0)
+                and diff.traceback[0].filename in self.sources
+                and (diff.traceback[0].filename, diff.traceback[0].lineno) not in self.own_lines]
+
+    def finish(self) -> dict:
+        """Detiene el trazado y devuelve el informe de la ventana"""
+        if self.frame_snapshot is not None:
+            self.set_hook(None)
+            self.frame_snapshot = self.peak_snapshot = None
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        self.tracing = False
+        baseline, self.baseline = self.baseline, None
+        frames = max(1, self.frames_recorded)
+        sampled = max(1, self.sampled_frames)
+        peaks = self.frame_peaks[:frames] / 1024
+
+        # Temporales: lo vivo en el pico de los frames vigilados, de media por frame
+        temporaries = sorted(self.sites.items(), key=lambda item: item[1][1], reverse=True)
+        sites = []
+        for (filename, lineno), (count, size) in temporaries[:self.TOP_SITES]:
+            sites.append({
+                'site': f"{os.path.basename(filename)}:{lineno}",
+                'code': linecache.getline(filename, lineno).strip(),
+                'blocks_per_frame': round(count / sampled, 3),
+                'kib_per_frame': round(size / 1024 / sampled, 3)
+            })
+
+        # Retenido: lo que sigue vivo al cerrar la ventana, repartido entre los frames
+        diffs = self.growth(snapshot, baseline)
+        diffs.sort(key=lambda diff: diff.size_diff, reverse=True)
+        retained_sites = []
+        for diff in diffs[:self.TOP_SITES]:
+            frame = diff.traceback[0]
+            retained_sites.append({
+                'site': f"{os.path.basename(frame.filename)}:{frame.lineno}",
+                'code': linecache.getline(frame.filename, frame.lineno).strip(),
+                'retained_blocks_per_frame': round(diff.count_diff / frames, 3),
+                'retained_kib_per_frame': round(diff.size_diff / 1024 / frames, 3),
+                'kib_live': round(diff.size / 1024, 3)
+            })
+        return {
+            'frames': self.frames_recorded,
+            'sampled_frames': self.sampled_frames,
+            'peak_threads': 'all' if self.ALL_THREADS else 'main',
+            'seconds': round(time.perf_counter() - self.start_time, 3),
+            'peak_kib_median': round(float(np.median(peaks)), 3),
+            'peak_kib_max': round(float(peaks.max()), 3),
+            'blocks_per_frame': round(sum(count for count, _ in self.sites.values()) / sampled, 3),
+            'kib_per_frame': round(sum(size for _, size in self.sites.values()) / 1024 / sampled, 3),
+            'top_sites': sites,
+            'retained_kib_per_frame': round(float(self.frame_retained[:frames].sum()) / 1024 / frames, 3),
+            'retained_blocks_per_frame': round(sum(diff.count_diff for diff in diffs) / frames, 3),
+            'retained_sites': retained_sites
+        }
+
+    def stop(self, metadata: dict):
+        """Detiene el seguimiento y escribe el informe JSON"""
+        if not self.active:
+            return
+        report = self.finish()
+        path = os.path.join(self.output_dir, time.strftime("submarine_%Y%m%d_%H%M%S")
+                            + f"_seed{metadata.get('seed')}_alloc.json")
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(dict(metadata, allocations=report), f, indent=2, ensure_ascii=False)
+        except Exception as e:
+            print(f"Error guardando el informe de memoria: {e}")
+            return
+
+        print(f"* Asignaciones guardadas en {path} ({report['frames']} frames)")
+        print(f"  pico por frame: {report['peak_kib_median']:.1f} KiB (máx. {report['peak_kib_max']:.1f} KiB), "
+              f"retenido: {report['retained_kib_per_frame']:.2f} KiB/frame")
+        threads = "" if report['peak_threads'] == 'all' else "; sin los hilos de trabajo ya arrancados"
+        print(f"  temporales en el pico ({report['sampled_frames']} frames vigilados{threads}):")
+        for site in report['top_sites'][:5]:
+            print(f"  {site['site']:<28} {site['kib_per_frame']:8.2f} KiB/frame  {site['code']}")
+
+class FrameCapture:
+    """Acceso sin copia al frame compuesto como array de NumPy
+    
+    Sin tamaño ni escala de grises, el array es una vista de la propia pantalla
+    del juego, válida hasta el siguiente draw(). Las variantes reducidas o en
+    grises se renderizan directamente en una superficie preasignada del tamaño
+    final y se exponen también como vista; si la anterior aún está en uso, la
+    siguiente captura escribe en una superficie nueva en lugar de pisarla.
+    """
+    
+    def __init__(self, source: pygame.Surface, size: Optional[Tuple[int, int]] = None,
+                 grayscale: bool = False, smooth: bool = False):
+        self.source = source
+        self.size = tuple(size) if size else source.get_size()
+        self.grayscale = grayscale
+        self.smooth = smooth
+        # A tamaño completo y en color no hace falta superficie propia
+        self.direct = not grayscale and self.size == source.get_size()
+        # Intermedio reducido, solo para pasar a grises después
+        self.scaled = None
+        if grayscale and self.size != source.get_size():
+            self.scaled = self.new_surface()
+        self.output = None if self.direct else self.new_surface()
+        self.array = None
+    
+    def new_surface(self) -> pygame.Surface:
+        return pygame.Surface(self.size, 0, self.source)
+    
+    def resize(self, target: pygame.Surface):
+        """Escala la pantalla directamente a la superficie de destino, sin intermedios"""
+        if self.smooth:
+            pygame.transform.smoothscale(self.source, self.size, target)
+        else:
+            pygame.transform.scale(self.source, self.size, target)
+    
+    def capture(self) -> np.ndarray:
+        """Vista (alto, ancho, 3) del frame, o (alto, ancho) en escala de grises"""
+        self.release()
+        if self.direct:
+            self.array = pygame.surfarray.pixels3d(self.source).transpose(1, 0, 2)
+            return self.array
+        if self.output.get_locked():
+            # Quien llama conserva la vista anterior: no se sobrescribe
+            self.output = self.new_surface()
+        output = self.output
+        if self.grayscale:
+            source = self.source
+            if self.scaled is not None:
+                self.resize(self.scaled)
+                source = self.scaled
+            pygame.transform.grayscale(source, output)
+            # En gris los tres canales son iguales: basta con la vista del rojo
+            self.array = pygame.surfarray.pixels_red(output).T
+        else:
+            self.resize(output)
+            self.array = pygame.surfarray.pixels3d(output).transpose(1, 0, 2)
+        return self.array
+    
+    def release(self):
+        """Suelta la referencia de la captura a la última vista (desbloquea la pantalla)"""
+        self.array = None
+
+class FrameRecorder:
+    """Grabación de los frames presentados con un hilo escritor
+    
+    El bucle solo copia los píxeles del frame (32 bits, tal como están en la
+    superficie, reducidos si se pide) en un búfer libre de un conjunto
+    preasignado y lo encola. Un hilo escritor vacía la cola en un archivo de
+    vídeo sin procesar (.raw, o .raw.gz comprimido) o en una secuencia de PNG
+    codificados con zlib, que suelta el GIL mientras comprime. Si no queda
+    ningún búfer libre el frame se descarta y se cuenta: la grabación nunca
+    hace esperar al bucle.
+    """
+    
+    FORMATS = ('raw', 'png')
+    POOL_SIZE = 8
+    OVERHEAD_SAMPLES = 60 * FPS  # Frames de los que se guarda el coste de la copia
+    PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+    
+    def __init__(self, output_dir: str = "recordings", fmt: str = 'raw', scale: float = 1.0,
+                 compress: bool = False, pool_size: int = POOL_SIZE):
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Formato de grabación desconocido: {fmt}")
+        if not 0 < scale <= 1:
+            raise ValueError(f"La escala de grabación debe estar en (0, 1]: {scale}")
+        self.output_dir = output_dir
+        self.format = fmt
+        self.scale = scale
+        self.compress = compress
+        self.pool_size = max(1, pool_size)
+        self.pending = False
+        self.stopping = False
+        self.source = None
+        self.scaled = None
+        self.size = (0, 0)
+        self.pixel_format = ''
+        self.channel_bytes = (0, 1, 2)
+        self.buffers: List[np.ndarray] = []
+        self.free = deque()
+        self.filled = queue.SimpleQueue()
+        self.thread: Optional[threading.Thread] = None
+        self.file = None
+        self.path = None
+        self.png_rows = None
+        self.error = None
+        self.frames_captured = 0
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.capture_ms = deque(maxlen=self.OVERHEAD_SAMPLES)
+        self.start_time = 0.0
+    
+    @property
+    def active(self) -> bool:
+        return self.thread is not None
+    
+    def request(self):
+        """Empieza a grabar al final del siguiente frame"""
+        self.pending = True
+    
+    def toggle(self):
+        """Inicia o detiene la grabación (tecla de diagnóstico)"""
+        if self.active:
+            self.stopping = True
+        else:
+            self.request()
+    
+    @staticmethod
+    def layout_of(surface: pygame.Surface) -> Tuple[str, Tuple[int, int, int]]:
+        """Formato de píxel para ffmpeg (p. ej. 'bgr0') y byte de cada canal R, G, B"""
+        names = ['0'] * 4
+        channel_bytes = []
+        for name, shift in zip('rgb', surface.get_shifts()[:3]):
+            byte = shift // 8 if sys.byteorder == 'little' else 3 - shift // 8
+            names[byte] = name
+            channel_bytes.append(byte)
+        return ''.join(names), tuple(channel_bytes)
+    
+    def prepare(self, source: pygame.Surface):
+        """Tamaño de salida, superficie reducida y conjunto de búferes para la fuente"""
+        width, height = source.get_size()
+        self.source = source
+        self.size = (max(1, round(width * self.scale)), max(1, round(height * self.scale)))
+        self.scaled = pygame.Surface(self.size, 0, source) if self.size != (width, height) else None
+        self.pixel_format, self.channel_bytes = self.layout_of(source)
+        self.buffers = [np.empty((self.size[1], self.size[0]), dtype=np.uint32) for _ in range(self.pool_size)]
+        self.free = deque(range(self.pool_size))
+    
+    def start(self, source: pygame.Surface) -> bool:
+        """Prepara los búferes y el destino y arranca el hilo escritor"""
+        if source.get_bytesize() != 4:
+            print("Error: solo se pueden grabar superficies de 32 bits")
+            return False
+        self.prepare(source)
+        
+        base_name = time.strftime("submarine_%Y%m%d_%H%M%S")
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            if self.format == 'raw':
+                self.path = os.path.join(self.output_dir, base_name + ('.raw.gz' if self.compress else '.raw'))
+                self.file = gzip.open(self.path, 'wb', compresslevel=1) if self.compress else open(self.path, 'wb')
+            else:
+                self.path = os.path.join(self.output_dir, base_name)
+                os.makedirs(self.path, exist_ok=True)
+                # Filas de PNG con el byte de filtro (0, ninguno) delante de los píxeles RGB
+                self.png_rows = np.zeros((self.size[1], 1 + 3 * self.size[0]), dtype=np.uint8)
+        except OSError as e:
+            print(f"Error iniciando la grabación: {e}")
+            self.buffers = []
+            self.source = self.scaled = None
+            return False
+        
+        self.filled = queue.SimpleQueue()
+        self.error = None
+        self.frames_captured = self.frames_written = self.frames_dropped = 0
+        self.capture_ms.clear()
+        self.start_time = time.perf_counter()
+        self.thread = threading.Thread(target=self.write_frames, name='frame-recorder', daemon=True)
+        self.thread.start()
+        print(f"* Grabando en {self.path} ({self.size[0]}x{self.size[1]}, {self.format})...")
+        return True
+    
+    def grab(self, buffer: np.ndarray):
+        """Copia el frame actual, reducido si hace falta, en el búfer"""
+        source = self.source
+        if self.scaled is not None:
+            pygame.transform.scale(source, self.size, self.scaled)
+            source = self.scaled
+        pixels = pygame.surfarray.pixels2d(source)
+        np.copyto(buffer, pixels.T)
+        # Soltar la vista desbloquea la superficie
+        del pixels
+    
+    def capture(self):
+        """Encola una copia del frame, o la descarta si el escritor va con retraso"""
+        start = time.perf_counter()
+        try:
+            index = self.free.popleft()
+        except IndexError:
+            self.frames_dropped += 1
+            return
+        self.grab(self.buffers[index])
+        self.filled.put(index)
+        self.frames_captured += 1
+        self.capture_ms.append((time.perf_counter() - start) * 1000)
+    
+    def end_frame(self, source: pygame.Surface, metadata_source: Callable[[], dict]):
+        """Empieza, graba o termina en el límite de frame"""
+        if self.pending and not self.active:
+            self.pending = False
+            self.start(source)
+        if not self.active:
+            return
+        if self.stopping:
+            self.stop(metadata_source())
+            return
+        self.capture()
+    
+    def write_frames(self):
+        """Hilo escritor: guarda cada búfer encolado y lo devuelve al conjunto libre"""
+        while True:
+            index = self.filled.get()
+            if index is None:
+                return
+            if self.error is None:
+                try:
+                    self.write_frame(self.buffers[index])
+                    self.frames_written += 1
+                except Exception as e:
+                    self.error = e
+            self.free.append(index)
+    
+    def write_frame(self, buffer: np.ndarray):
+        if self.format == 'raw':
+            self.file.write(buffer)
+            return
+        path = os.path.join(self.path, f"frame_{self.frames_written:06d}.png")
+        with open(path, 'wb') as f:
+            f.write(self.encode_png(buffer))
+    
+    def encode_png(self, buffer: np.ndarray) -> bytes:
+        """PNG RGB de 8 bits sin filtros; zlib comprime sin el GIL"""
+        height, width = buffer.shape
+        pixels = buffer.view(np.uint8).reshape(height, width, 4)
+        rgb = self.png_rows[:, 1:].reshape(height, width, 3)
+        for channel, byte in enumerate(self.channel_bytes):
+            rgb[:, :, channel] = pixels[:, :, byte]
+        header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+        data = zlib.compress(self.png_rows, 6 if self.compress else 1)
+        return b''.join((self.PNG_SIGNATURE, self.png_chunk(b'IHDR', header),
+                         self.png_chunk(b'IDAT', data), self.png_chunk(b'IEND', b'')))
+    
+    @staticmethod
+    def png_chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    
+    def stop(self, metadata: dict):
+        """Vacía la cola, cierra el destino y escribe el .json con el resumen"""
+        if not self.active:
+            return
+        self.filled.put(None)
+        self.thread.join()
+        self.thread = None
+        self.stopping = False
+        elapsed = time.perf_counter() - self.start_time
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        
+        overhead = np.array(self.capture_ms) if self.capture_ms else np.zeros(1)
+        width, height = self.size
+        name = os.path.basename(self.path)
+        summary = dict(metadata, format=self.format, path=name, width=width, height=height, fps=FPS,
+                       pixel_format=self.pixel_format if self.format == 'raw' else 'rgb24',
+                       compressed=self.compress, seconds=round(elapsed, 3),
+                       frames_captured=self.frames_captured, frames_written=self.frames_written,
+                       frames_dropped=self.frames_dropped,
+                       capture_ms_median=round(float(np.median(overhead)), 3),
+                       capture_ms_p95=round(float(np.percentile(overhead, 95)), 3))
+        if self.format == 'raw':
+            source = f"gzip -dc {name} | " if self.compress else ''
+            summary['ffmpeg'] = (f"{source}ffmpeg -f rawvideo -pixel_format {self.pixel_format} "
+                                 f"-video_size {width}x{height} -framerate {FPS} "
+                                 f"-i {'-' if self.compress else name} {name.split('.')[0]}.mp4")
+        else:
+            summary['ffmpeg'] = f"ffmpeg -framerate {FPS} -i {name}/frame_%06d.png {name}.mp4"
+        if self.error is not None:
+            summary['error'] = str(self.error)
+            print(f"Error escribiendo la grabación: {self.error}")
+        
+        self.buffers = []
+        self.free.clear()
+        self.source = self.scaled = self.png_rows = None
+        try:
+            with open(self.path + '.json', 'w', encoding='utf-8') as f:
+                json.dump(summary, f, indent=2, ensure_ascii=False)
+        except OSError as e:
+            print(f"Error guardando el resumen de la grabación: {e}")
+        print(f"* Grabación guardada en {self.path}: {self.frames_written} frames, "
+              f"{self.frames_dropped} descartados, {summary['capture_ms_median']:.2f} ms por frame "
+              f"(p95 {summary['capture_ms_p95']:.2f} ms)")
+
+def synthesize_sound(name: str, rate: int) -> np.ndarray:
+    """Sintetiza un efecto de sonido como muestras float32 mono en [-1, 1]"""
+    def timeline(duration: float) -> np.ndarray:
+        return np.arange(int(duration * rate), dtype=np.float32) / rate
+    
+    def notes(frequencies: Tuple[float, ...], step: float, tail: float, decay: float) -> np.ndarray:
+        t = timeline(step * len(frequencies) + tail)
+        samples = np.zeros_like(t)
+        for i, frequency in enumerate(frequencies):
+            local = t[int(i * step * rate):] - i * step
+            tone = np.sin(2 * np.pi * frequency * local) + 0.3 * np.sin(4 * np.pi * frequency * local)
+            samples[int(i * step * rate):] += tone * np.exp(-local * decay)
+        return samples
+    
+    if name == 'pearl':
+        # Campanilla corta y brillante
+        t = timeline(0.18)
+        samples = (np.sin(2 * np.pi * 1318.5 * t) + 0.5 * np.sin(2 * np.pi * 1975.5 * t)) * np.exp(-t * 25)
+    elif name == 'giant_pearl':
+        # Arpegio ascendente con un brillo que ondula (arpón conseguido)
+        samples = notes((523.25, 659.25, 783.99, 1046.5), 0.09, 0.4, 6)
+        t = timeline(len(samples) / rate)
+        samples += 0.3 * np.sin(2 * np.pi * 2093 * t) * (1 + np.sin(2 * np.pi * 7 * t)) * np.exp(-t * 3)
+    elif name == 'damage':
+        # Golpe grave que cae de tono, con un chasquido de ruido
+        t = timeline(0.4)
+        frequency = 50 + 180 * np.exp(-t * 4)
+        phase = 2 * np.pi * np.cumsum(frequency) / rate
+        noise = np.random.default_rng(7).uniform(-1, 1, len(t)).astype(np.float32)
+        samples = np.sin(phase) * np.exp(-t * 7) + 0.6 * noise * np.exp(-t * 30)
+    elif name == 'victory':
+        samples = notes((523.25, 659.25, 783.99, 1046.5, 1318.5), 0.14, 0.8, 3)
+    elif name == 'bubble':
+        # "Blup" que sube de tono
+        duration = 0.09
+        t = timeline(duration)
+        phase = 2 * np.pi * np.cumsum(350 + 2400 * t / duration) / rate
+        samples = np.sin(phase) * np.sin(np.pi * t / duration)
+    else:
+        raise ValueError(f"Sonido desconocido: {name}")
+    
+    # Ataque de 5 ms para evitar clics y normalización
+    samples *= np.minimum(1.0, timeline(len(samples) / rate) / 0.005)
+    return (samples * (0.9 / np.abs(samples).max())).astype(np.float32)
+
+class SoundBank:
+    """Efectos sintetizados con NumPy, cacheados en disco y mezclados en canales fijos
+    
+    La primera vez se sintetizan y se guardan como WAV en cache_dir; los arranques
+    siguientes solo los cargan. Se reproducen en CHANNELS canales reservados: si
+    todos suenan se roba el de menor prioridad que lleve más tiempo, así que una
+    ráfaga de efectos nunca crea canales ni espera.
+    """
+    
+    VERSION = 1  # Subir al cambiar la síntesis para regenerar la caché
+    CHANNELS = 8
+    MIN_INTERVAL_MS = 40  # Un mismo efecto no se reinicia más seguido
+    PRIORITY = {'bubble': 0, 'pearl': 1, 'damage': 2, 'giant_pearl': 2, 'victory': 3}
+    VOLUME = {'bubble': 0.25, 'pearl': 0.5, 'damage': 0.8, 'giant_pearl': 0.7, 'victory': 0.7}
+    
+    def __init__(self, cache_dir: str = "sounds", enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.enabled = enabled and pygame.mixer.get_init() is not None
+        self.sounds: Dict[str, pygame.mixer.Sound] = {}
+        self.channels = []
+        self.channel_priority = [0] * self.CHANNELS
+        self.channel_started = [0] * self.CHANNELS
+        self.last_played = {name: -self.MIN_INTERVAL_MS for name in self.PRIORITY}
+        self.play_count = 0
+        self.stolen = 0
+        self.skipped = 0
+        self.synthesized = 0
+        if self.enabled:
+            self.load()
+    
+    def load(self):
+        """Carga los efectos de la caché o los sintetiza y reserva los canales"""
+        rate = pygame.mixer.get_init()[0]
+        for name in self.PRIORITY:
+            path = os.path.join(self.cache_dir, f"{name}-{rate}-v{self.VERSION}.wav")
+            try:
+                if os.path.exists(path):
+                    self.sounds[name] = pygame.mixer.Sound(path)
+                    continue
+            except pygame.error as e:
+                print(f"Error cargando {path}: {e}")
+            data = self.encode_wav(synthesize_sound(name, rate), rate)
+            self.synthesized += 1
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(data)
+            except OSError as e:
+                print(f"Error guardando {path}: {e}")
+            self.sounds[name] = pygame.mixer.Sound(file=io.BytesIO(data))
+        
+        # Canales reservados: pygame no los usa para otros sonidos
+        pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), self.CHANNELS))
+        pygame.mixer.set_reserved(self.CHANNELS)
+        self.channels = [pygame.mixer.Channel(i) for i in range(self.CHANNELS)]
+    
+    @staticmethod
+    def encode_wav(samples: np.ndarray, rate: int) -> bytes:
+        """WAV mono de 16 bits (pygame lo convierte al formato del mezclador al cargarlo)"""
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(rate)
+            wav.writeframes((samples * 32767).astype('<i2').tobytes())
+        return buffer.getvalue()
+    
+    def play(self, name: str, volume: float = 1.0):
+        """Reproduce un efecto sin bloquear; puede descartarlo si no hay canal"""
+        if not self.enabled:
+            return
+        now = pygame.time.get_ticks()
+        if now - self.last_played[name] < self.MIN_INTERVAL_MS:
+            self.skipped += 1
+            return
+        
+        priority = self.PRIORITY[name]
+        index = -1
+        for i, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                index = i
+                break
+        if index < 0:
+            # Robar la voz de menor prioridad que empezó antes
+            for i in range(self.CHANNELS):
+                if index < 0 or ((self.channel_priority[i], self.channel_started[i])
+                                 < (self.channel_priority[index], self.channel_started[index])):
+                    index = i
+            if self.channel_priority[index] > priority:
+                self.skipped += 1
+                return
+            self.stolen += 1
+        
+        channel = self.channels[index]
+        channel.set_volume(self.VOLUME[name] * volume)
+        channel.play(self.sounds[name])
+        self.channel_priority[index] = priority
+        self.channel_started[index] = self.play_count
+        self.play_count += 1
+        self.last_played[name] = now
+
+class DeepWaterLighting:
+    """Modo aguas profundas: solo se ve lo que ilumina la linterna del buzo y las perlas gigantes
+    
+    Las luces son máscaras radiales prerenderizadas a unos pocos radios. Cada
+    frame se rellena una capa de oscuridad reutilizada, se le suman las máscaras
+    con BLEND_RGB_MAX y se multiplica sobre la escena con BLEND_RGB_MULT. Lo que
+    queda del todo fuera de las luces no se dibuja.
+    """
+    
+    AMBIENT = (0, 0, 0)
+    TORCH_RADII = (150, 156, 162, 168)  # La linterna "respira" entre estos radios
+    TORCH_COLOR = (255, 244, 214)
+    GLOW_RADII = (52, 60, 68)
+    GLOW_COLOR = (255, 215, 120)
+    
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.layer = None
+        self.torch_masks = []
+        self.glow_masks = []
+        self.mask_scale = None
+        self.time = 0
+        # Luces del frame: (mascara, x, y, radio) en unidades lógicas
+        self.lights = []
+        self.regions: List[pygame.Rect] = []
+    
+    def toggle(self):
+        self.enabled = not self.enabled
+    
+    @staticmethod
+    def render_mask(radius: int, color: Tuple[int, int, int]) -> pygame.Surface:
+        """Degradado radial suave (smoothstep) del color al negro"""
+        offsets = np.arange(2 * radius) - radius + 0.5
+        distance = np.hypot(offsets[:, None], offsets[None, :]) / radius
+        falloff = np.clip(1 - distance, 0, 1)
+        falloff = falloff * falloff * (3 - 2 * falloff)
+        pixels = (falloff[:, :, None] * np.array(color, dtype=np.float32)).astype(np.uint8)
+        return pygame.surfarray.make_surface(pixels)
+    
+    def prepare(self, target: pygame.Surface):
+        """Crea la capa y las máscaras al formato y escala del destino (solo si cambian)"""
+        if (self.layer is None or self.layer.get_size() != target.get_size()
+                or self.mask_scale != VIEW.scale):
+            self.layer = pygame.Surface(target.get_size(), 0, target)
+            self.torch_masks = [self.layer_mask(r, self.TORCH_COLOR) for r in self.TORCH_RADII]
+            self.glow_masks = [self.layer_mask(r, self.GLOW_COLOR) for r in self.GLOW_RADII]
+            self.mask_scale = VIEW.scale
+    
+    def layer_mask(self, radius: int, color: Tuple[int, int, int]) -> pygame.Surface:
+        """Máscara escalada y con el mismo formato que la capa (los blits no convierten)"""
+        mask = self.render_mask(max(1, round(VIEW.length(radius))), color)
+        converted = pygame.Surface(mask.get_size(), 0, self.layer)
+        converted.blit(mask, (0, 0))
+        return converted
+    
+    def begin_frame(self, player: 'Player', pearls: 'PearlStore', view: pygame.Rect):
+        """Coloca las luces del frame que tocan la vista y calcula las regiones iluminadas"""
+        self.time += 1
+        self.lights.clear()
+        self.regions.clear()
+        phase = (math.sin(self.time * 0.05) + 1) / 2
+        index = round(phase * (len(self.TORCH_RADII) - 1))
+        self.add_light(index, True, player.x, player.y, self.TORCH_RADII[index])
+        for x, y, aura_phase in pearls.giants_in(view.inflate(2 * self.GLOW_RADII[-1], 2 * self.GLOW_RADII[-1])):
+            phase = (math.sin(aura_phase) + 1) / 2
+            index = round(phase * (len(self.GLOW_RADII) - 1))
+            self.add_light(index, False, x, y, self.GLOW_RADII[index])
+    
+    def add_light(self, index: int, torch: bool, x: float, y: float, radius: int):
+        self.lights.append((index, torch, x, y, radius))
+        self.regions.append(pygame.Rect(int(x - radius), int(y - radius), 2 * radius, 2 * radius))
+    
+    def reaches(self, x: float, y: float, extent: float = 0) -> bool:
+        """Si algo de tamaño extent en el punto cae entero dentro de alguna luz
+        
+        Lo que sobresale de las máscaras no se oscurece, así que solo se dibuja lo
+        que queda dentro; en el borde la máscara ya es negra y no se nota.
+        """
+        for _, _, light_x, light_y, radius in self.lights:
+            reach = radius - extent
+            if abs(x - light_x) < reach and abs(y - light_y) < reach:
+                return True
+        return False
+    
+    def reaches_many(self, x: np.ndarray, y: np.ndarray, extent: np.ndarray) -> np.ndarray:
+        """reaches para muchos puntos a la vez"""
+        lit = np.zeros(len(x), dtype=bool)
+        for _, _, light_x, light_y, radius in self.lights:
+            reach = radius - extent
+            lit |= (np.abs(x - light_x) < reach) & (np.abs(y - light_y) < reach)
+        return lit
+    
+    def is_lit(self, obj: 'GameObject') -> bool:
+        return self.reaches(obj.x, obj.y, obj.size)
+    
+    def apply(self, target: pygame.Surface):
+        """Multiplica la escena por la luz dentro de los grupos de luces
+        
+        Fuera de las luces no se ha dibujado nada (la escena ya es negra), así que
+        la capa solo se rellena y se multiplica en el rectángulo de cada grupo de
+        luces solapadas en vez de en toda la pantalla.
+        """
+        self.prepare(target)
+        layer = self.layer
+        bounds = target.get_rect()
+        for area, members in self.clusters():
+            area = area.clip(bounds)
+            if not area:
+                continue
+            layer.fill(self.AMBIENT, area)
+            for mask, rect in members:
+                layer.blit(mask, rect, special_flags=pygame.BLEND_RGB_MAX)
+            target.blit(layer, area, area, special_flags=pygame.BLEND_RGB_MULT)
+    
+    def clusters(self) -> List[Tuple[pygame.Rect, list]]:
+        """Agrupa las máscaras cuyos rectángulos (en píxeles) se solapan"""
+        groups = []
+        for index, torch, x, y, radius in self.lights:
+            mask = self.torch_masks[index] if torch else self.glow_masks[index]
+            center_x, center_y = VIEW.point(x, y)
+            half = mask.get_width() // 2
+            rect = mask.get_rect(topleft=(int(center_x) - half, int(center_y) - half))
+            area, members = rect, [(mask, rect)]
+            i = 0
+            while i < len(groups):
+                if groups[i][0].colliderect(area):
+                    other_area, other_members = groups.pop(i)
+                    area = area.union(other_area)
+                    members += other_members
+                    i = 0
+                else:
+                    i += 1
+            groups.append((area, members))
+        return groups
+
 class ParticleSystem:
     """Sistema de partículas para efectos visuales"""
     
-    def __init__(self):
+    def __init__(self, enabled: bool = True):
         self.particles = []
+        # Desactivado no genera partículas (simulaciones sin pantalla)
+        self.enabled = enabled
     
     def add_bubble(self, x: float, y: float):
         """Añade una burbuja"""
+        if not self.enabled or self.at_capacity():
+            return
+        if QUALITY.particle_spawn_rate < 1 and random.random() > QUALITY.particle_spawn_rate:
+            return
         self.particles.append(Bubble(x, y))
     
     def add_explosion(self, x: float, y: float, color: Tuple[int, int, int]):
         """Añade una explosión de partículas"""
-        for _ in range(8):
+        if not self.enabled or self.at_capacity():
+            return
+        for _ in range(max(1, round(8 * QUALITY.particle_spawn_rate))):
             self.particles.append(ExplosionParticle(x, y, color))
     
+    def at_capacity(self) -> bool:
+        """Indica si se ha alcanzado el límite de partículas de la calidad actual"""
+        return QUALITY.particle_cap is not None and len(self.particles) >= QUALITY.particle_cap
+    
     def update(self):
         """Actualiza todas las partículas"""
         self.particles = [p for p in self.particles if p.update()]
     
-    def draw(self, screen: pygame.Surface):
-        """Dibuja todas las partículas"""
-        for particle in self.particles:
-            particle.draw(screen)
+    def clear(self):
+        """Elimina todas las partículas"""
+        self.particles = []
+    
+    def sprites(self, visible: Optional[Callable[[float, float], bool]] = None
+                ) -> List[Tuple[pygame.Surface, Tuple[int, int]]]:
+        """Sprite y posición de cada partícula (solo de los puntos visibles si se indica)"""
+        return [particle.sprite() for particle in self.particles
+                if particle.life > 0 and (visible is None or visible(particle.x, particle.y))]
+    
+    def draw(self, screen: pygame.Surface, visible: Optional[Callable[[float, float], bool]] = None):
+        """Dibuja todas las partículas (solo las de los puntos visibles si se indica)"""
+        screen.blits(self.sprites(visible), False)
 
 class Particle:
     """Clase base para partículas"""
     
+    # Sprites por (tipo, color, radio en píxeles), compartidos por todas las partículas
+    SPRITES: Dict[tuple, pygame.Surface] = {}
+    
     def __init__(self, x: float, y: float, color: Tuple[int, int, int]):
         self.x = x
         self.y = y
@@ -149,29 +1683,48 @@ class Particle:
         self.life -= self.decay
         return self.life > 0
     
+    def pixel_size(self) -> int:
+        """Radio en píxeles, que mengua con la vida"""
+        return max(1, int(4 * self.life / self.max_life * VIEW.scale))
+    
+    def sprite(self) -> Tuple[pygame.Surface, Tuple[int, int]]:
+        """Sprite cacheado de la partícula y su esquina superior izquierda en píxeles"""
+        size = self.pixel_size()
+        key = (type(self), self.color, size)
+        sprite = Particle.SPRITES.get(key)
+        if sprite is None:
+            sprite = Particle.SPRITES[key] = self.render_sprite(size)
+        center_x, center_y = VIEW.point(self.x, self.y)
+        return sprite, (round(center_x) - size, round(center_y) - size)
+    
+    def render_sprite(self, size: int) -> pygame.Surface:
+        surface = sprite_surface(2 * size + 1, 2 * size + 1)
+        pygame.draw.circle(surface, self.color, (size, size), size)
+        return surface
+    
     def draw(self, screen: pygame.Surface):
         """Dibuja la partícula"""
         if self.life > 0:
-            alpha_ratio = self.life / self.max_life
-            size = max(1, int(4 * alpha_ratio))
-            pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), size)
+            screen.blit(*self.sprite())
 
 class Bubble(Particle):
     """Burbuja que sube hacia la superficie"""
     
+    WOBBLE_STEP = to_steps(0.1)
+    
     def __init__(self, x: float, y: float):
         super().__init__(x, y, COLORS['bubble_blue'])
         self.vel_y = random.uniform(-2, -4)
         self.vel_x = random.uniform(-1, 1)
         self.size = random.uniform(3, 8)
-        self.wobble = random.uniform(0, 2 * math.pi)
+        self.wobble = to_steps(random.uniform(0, 2 * math.pi))
         self.max_life = random.uniform(3, 6)
         self.life = self.max_life
         self.decay = 1 / (self.max_life * FPS)
     
     def update(self) -> bool:
-        self.wobble += 0.1
-        self.x += self.vel_x + math.sin(self.wobble) * 0.5
+        self.wobble = (self.wobble + self.WOBBLE_STEP) & TRIG_MASK
+        self.x += self.vel_x + SIN_LOOKUP[self.wobble] * 0.5
         self.y += self.vel_y
         
         # Acelerar hacia arriba
@@ -179,18 +1732,18 @@ class Bubble(Particle):
         
         return super().update() and self.y > -20
     
-    def draw(self, screen: pygame.Surface):
-        if self.life > 0:
-            alpha_ratio = self.life / self.max_life
-            size = max(1, int(self.size * alpha_ratio))
-            
-            # Burbuja principal
-            pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), size)
-            
-            # Brillo
-            if size > 2:
-                highlight_pos = (int(self.x - size//3), int(self.y - size//3))
-                pygame.draw.circle(screen, COLORS['pearl_shine'], highlight_pos, max(1, size//3))
+    def pixel_size(self) -> int:
+        return max(1, int(self.size * self.life / self.max_life * VIEW.scale))
+    
+    def render_sprite(self, size: int) -> pygame.Surface:
+        # Burbuja principal
+        surface = super().render_sprite(size)
+        
+        # Brillo
+        if size > 2:
+            highlight_pos = (size - size//3, size - size//3)
+            pygame.draw.circle(surface, COLORS['pearl_shine'], highlight_pos, max(1, size//3))
+        return surface
 
 class ExplosionParticle(Particle):
     """Partícula de explosión"""
@@ -215,12 +1768,31 @@ class ExplosionParticle(Particle):
 class Maze:
     """Generador y manejador del laberinto de coral"""
     
-    def __init__(self, width: int, height: int):
+    CHUNK_CAPACITY = 48  # La zona activa alrededor de la vista toca como mucho 7x6 bloques
+    
+    def __init__(self, width: int, height: int, grid: Optional[List[List[bool]]] = None,
+                 rng: Optional[random.Random] = None):
+        # Generador propio para poder generar niveles fuera del hilo principal
+        # (por defecto, el módulo random global)
+        self.rng = rng or random
         self.width = width
         self.height = height
-        self.grid = self.generate_maze()
-        self.coral_animations = {}
-        self.init_coral_animations()
+        # Tamaño del mundo en unidades lógicas
+        self.pixel_width = width * CELL_SIZE
+        self.pixel_height = height * CELL_SIZE
+        # Con una rejilla dada (p. ej. recibida por red) no se genera
+        self.grid = grid if grid is not None else self.generate_maze()
+        self.bounds = pygame.Rect(0, 0, self.pixel_width, self.pixel_height)
+        
+        # Bloques de CHUNK_CELLS x CHUNK_CELLS celdas: se crean al acercarse la cámara
+        # y se descartan los menos usados (caché LRU acotada)
+        self.chunk_seed = self.rng.getrandbits(32)
+        self.chunks_x = -(-width // CHUNK_CELLS)
+        self.chunks_y = -(-height // CHUNK_CELLS)
+        self.chunks: 'OrderedDict[Tuple[int, int], MazeChunk]' = OrderedDict()
+        
+        # Paredes del mini mapa cacheadas
+        self.minimap_walls = None
     
     def generate_maze(self) -> List[List[bool]]:
         """Genera un laberinto usando algoritmo de división recursiva"""
@@ -248,16 +1820,16 @@ class Maze:
             return
         
         # Decidir si dividir horizontal o verticalmente
-        horizontal = random.choice([True, False]) if width > height else width < height
+        horizontal = self.rng.choice([True, False]) if width > height else width < height
         
         if horizontal:
             # División horizontal
-            wall_y = y + random.randrange(2, height-1, 2)
+            wall_y = y + self.rng.randrange(2, height-1, 2)
             for wx in range(x, x + width):
                 maze[wall_y][wx] = True
             
             # Crear apertura
-            opening = x + random.randrange(0, width, 2) + 1
+            opening = x + self.rng.randrange(0, width, 2) + 1
             maze[wall_y][opening] = False
             
             # Recursión
@@ -265,12 +1837,12 @@ class Maze:
             self._divide_maze(maze, x, wall_y + 1, width, height - (wall_y - y + 1))
         else:
             # División vertical
-            wall_x = x + random.randrange(2, width-1, 2)
+            wall_x = x + self.rng.randrange(2, width-1, 2)
             for wy in range(y, y + height):
                 maze[wy][wall_x] = True
             
             # Crear apertura
-            opening = y + random.randrange(0, height, 2) + 1
+            opening = y + self.rng.randrange(0, height, 2) + 1
             maze[opening][wall_x] = False
             
             # Recursión
@@ -283,23 +1855,52 @@ class Maze:
         max_openings = (self.width * self.height) // 20
         
         while openings_created < max_openings:
-            x = random.randint(1, self.width - 2)
-            y = random.randint(1, self.height - 2)
+            x = self.rng.randint(1, self.width - 2)
+            y = self.rng.randint(1, self.height - 2)
             
-            if maze[y][x] and random.random() < 0.3:
+            if maze[y][x] and self.rng.random() < 0.3:
                 maze[y][x] = False
                 openings_created += 1
     
-    def init_coral_animations(self):
-        """Inicializa animaciones de coral"""
-        for y in range(self.height):
-            for x in range(self.width):
+    def chunk(self, key: Tuple[int, int]) -> 'MazeChunk':
+        """Bloque de la clave dada; si no está se genera y se descarta el menos usado"""
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self.chunks[key] = self.generate_chunk(key)
+            if len(self.chunks) > self.CHUNK_CAPACITY:
+                self.chunks.popitem(last=False)
+        else:
+            self.chunks.move_to_end(key)
+        return chunk
+    
+    def generate_chunk(self, key: Tuple[int, int]) -> 'MazeChunk':
+        """Animaciones del coral de un bloque, con semilla propia para que se repitan al volver"""
+        rng = random.Random(f"{self.chunk_seed}:{key[0]}:{key[1]}")
+        x0, x1, y0, y1 = self.chunk_cells(key)
+        cells, phases, speeds, amplitudes = [], [], [], []
+        for y in range(y0, y1):
+            for x in range(x0, x1):
                 if self.grid[y][x]:
-                    self.coral_animations[(x, y)] = {
-                        'phase': random.uniform(0, 2 * math.pi),
-                        'speed': random.uniform(0.02, 0.05),
-                        'amplitude': random.uniform(2, 5)
-                    }
+                    cells.append((x, y))
+                    phases.append(to_steps(rng.uniform(0, 2 * math.pi)))
+                    speeds.append(to_steps(rng.uniform(0.02, 0.05)))
+                    amplitudes.append(rng.uniform(2, 5))
+        return MazeChunk(key, cells, phases, speeds, amplitudes)
+    
+    def chunk_cells(self, key: Tuple[int, int]) -> Tuple[int, int, int, int]:
+        """Rango de celdas (x0, x1, y0, y1) de un bloque"""
+        x0 = key[0] * CHUNK_CELLS
+        y0 = key[1] * CHUNK_CELLS
+        return x0, min(self.width, x0 + CHUNK_CELLS), y0, min(self.height, y0 + CHUNK_CELLS)
+    
+    def chunk_keys(self, region: pygame.Rect) -> List[Tuple[int, int]]:
+        """Claves de los bloques que toca una región lógica"""
+        size = CHUNK_CELLS * CELL_SIZE
+        x0 = max(0, region.left // size)
+        y0 = max(0, region.top // size)
+        x1 = min(self.chunks_x, (region.right - 1) // size + 1)
+        y1 = min(self.chunks_y, (region.bottom - 1) // size + 1)
+        return [(chunk_x, chunk_y) for chunk_y in range(y0, y1) for chunk_x in range(x0, x1)]
     
     def is_wall(self, x: float, y: float) -> bool:
         """Verifica si una posición es una pared"""
@@ -316,8 +1917,8 @@ class Maze:
         """Obtiene una posición libre en el laberinto"""
         attempts = 0
         while attempts < 100:
-            x = random.randint(CELL_SIZE, SCREEN_WIDTH - CELL_SIZE)
-            y = random.randint(CELL_SIZE, SCREEN_HEIGHT - CELL_SIZE)
+            x = self.rng.randint(CELL_SIZE, self.pixel_width - CELL_SIZE)
+            y = self.rng.randint(CELL_SIZE, self.pixel_height - CELL_SIZE)
             
             if not self.is_wall(x, y):
                 return x, y
@@ -326,39 +1927,247 @@ class Maze:
         # Fallback: posición cerca del inicio
         return CELL_SIZE * 2, CELL_SIZE * 2
     
-    def update(self):
-        """Actualiza animaciones del coral"""
-        for pos, anim in self.coral_animations.items():
-            anim['phase'] += anim['speed']
+    def update(self, region: Optional[pygame.Rect] = None):
+        """Actualiza animaciones del coral de los bloques de la región (cerca de la cámara)"""
+        if not QUALITY.coral_animation:
+            return
+        for key in self.chunk_keys(region or self.bounds):
+            self.chunk(key).animate()
     
-    def draw(self, screen: pygame.Surface):
-        """Dibuja el laberinto con animaciones"""
+    def prebake(self, minimap_size: Tuple[int, int], focus: Optional[Tuple[float, float]] = None):
+        """Prepara las superficies cacheadas (se puede llamar desde un hilo de trabajo)
+        
+        Con focus se generan también los bloques de la vista inicial y, si el
+        coral no se anima, se hornean.
+        """
+        self.minimap_walls = self.render_minimap_walls(minimap_size)
+        if focus is not None:
+            camera = Camera()
+            camera.snap(*focus, self)
+            for key in self.chunk_keys(camera.rect()):
+                chunk = self.chunk(key)
+                if not QUALITY.coral_animation:
+                    self.baked(chunk)
+    
+    def baked(self, chunk: 'MazeChunk') -> pygame.Surface:
+        """Superficie del coral sin animación del bloque, a la escala actual"""
+        if chunk.surface is None or chunk.scale != VIEW.scale:
+            chunk.surface = self.render_chunk(chunk)
+            chunk.scale = VIEW.scale
+        return chunk.surface
+    
+    def render_chunk(self, chunk: 'MazeChunk') -> pygame.Surface:
+        """Hornea el coral de un bloque con el mismo redondeo que VIEW.rect en world()"""
+        scale = VIEW.scale
+        x0, x1, y0, y1 = self.chunk_cells(chunk.key)
+        origin_x = int(x0 * CELL_SIZE * scale)
+        origin_y = int(y0 * CELL_SIZE * scale)
+        size = (int(x1 * CELL_SIZE * scale) - origin_x, int(y1 * CELL_SIZE * scale) - origin_y)
+        surface = pygame.Surface(size, pygame.SRCALPHA)
+        border = VIEW.line_width(2)
+        for x, y in chunk.cells:
+            left = int(x * CELL_SIZE * scale) - origin_x
+            top = int(y * CELL_SIZE * scale) - origin_y
+            right = int((x + 1) * CELL_SIZE * scale) - origin_x
+            bottom = int((y + 1) * CELL_SIZE * scale) - origin_y
+            rect = pygame.Rect(left, top, right - left, bottom - top)
+            pygame.draw.rect(surface, COLORS['coral_pink'], rect)
+            pygame.draw.rect(surface, COLORS['coral_red'], rect, border)
+        return surface
+    
+    def render_minimap_walls(self, size: Tuple[int, int]) -> pygame.Surface:
+        """Fondo del mini mapa con las paredes"""
+        surface = pygame.Surface(size)
+        surface.fill((0, 0, 50))
+        scale_x = size[0] / self.pixel_width
+        scale_y = size[1] / self.pixel_height
         for y in range(self.height):
             for x in range(self.width):
                 if self.grid[y][x]:
-                    rect = pygame.Rect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE)
-                    
-                    # Animación de coral
-                    anim = self.coral_animations.get((x, y), {'phase': 0, 'amplitude': 0})
-                    color_offset = int(math.sin(anim['phase']) * anim.get('amplitude', 0))
-                    
-                    # Color base del coral
-                    base_color = COLORS['coral_pink']
-                    animated_color = (
-                        min(255, max(0, base_color[0] + color_offset)),
-                        min(255, max(0, base_color[1] + color_offset//2)),
-                        min(255, max(0, base_color[2]))
-                    )
-                    
-                    # Dibujar coral
-                    pygame.draw.rect(screen, animated_color, rect)
-                    pygame.draw.rect(screen, COLORS['coral_red'], rect, 2)
-                    
-                    # Añadir textura
-                    if random.random() < 0.1:  # Detalles ocasionales
-                        detail_rect = pygame.Rect(rect.x + 5, rect.y + 5, 
-                                                rect.width - 10, rect.height - 10)
-                        pygame.draw.rect(screen, COLORS['coral_red'], detail_rect)
+                    mini_x = int(x * CELL_SIZE * scale_x)
+                    mini_y = int(y * CELL_SIZE * scale_y)
+                    mini_size = max(1, int(CELL_SIZE * scale_x))
+                    pygame.draw.rect(surface, COLORS['coral_pink'], (mini_x, mini_y, mini_size, mini_size))
+        return surface
+    
+    def cell_range(self, region: pygame.Rect) -> Tuple[int, int, int, int]:
+        """Rango de celdas (x0, x1, y0, y1) que toca una región lógica"""
+        x0 = max(0, region.left // CELL_SIZE)
+        y0 = max(0, region.top // CELL_SIZE)
+        x1 = min(self.width, region.right // CELL_SIZE + 1)
+        y1 = min(self.height, region.bottom // CELL_SIZE + 1)
+        return x0, max(x0, x1), y0, max(y0, y1)
+    
+    def draw(self, screen: pygame.Surface, regions: Optional[List[pygame.Rect]] = None):
+        """Dibuja la parte visible del laberinto (o solo las regiones lógicas indicadas)"""
+        if regions is None:
+            self.draw_region(screen, VIEW.visible)
+            return
+        clip = screen.get_clip()
+        for region in regions:
+            screen.set_clip(VIEW.rect(region.x, region.y, region.width, region.height).clip(clip))
+            self.draw_region(screen, region)
+        screen.set_clip(clip)
+    
+    def draw_region(self, screen: pygame.Surface, region: pygame.Rect):
+        """Dibuja el coral de los bloques que toca una región"""
+        keys = self.chunk_keys(region)
+        
+        # Sin animación el coral es siempre igual: se copian los bloques horneados
+        if not QUALITY.coral_animation:
+            for key in keys:
+                x0, _, y0, _ = self.chunk_cells(key)
+                origin = VIEW.rect(x0 * CELL_SIZE, y0 * CELL_SIZE, 0, 0).topleft
+                screen.blit(self.baked(self.chunk(key)), origin)
+            return
+        
+        x0, x1, y0, y1 = self.cell_range(region)
+        border = VIEW.line_width(2)
+        for key in keys:
+            chunk = self.chunk(key)
+            # Animación de coral: el color de todas las celdas del bloque de una vez
+            for (x, y), animated_color in zip(chunk.cells, chunk.colors()):
+                if not (x0 <= x < x1 and y0 <= y < y1):
+                    continue
+                rect = VIEW.rect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE)
+                
+                # Dibujar coral
+                pygame.draw.rect(screen, animated_color, rect)
+                pygame.draw.rect(screen, COLORS['coral_red'], rect, border)
+                
+                # Añadir textura
+                if random.random() < 0.1:  # Detalles ocasionales
+                    detail_rect = VIEW.rect(x * CELL_SIZE + 5, y * CELL_SIZE + 5,
+                                            CELL_SIZE - 10, CELL_SIZE - 10)
+                    pygame.draw.rect(screen, COLORS['coral_red'], detail_rect)
+
+class MazeChunk:
+    """Bloque del laberinto: animación de su coral y, si hace falta, su superficie horneada
+    
+    La animación de las celdas de coral va en arrays paralelos a cells: fase y
+    velocidad en pasos de tabla y amplitud del cambio de color.
+    """
+    
+    BASE_COLOR = np.array(COLORS['coral_pink'])
+    
+    def __init__(self, key: Tuple[int, int], cells: List[Tuple[int, int]],
+                 phases: List[int], speeds: List[int], amplitudes: List[float]):
+        self.key = key
+        self.cells = cells  # [(x, y)] de las celdas de coral
+        self.phases = np.array(phases, dtype=np.intp)
+        self.speeds = np.array(speeds, dtype=np.intp)
+        self.amplitudes = np.array(amplitudes)
+        self.surface: Optional[pygame.Surface] = None
+        self.scale: Optional[float] = None  # Escala de la vista con que se horneó
+    
+    def animate(self):
+        self.phases += self.speeds
+        self.phases &= TRIG_MASK
+    
+    def colors(self) -> List[List[int]]:
+        """Color animado de cada celda: el rosa del coral desplazado por la fase"""
+        offsets = (SIN_TABLE[self.phases] * self.amplitudes).astype(np.intp)
+        colors = np.empty((len(offsets), 3), dtype=np.intp)
+        colors[:, 0] = self.BASE_COLOR[0] + offsets
+        colors[:, 1] = self.BASE_COLOR[1] + offsets // 2
+        colors[:, 2] = self.BASE_COLOR[2]
+        return np.clip(colors, 0, 255).tolist()
+
+class LineOfSight:
+    """Consultas de línea de visión sobre la rejilla del laberinto
+    
+    Recorre con DDA las celdas que cruza el segmento entre los centros de dos
+    celdas; hay visión si ninguna es coral. Los resultados se memorizan por par
+    de celdas en una caché LRU que solo se vacía cuando cambia el laberinto.
+    """
+    
+    CAPACITY = 4096
+    
+    def __init__(self, capacity: int = CAPACITY):
+        self.capacity = capacity
+        self.cache: 'OrderedDict[Tuple[Tuple[int, int], Tuple[int, int]], bool]' = OrderedDict()
+        self.maze = None
+        self.hits = 0
+        self.misses = 0
+    
+    def use_maze(self, maze: Maze):
+        """Vacía la caché si el laberinto no es el de las consultas anteriores"""
+        if maze is not self.maze:
+            self.cache.clear()
+            self.maze = maze
+    
+    @staticmethod
+    def cell_of(maze: Maze, x: float, y: float) -> Tuple[int, int]:
+        return (min(maze.width - 1, max(0, int(x // CELL_SIZE))),
+                min(maze.height - 1, max(0, int(y // CELL_SIZE))))
+    
+    @staticmethod
+    def ray_cells(start: Tuple[int, int], end: Tuple[int, int]):
+        """Celdas que cruza el segmento entre los centros, sin la inicial (DDA entera)
+        
+        Si el segmento pasa justo por una esquina se dan también las dos celdas
+        vecinas: basta con que una sea coral para tapar la vista.
+        """
+        x, y = start
+        dx, dy = abs(end[0] - x), abs(end[1] - y)
+        step_x = 1 if end[0] > x else -1
+        step_y = 1 if end[1] > y else -1
+        moved_x = moved_y = 0
+        while moved_x < dx or moved_y < dy:
+            # Compara en qué borde de celda cae antes el segmento: (1 + 2i) / 2d
+            decision = (1 + 2 * moved_x) * dy - (1 + 2 * moved_y) * dx
+            if decision == 0:
+                yield x + step_x, y
+                yield x, y + step_y
+                x += step_x
+                y += step_y
+                moved_x += 1
+                moved_y += 1
+            elif decision < 0:
+                x += step_x
+                moved_x += 1
+            else:
+                y += step_y
+                moved_y += 1
+            yield x, y
+    
+    @staticmethod
+    def trace(grid: List[List[bool]], start: Tuple[int, int], end: Tuple[int, int]) -> bool:
+        return not any(grid[y][x] for x, y in LineOfSight.ray_cells(start, end))
+    
+    def cells_visible(self, start: Tuple[int, int], end: Tuple[int, int]) -> bool:
+        """Visión entre dos celdas del laberinto actual (simétrica, memorizada)"""
+        key = (start, end) if start <= end else (end, start)
+        cache = self.cache
+        result = cache.get(key)
+        if result is not None:
+            cache.move_to_end(key)
+            self.hits += 1
+            return result
+        self.misses += 1
+        result = self.trace(self.maze.grid, *key)
+        cache[key] = result
+        if len(cache) > self.capacity:
+            cache.popitem(last=False)
+        return result
+    
+    def visible(self, maze: Maze, ax: float, ay: float, bx: float, by: float) -> bool:
+        """Si hay visión entre dos puntos (en unidades lógicas)"""
+        self.use_maze(maze)
+        return self.cells_visible(self.cell_of(maze, ax, ay), self.cell_of(maze, bx, by))
+    
+    def can_see(self, maze: Maze, target: 'GameObject', observers: list) -> List[bool]:
+        """Consulta en lote: qué observadores ven al objetivo dentro de su sight_distance"""
+        self.use_maze(maze)
+        target_cell = self.cell_of(maze, target.x, target.y)
+        results = []
+        for observer in observers:
+            dx = observer.x - target.x
+            dy = observer.y - target.y
+            reach = observer.sight_distance
+            results.append(dx * dx + dy * dy < reach * reach
+                           and self.cells_visible(self.cell_of(maze, observer.x, observer.y), target_cell))
+        return results
 
 class GameObject:
     """Clase base para objetos del juego"""
@@ -379,13 +2188,44 @@ class GameObject:
         """Verifica colisión con otro objeto"""
         return self.active and other.active and self.rect.colliderect(other.rect)
     
+    def screen_rect(self) -> pygame.Rect:
+        """Rectángulo en píxeles que cubre el dibujo, que sobresale del tamaño de colisión"""
+        return VIEW.rect(self.x - 2 * self.size, self.y - 2 * self.size, 4 * self.size, 4 * self.size)
+    
     def distance_to(self, other: 'GameObject') -> float:
         """Calcula distancia a otro objeto"""
         return math.sqrt((self.x - other.x)**2 + (self.y - other.y)**2)
 
+class PlayerControls(NamedTuple):
+    """Estado de las direcciones pulsadas (teclado, bot o red)"""
+    left: bool = False
+    right: bool = False
+    up: bool = False
+    down: bool = False
+    
+    @classmethod
+    def from_keys(cls, keys) -> 'PlayerControls':
+        """Lee las direcciones del estado del teclado"""
+        return cls(
+            keys[pygame.K_LEFT] or keys[pygame.K_a],
+            keys[pygame.K_RIGHT] or keys[pygame.K_d],
+            keys[pygame.K_UP] or keys[pygame.K_w],
+            keys[pygame.K_DOWN] or keys[pygame.K_s]
+        )
+    
+    @classmethod
+    def towards(cls, dx: float, dy: float, dead_zone: float = 3.0) -> 'PlayerControls':
+        """Direcciones que reducen el desplazamiento (dx, dy)"""
+        return cls(dx < -dead_zone, dx > dead_zone, dy < -dead_zone, dy > dead_zone)
+
+IDLE_CONTROLS = PlayerControls()
+
 class Player(GameObject):
     """Jugador - buzo submarino"""
     
+    SWIM_STEP = to_steps(0.3)
+    HARPOON_TIP_STEPS = (to_steps(-0.3), 0, to_steps(0.3))
+    
     def __init__(self, x: float, y: float, config: GameConfig):
         super().__init__(x, y, 24)
         self.config = config
@@ -395,29 +2235,30 @@ class Player(GameObject):
         self.velocity_y = 0
         self.has_harpoon = False
         self.harpoon_time = 0
-        self.swimming_animation = 0
+        self.swimming_animation = 0  # Fase en pasos de tabla
         self.invulnerable = False
         self.invulnerable_time = 0
         self.max_invulnerable_time = 120  # 2 segundos
     
-    def update(self, maze: Maze):
-        """Actualiza el jugador"""
-        keys = pygame.key.get_pressed()
+    def update(self, maze: Maze, controls: Optional[PlayerControls] = None):
+        """Actualiza el jugador (sin controles explícitos se lee el teclado)"""
+        if controls is None:
+            controls = PlayerControls.from_keys(pygame.key.get_pressed())
         
         # Movimiento con aceleración
         target_vel_x = 0
         target_vel_y = 0
         
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+        if controls.left:
             target_vel_x = -self.speed
             self.direction = math.pi
-        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+        if controls.right:
             target_vel_x = self.speed
             self.direction = 0
-        if keys[pygame.K_UP] or keys[pygame.K_w]:
+        if controls.up:
             target_vel_y = -self.speed
             self.direction = -math.pi/2
-        if keys[pygame.K_DOWN] or keys[pygame.K_s]:
+        if controls.down:
             target_vel_y = self.speed
             self.direction = math.pi/2
         
@@ -445,13 +2286,13 @@ class Player(GameObject):
         else:
             self.velocity_y = 0
         
-        # Mantener dentro de la pantalla
-        self.x = max(self.size//2, min(SCREEN_WIDTH - self.size//2, self.x))
-        self.y = max(self.size//2, min(SCREEN_HEIGHT - self.size//2, self.y))
+        # Mantener dentro del laberinto
+        self.x = max(self.size//2, min(maze.pixel_width - self.size//2, self.x))
+        self.y = max(self.size//2, min(maze.pixel_height - self.size//2, self.y))
         
         # Actualizar animaciones
         if abs(self.velocity_x) > 0.1 or abs(self.velocity_y) > 0.1:
-            self.swimming_animation += 0.3
+            self.swim()
         
         self.animation_time += 1
         
@@ -482,6 +2323,10 @@ class Player(GameObject):
             return True
         return False
     
+    def swim(self):
+        """Avanza la animación de natación"""
+        self.swimming_animation = (self.swimming_animation + self.SWIM_STEP) & TRIG_MASK
+    
     def draw(self, screen: pygame.Surface):
         """Dibuja el jugador con animaciones detalladas"""
         # Efecto de parpadeo si es invulnerable
@@ -492,31 +2337,36 @@ class Player(GameObject):
         base_color = COLORS['diver_orange'] if self.has_harpoon else COLORS['diver_blue']
         
         # Cuerpo principal del buzo
-        body_offset_x = math.cos(self.swimming_animation) * 2
-        body_offset_y = math.sin(self.swimming_animation * 2) * 1
+        swim = self.swimming_animation
+        body_offset_x = COS_LOOKUP[swim] * 2
+        body_offset_y = SIN_LOOKUP[(2 * swim) & TRIG_MASK] * 1
         
         body_x = int(self.x + body_offset_x)
         body_y = int(self.y + body_offset_y)
         
         # Cuerpo
         pygame.draw.ellipse(screen, base_color, 
-                          (body_x - 12, body_y - 8, 24, 16))
+                          VIEW.rect(body_x - 12, body_y - 8, 24, 16))
         
         # Tanque de oxígeno
         pygame.draw.ellipse(screen, COLORS['shark_gray'], 
-                          (body_x - 8, body_y - 12, 6, 20))
+                          VIEW.rect(body_x - 8, body_y - 12, 6, 20))
         
         # Máscara de buceo
-        mask_x = body_x + int(math.cos(self.direction) * 8)
-        mask_y = body_y + int(math.sin(self.direction) * 8)
+        direction = to_steps(self.direction)
+        cos_direction = COS_LOOKUP[direction]
+        sin_direction = SIN_LOOKUP[direction]
+        mask_x = body_x + int(cos_direction * 8)
+        mask_y = body_y + int(sin_direction * 8)
         
-        pygame.draw.circle(screen, (50, 50, 50), (mask_x, mask_y), 8)
-        pygame.draw.circle(screen, (200, 200, 255), (mask_x, mask_y), 6)
+        mask_center = VIEW.point(mask_x, mask_y)
+        pygame.draw.circle(screen, (50, 50, 50), mask_center, VIEW.length(8))
+        pygame.draw.circle(screen, (200, 200, 255), mask_center, VIEW.length(6))
         
         # Aletas con animación
-        fin_offset = math.sin(self.swimming_animation) * 3
-        fin_x = body_x - int(math.cos(self.direction) * 15)
-        fin_y = body_y - int(math.sin(self.direction) * 15) + int(fin_offset)
+        fin_offset = SIN_LOOKUP[swim] * 3
+        fin_x = body_x - int(cos_direction * 15)
+        fin_y = body_y - int(sin_direction * 15) + int(fin_offset)
         
         # Aletas
         fin_points = [
@@ -525,50 +2375,54 @@ class Player(GameObject):
             (fin_x - 8, fin_y + 2),
             (fin_x, fin_y + 4)
         ]
-        pygame.draw.polygon(screen, (0, 50, 150), fin_points)
+        pygame.draw.polygon(screen, (0, 50, 150), VIEW.points(fin_points))
         
         # Brazos
-        arm_angle = self.direction + math.sin(self.swimming_animation) * 0.3
-        arm_x = body_x + int(math.cos(arm_angle) * 10)
-        arm_y = body_y + int(math.sin(arm_angle) * 10)
-        pygame.draw.circle(screen, base_color, (arm_x, arm_y), 4)
+        arm_angle = (direction + to_steps(SIN_LOOKUP[swim] * 0.3)) & TRIG_MASK
+        arm_x = body_x + int(COS_LOOKUP[arm_angle] * 10)
+        arm_y = body_y + int(SIN_LOOKUP[arm_angle] * 10)
+        pygame.draw.circle(screen, base_color, VIEW.point(arm_x, arm_y), VIEW.length(4))
         
         # Arpón si está activo
         if self.has_harpoon:
             harpoon_length = 25
-            harpoon_end_x = mask_x + int(math.cos(self.direction) * harpoon_length)
-            harpoon_end_y = mask_y + int(math.sin(self.direction) * harpoon_length)
+            harpoon_end_x = mask_x + int(cos_direction * harpoon_length)
+            harpoon_end_y = mask_y + int(sin_direction * harpoon_length)
+            
+            harpoon_end = VIEW.point(harpoon_end_x, harpoon_end_y)
             
             # Mango del arpón
             pygame.draw.line(screen, (139, 69, 19), 
-                           (mask_x, mask_y), (harpoon_end_x, harpoon_end_y), 4)
+                           mask_center, harpoon_end, VIEW.line_width(4))
             
             # Punta del arpón
             pygame.draw.line(screen, COLORS['harpoon_silver'], 
-                           (mask_x, mask_y), (harpoon_end_x, harpoon_end_y), 2)
+                           mask_center, harpoon_end, VIEW.line_width(2))
             
             # Punta triangular
             tip_points = []
-            for angle_offset in [-0.3, 0, 0.3]:
-                tip_angle = self.direction + angle_offset
-                tip_x = harpoon_end_x + int(math.cos(tip_angle) * 8)
-                tip_y = harpoon_end_y + int(math.sin(tip_angle) * 8)
+            for angle_offset in self.HARPOON_TIP_STEPS:
+                tip_angle = (direction + angle_offset) & TRIG_MASK
+                tip_x = harpoon_end_x + int(COS_LOOKUP[tip_angle] * 8)
+                tip_y = harpoon_end_y + int(SIN_LOOKUP[tip_angle] * 8)
                 tip_points.append((tip_x, tip_y))
             
-            if len(tip_points) == 3:
-                pygame.draw.polygon(screen, COLORS['harpoon_silver'], tip_points)
-        
-        # Burbujas ocasionales
+            pygame.draw.polygon(screen, COLORS['harpoon_silver'], VIEW.points(tip_points))
+    
+    def exhale(self) -> Optional[Tuple[int, int]]:
+        """Posición de una burbuja ocasional junto a la máscara, o None"""
         if random.random() < 0.1:
-            bubble_x = mask_x + random.randint(-5, 5)
-            bubble_y = mask_y + random.randint(-5, 5)
-            return bubble_x, bubble_y
-        
+            mask_x = int(self.x) + int(math.cos(self.direction) * 8)
+            mask_y = int(self.y) + int(math.sin(self.direction) * 8)
+            return mask_x + random.randint(-5, 5), mask_y + random.randint(-5, 5)
         return None
 
 class Enemy(GameObject):
     """Clase base para enemigos"""
     
+    # Azar de cada tick; la etapa en paralelo pone aquí un generador por bloque de enemigos
+    rng = random
+    
     def __init__(self, x: float, y: float, size: int, speed: float, config: GameConfig):
         super().__init__(x, y, size)
         self.config = config
@@ -579,6 +2433,9 @@ class Enemy(GameObject):
         self.feared = False
         self.fear_timer = 0
         self.fear_distance = 120
+        # Solo se reacciona al jugador si se le ve (lo decide LineOfSight antes de update)
+        self.sight_distance = 200
+        self.sees_player = False
         self.patrol_center_x = x
         self.patrol_center_y = y
         self.patrol_radius = 150
@@ -592,7 +2449,7 @@ class Enemy(GameObject):
         if abs(self.x - self.last_x) < 1 and abs(self.y - self.last_y) < 1:
             self.stuck_timer += 1
             if self.stuck_timer > 30:  # Atascado por medio segundo
-                self.direction += random.uniform(math.pi/2, math.pi)
+                self.direction += self.rng.uniform(math.pi/2, math.pi)
                 self.stuck_timer = 0
         else:
             self.stuck_timer = 0
@@ -611,23 +2468,16 @@ class Enemy(GameObject):
             if distance_to_center > self.patrol_radius:
                 # Volver hacia el centro
                 self.direction = math.atan2(to_center_y, to_center_x)
-                self.direction += random.uniform(-0.5, 0.5)
+                self.direction += self.rng.uniform(-0.5, 0.5)
             else:
                 # Movimiento aleatorio
-                self.direction += random.uniform(-1, 1)
+                self.direction += self.rng.uniform(-1, 1)
             
-            self.change_direction_timer = random.randint(60, 180)
+            self.change_direction_timer = self.rng.randint(60, 180)
         
-        # Comportamiento de miedo al arpón
-        distance_to_player = self.distance_to(player)
-        
-        if player.has_harpoon and distance_to_player < self.fear_distance:
-            if not self.feared:
-                self.feared = True
-                self.fear_timer = 180  # 3 segundos
-                # Huir del jugador
-                flee_angle = math.atan2(self.y - player.y, self.x - player.x)
-                self.direction = flee_angle + random.uniform(-0.3, 0.3)
+        # Reacción al jugador, solo si hay línea de visión
+        if self.sees_player:
+            self.react(player, self.distance_to(player))
         
         # Actualizar miedo
         if self.feared:
@@ -650,35 +2500,60 @@ class Enemy(GameObject):
         if not maze.is_wall(new_x, self.y):
             self.x = new_x
         else:
-            self.direction = math.pi - self.direction + random.uniform(-0.3, 0.3)
+            self.direction = math.pi - self.direction + self.rng.uniform(-0.3, 0.3)
         
         if not maze.is_wall(self.x, new_y):
             self.y = new_y
         else:
-            self.direction = -self.direction + random.uniform(-0.3, 0.3)
+            self.direction = -self.direction + self.rng.uniform(-0.3, 0.3)
         
-        # Mantener dentro de la pantalla
-        if self.x <= self.size or self.x >= SCREEN_WIDTH - self.size:
+        # Mantener dentro del laberinto
+        if self.x <= self.size or self.x >= maze.pixel_width - self.size:
             self.direction = math.pi - self.direction
-        if self.y <= self.size or self.y >= SCREEN_HEIGHT - self.size:
+        if self.y <= self.size or self.y >= maze.pixel_height - self.size:
             self.direction = -self.direction
         
-        self.x = max(self.size, min(SCREEN_WIDTH - self.size, self.x))
-        self.y = max(self.size, min(SCREEN_HEIGHT - self.size, self.y))
+        self.x = max(self.size, min(maze.pixel_width - self.size, self.x))
+        self.y = max(self.size, min(maze.pixel_height - self.size, self.y))
         
         self.animation_time += 1
         self.update_rect()
+    
+    def react(self, player: Player, distance: float):
+        """Comportamiento de miedo al arpón"""
+        if player.has_harpoon and distance < self.fear_distance:
+            if not self.feared:
+                self.feared = True
+                self.fear_timer = 180  # 3 segundos
+                # Huir del jugador
+                flee_angle = math.atan2(self.y - player.y, self.x - player.x)
+                self.direction = flee_angle + self.rng.uniform(-0.3, 0.3)
+    
+    def animate(self):
+        """Avanza las animaciones puramente visuales (cada subclase las suyas)"""
 
 class Shark(Enemy):
     """Tiburón enemigo"""
     
+    TAIL_STEP = to_steps(0.2)
+    
     def __init__(self, x: float, y: float, config: GameConfig):
         super().__init__(x, y, 35, config.shark_speed, config)
-        self.tail_animation = 0
+        self.tail_animation = 0  # Fase en pasos de tabla
     
     def update(self, maze: Maze, player: Player):
         super().update(maze, player)
-        self.tail_animation += 0.2
+        self.animate()
+    
+    def animate(self):
+        """Avanza la animación de la cola"""
+        self.tail_animation = (self.tail_animation + self.TAIL_STEP) & TRIG_MASK
+    
+    def react(self, player: Player, distance: float):
+        """Persigue al buzo mientras lo ve, salvo que lleve el arpón"""
+        super().react(player, distance)
+        if not self.feared and not player.has_harpoon:
+            self.direction = math.atan2(player.y - self.y, player.x - self.x)
     
     def draw(self, screen: pygame.Surface):
         """Dibuja el tiburón con animaciones detalladas"""
@@ -689,9 +2564,10 @@ class Shark(Enemy):
         body_height = 16
         
         # Animación de natación
-        swim_offset = math.sin(self.tail_animation) * 2
+        tail_sin = SIN_LOOKUP[self.tail_animation]
+        swim_offset = tail_sin * 2
         
-        body_rect = pygame.Rect(
+        body_rect = VIEW.rect(
             int(self.x - body_length//2), 
             int(self.y - body_height//2 + swim_offset), 
             body_length, body_height
@@ -704,7 +2580,7 @@ class Shark(Enemy):
             (int(self.x + body_length//2 - 8), int(self.y - 6)),
             (int(self.x + body_length//2 - 8), int(self.y + 6))
         ]
-        pygame.draw.polygon(screen, color, head_points)
+        pygame.draw.polygon(screen, color, VIEW.points(head_points))
         
         # Aleta dorsal
         dorsal_x = self.x - 5
@@ -714,10 +2590,10 @@ class Shark(Enemy):
             (int(dorsal_x - 8), int(dorsal_y - 12)),
             (int(dorsal_x + 8), int(dorsal_y))
         ]
-        pygame.draw.polygon(screen, color, dorsal_points)
+        pygame.draw.polygon(screen, color, VIEW.points(dorsal_points))
         
         # Cola con animación
-        tail_offset = math.sin(self.tail_animation) * 8
+        tail_offset = tail_sin * 8
         tail_x = self.x - body_length//2 - 10
         tail_y = self.y + tail_offset
         
@@ -727,693 +2603,1974 @@ class Shark(Enemy):
             (int(tail_x - 8), int(tail_y)),
             (int(tail_x - 12), int(tail_y + 8))
         ]
-        pygame.draw.polygon(screen, color, tail_points)
+        pygame.draw.polygon(screen, color, VIEW.points(tail_points))
         
         # Aletas pectorales
-        pectoral_y_offset = math.sin(self.tail_animation + math.pi/4) * 3
+        pectoral_y_offset = SIN_LOOKUP[(self.tail_animation + TRIG_STEPS // 8) & TRIG_MASK] * 3
         pectoral_points = [
             (int(self.x + 5), int(self.y + pectoral_y_offset)),
             (int(self.x - 5), int(self.y + 10 + pectoral_y_offset)),
             (int(self.x + 10), int(self.y + 8 + pectoral_y_offset))
         ]
-        pygame.draw.polygon(screen, color, pectoral_points)
+        pygame.draw.polygon(screen, color, VIEW.points(pectoral_points))
         
         # Ojo
         eye_x = int(self.x + 8)
         eye_y = int(self.y - 3)
-        pygame.draw.circle(screen, (255, 255, 255), (eye_x, eye_y), 3)
-        pygame.draw.circle(screen, (0, 0, 0), (eye_x, eye_y), 2)
+        eye_center = VIEW.point(eye_x, eye_y)
+        pygame.draw.circle(screen, (255, 255, 255), eye_center, VIEW.length(3))
+        pygame.draw.circle(screen, (0, 0, 0), eye_center, VIEW.length(2))
         
         # Dientes si no tiene miedo
         if not self.feared:
             for i in range(3):
                 tooth_x = int(self.x + body_length//2 - 8 + i * 3)
                 tooth_y = int(self.y + 2)
-                pygame.draw.polygon(screen, (255, 255, 255), [
+                pygame.draw.polygon(screen, (255, 255, 255), VIEW.points([
                     (tooth_x, tooth_y),
                     (tooth_x + 1, tooth_y + 3),
                     (tooth_x + 2, tooth_y)
-                ])
+                ]))
 
 class Jellyfish(Enemy):
     """Medusa enemiga"""
     
+    TENTACLE_COUNT = 8
+    PULSE_STEP = to_steps(0.08)
+    # Ángulos fijos de los tentáculos y de los detalles bioluminiscentes, en pasos
+    TENTACLE_STEPS = np.arange(TENTACLE_COUNT) * (TRIG_STEPS // TENTACLE_COUNT)
+    TENTACLE_SIN, TENTACLE_COS = sin_cos(TENTACLE_STEPS)
+    DETAIL_STEPS = [i * TRIG_STEPS // 4 for i in range(4)]
+    SEGMENT_CACHE: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+    
     def __init__(self, x: float, y: float, config: GameConfig):
         super().__init__(x, y, 28, config.jellyfish_speed, config)
-        self.pulse_phase = random.uniform(0, 2 * math.pi)
-        self.tentacle_phases = [random.uniform(0, 2 * math.pi) for _ in range(8)]
+        # Fases en pasos de tabla
+        self.pulse_phase = to_steps(random.uniform(0, 2 * math.pi))
+        self.tentacle_phases = [to_steps(random.uniform(0, 2 * math.pi)) for _ in range(self.TENTACLE_COUNT)]
     
     def update(self, maze: Maze, player: Player):
         super().update(maze, player)
-        self.pulse_phase += 0.08
-        for i in range(len(self.tentacle_phases)):
-            self.tentacle_phases[i] += random.uniform(0.05, 0.15)
+        self.animate()
+    
+    def animate(self, tentacle_step: Optional[float] = None):
+        """Avanza la pulsación y los tentáculos (por defecto, un paso aleatorio cada uno)"""
+        self.pulse_phase = (self.pulse_phase + self.PULSE_STEP) & TRIG_MASK
+        phases = self.tentacle_phases
+        for i in range(len(phases)):
+            step = self.rng.uniform(0.05, 0.15) if tentacle_step is None else tentacle_step
+            phases[i] = (phases[i] + to_steps(step)) & TRIG_MASK
+    
+    @classmethod
+    def segment_steps(cls, segments: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Fracciones t de los extremos de los segmentos y su desfase t·π en pasos"""
+        cached = cls.SEGMENT_CACHE.get(segments)
+        if cached is None:
+            fractions = np.arange(segments + 1) / segments
+            cached = cls.SEGMENT_CACHE[segments] = (fractions, steps_array(fractions * math.pi))
+        return cached
     
     def draw(self, screen: pygame.Surface):
         """Dibuja la medusa con animaciones detalladas"""
         base_color = COLORS['jellyfish_light'] if self.feared else COLORS['jellyfish_purple']
         
         # Pulsación de la campana
-        pulse = math.sin(self.pulse_phase) * 4
+        pulse = SIN_LOOKUP[self.pulse_phase] * 4
         bell_radius = int(14 + pulse)
         
         # Campana principal
-        pygame.draw.circle(screen, base_color, (int(self.x), int(self.y)), bell_radius)
+        center = VIEW.point(int(self.x), int(self.y))
+        pygame.draw.circle(screen, base_color, center, VIEW.length(bell_radius))
         
         # Gradiente en la campana
-        for i in range(3):
+        for i in range(QUALITY.jellyfish_rings):
             inner_radius = bell_radius - (i + 1) * 3
             if inner_radius > 0:
                 alpha_color = tuple(min(255, c + 20 * i) for c in base_color)
-                pygame.draw.circle(screen, alpha_color, (int(self.x), int(self.y)), inner_radius)
-        
-        # Tentáculos animados
-        tentacle_count = 8
-        for i in range(tentacle_count):
-            angle = (i / tentacle_count) * 2 * math.pi
-            
-            # Posición base del tentáculo
-            base_x = self.x + math.cos(angle) * (bell_radius - 2)
-            base_y = self.y + math.sin(angle) * (bell_radius - 2)
-            
-            # Animación del tentáculo
-            tentacle_wave = math.sin(self.tentacle_phases[i]) * 15
-            tentacle_length = 20 + tentacle_wave
-            
-            # Dibujar tentáculo como línea ondulada
-            segments = 5
+                pygame.draw.circle(screen, alpha_color, center, VIEW.length(inner_radius))
+        
+        # Tentáculos animados: todos los extremos de segmento de una vez
+        segments = QUALITY.tentacle_segments
+        fractions, sway_steps = self.segment_steps(segments)
+        phases = np.array(self.tentacle_phases)
+        base_x = self.x + self.TENTACLE_COS * (bell_radius - 2)
+        base_y = self.y + self.TENTACLE_SIN * (bell_radius - 2)
+        tentacle_length = 20 + SIN_TABLE[phases] * 15
+        
+        # Cada segmento se desvía del ángulo del tentáculo según su fase y su posición t
+        sway = SIN_TABLE[(phases[:, None] + sway_steps) & TRIG_MASK] * 0.5
+        seg_sin, seg_cos = sin_cos(self.TENTACLE_STEPS[:, None] + steps_array(sway))
+        reach = tentacle_length[:, None] * fractions
+        seg_x = (base_x[:, None] + seg_cos * reach).astype(np.intp)
+        seg_y = (base_y[:, None] + seg_sin * reach).astype(np.intp)
+        points_x = (VIEW.offset_x + seg_x * VIEW.scale).tolist()
+        points_y = (VIEW.offset_y + seg_y * VIEW.scale).tolist()
+        
+        # Grosor del tentáculo (más grueso en la base)
+        widths = [VIEW.line_width(max(1, int(3 * (1 - seg / segments)))) for seg in range(segments)]
+        for xs, ys in zip(points_x, points_y):
             for seg in range(segments):
-                t = seg / segments
-                
-                # Posición del segmento
-                seg_angle = angle + math.sin(self.tentacle_phases[i] + t * math.pi) * 0.5
-                seg_x = base_x + math.cos(seg_angle) * (tentacle_length * t)
-                seg_y = base_y + math.sin(seg_angle) * (tentacle_length * t)
-                
-                # Siguiente segmento
-                next_t = (seg + 1) / segments
-                next_seg_angle = angle + math.sin(self.tentacle_phases[i] + next_t * math.pi) * 0.5
-                next_seg_x = base_x + math.cos(next_seg_angle) * (tentacle_length * next_t)
-                next_seg_y = base_y + math.sin(next_seg_angle) * (tentacle_length * next_t)
-                
-                # Grosor del tentáculo (más grueso en la base)
-                thickness = max(1, int(3 * (1 - t)))
-                
-                pygame.draw.line(screen, base_color, 
-                               (int(seg_x), int(seg_y)), 
-                               (int(next_seg_x), int(next_seg_y)), thickness)
+                pygame.draw.line(screen, base_color, (xs[seg], ys[seg]), (xs[seg + 1], ys[seg + 1]), widths[seg])
         
         # Detalles bioluminiscentes
         if not self.feared:
-            for i in range(4):
-                detail_angle = (i / 4) * 2 * math.pi + self.pulse_phase
-                detail_x = int(self.x + math.cos(detail_angle) * 6)
-                detail_y = int(self.y + math.sin(detail_angle) * 6)
-                pygame.draw.circle(screen, COLORS['jellyfish_light'], (detail_x, detail_y), 2)
+            for detail_step in self.DETAIL_STEPS:
+                detail_angle = (detail_step + self.pulse_phase) & TRIG_MASK
+                detail_x = int(self.x + COS_LOOKUP[detail_angle] * 6)
+                detail_y = int(self.y + SIN_LOOKUP[detail_angle] * 6)
+                pygame.draw.circle(screen, COLORS['jellyfish_light'], VIEW.point(detail_x, detail_y), VIEW.length(2))
 
 class Pearl(GameObject):
-    """Perla normal recolectable"""
+    """Perla normal recolectable: datos de aparición que lee PearlStore
+    
+    La animación y el dibujo van en PearlStore, con sus velocidades y
+    amplitudes por tipo; el objeto identifica la perla (piloto automático, red).
+    """
+    
+    SIZE = 14
+    POINTS = 10
     
     def __init__(self, x: float, y: float):
-        super().__init__(x, y, 14)
+        super().__init__(x, y, self.SIZE)
         self.shine_phase = random.uniform(0, 2 * math.pi)
-        self.points = 10
+        self.points = self.POINTS
         self.bob_phase = random.uniform(0, 2 * math.pi)
         self.base_y = y
-    
-    def update(self):
-        """Actualiza la perla"""
-        self.shine_phase += 0.1
-        self.bob_phase += 0.05
-        self.y = self.base_y + math.sin(self.bob_phase) * 3
-        self.update_rect()
-    
-    def draw(self, screen: pygame.Surface):
-        """Dibuja la perla con efectos de brillo"""
-        # Brillo principal
-        shine_intensity = (math.sin(self.shine_phase) + 1) / 2
-        shine_color = tuple(int(255 * shine_intensity) for _ in range(3))
-        
-        # Perla base
-        pygame.draw.circle(screen, COLORS['pearl_white'], (int(self.x), int(self.y)), 7)
-        
-        # Brillo animado
-        shine_radius = int(3 + shine_intensity * 2)
-        pygame.draw.circle(screen, shine_color, 
-                         (int(self.x - 2), int(self.y - 2)), shine_radius)
-        
-        # Reflejo
-        pygame.draw.circle(screen, COLORS['pearl_shine'], 
-                         (int(self.x - 3), int(self.y - 3)), 2)
-        
-        # Partículas de brillo ocasionales
-        if random.random() < 0.1:
-            for _ in range(2):
-                sparkle_x = self.x + random.randint(-10, 10)
-                sparkle_y = self.y + random.randint(-10, 10)
-                pygame.draw.circle(screen, COLORS['pearl_shine'], 
-                                 (int(sparkle_x), int(sparkle_y)), 1)
 
-class GiantPearl(GameObject):
+class GiantPearl(Pearl):
     """Perla gigante que otorga arpón"""
     
+    SIZE = 24
+    POINTS = 50
+    
     def __init__(self, x: float, y: float):
-        super().__init__(x, y, 24)
-        self.shine_phase = random.uniform(0, 2 * math.pi)
-        self.points = 50
-        self.bob_phase = random.uniform(0, 2 * math.pi)
-        self.base_y = y
+        super().__init__(x, y)
         self.aura_phase = 0
+
+class PearlStore:
+    """Perlas de un nivel guardadas en arrays de NumPy
     
-    def update(self):
-        """Actualiza la perla gigante"""
-        self.shine_phase += 0.05
-        self.bob_phase += 0.03
-        self.aura_phase += 0.1
-        self.y = self.base_y + math.sin(self.bob_phase) * 5
-        self.update_rect()
+    Las fases de brillo y balanceo de todas las perlas avanzan con operaciones
+    vectorizadas y las visibles se dibujan con una sola llamada a Surface.blits,
+    con fotogramas pre-renderizados. Recoger una perla solo baja su bandera y
+    deja el hueco en una lista libre para reutilizarlo. Los objetos Pearl y
+    GiantPearl siguen sirviendo de identificadores (piloto automático, red);
+    al recorrer el almacén se les copia la posición actual.
+    """
     
-    def draw(self, screen: pygame.Surface):
-        """Dibuja la perla gigante con efectos especiales"""
-        # Aura dorada
-        aura_radius = int(15 + math.sin(self.aura_phase) * 5)
-        aura_color = (*COLORS['giant_pearl'], 50)
-        
-        # Dibujar múltiples capas de aura
-        for i in range(3):
+    # Parámetros por tipo, indexados por kind (0 normal, 1 gigante)
+    SIZE = np.array([Pearl.SIZE, GiantPearl.SIZE])
+    SHINE_SPEED = np.array([0.1, 0.05])
+    BOB_SPEED = np.array([0.05, 0.03])
+    AURA_SPEED = np.array([0.0, 0.1])
+    BOB_AMPLITUDE = np.array([3.0, 5.0])
+    EXTENT = (8, 26)  # Radio lógico que ocupa el fotograma de cada tipo
+    SHINE_STEPS = 32  # Fotogramas por vuelta de la fase de brillo
+    
+    def __init__(self, pearls: Iterable[GameObject] = ()):
+        pearls = list(pearls)
+        count = len(pearls)
+        self.capacity = 0
+        self.x = self.y = self.base_y = np.zeros(0)
+        self.shine_phase = self.bob_phase = self.aura_phase = np.zeros(0)
+        self.kind = np.zeros(0, dtype=np.intp)
+        self.alive = np.zeros(0, dtype=bool)
+        self.objects: List[Optional[GameObject]] = []
+        self.grow(max(16, count))
+        
+        self.used = count  # Huecos ocupados alguna vez; los que quedan libres están en free
+        self.count = count  # Perlas sin recoger
+        self.free: List[int] = []
+        self.objects[:count] = pearls
+        self.slots: Dict[GameObject, int] = {pearl: i for i, pearl in enumerate(pearls)}
+        if count:
+            self.x[:count] = [pearl.x for pearl in pearls]
+            self.y[:count] = [pearl.y for pearl in pearls]
+            self.base_y[:count] = [pearl.base_y for pearl in pearls]
+            self.shine_phase[:count] = [pearl.shine_phase for pearl in pearls]
+            self.bob_phase[:count] = [pearl.bob_phase for pearl in pearls]
+            self.aura_phase[:count] = [getattr(pearl, 'aura_phase', 0.0) for pearl in pearls]
+            self.kind[:count] = [isinstance(pearl, GiantPearl) for pearl in pearls]
+            self.alive[:count] = True
+        
+        # Fotogramas por (tipo, paso de brillo, radio del aura), válidos para una escala y calidad
+        self.frames: Dict[tuple, pygame.Surface] = {}
+        self.frames_key = None
+        # Generador propio: los destellos no consumen el random global de la simulación
+        self.rng = np.random.default_rng()
+    
+    def grow(self, capacity: int):
+        """Amplía los arrays conservando su contenido"""
+        for name in ('x', 'y', 'base_y', 'shine_phase', 'bob_phase', 'aura_phase', 'kind', 'alive'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        self.objects.extend([None] * (capacity - self.capacity))
+        self.capacity = capacity
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def __iter__(self):
+        for index in np.flatnonzero(self.alive[:self.used]).tolist():
+            pearl = self.objects[index]
+            pearl.y = float(self.y[index])
+            pearl.update_rect()
+            yield pearl
+    
+    def __contains__(self, pearl: GameObject) -> bool:
+        index = self.slots.get(pearl)
+        return index is not None and bool(self.alive[index])
+    
+    def add(self, pearl: GameObject) -> int:
+        """Añade una perla, en un hueco libre si lo hay, y devuelve su índice"""
+        if self.free:
+            index = self.free.pop()
+            self.slots.pop(self.objects[index], None)
+        else:
+            if self.used == self.capacity:
+                self.grow(2 * self.capacity)
+            index = self.used
+            self.used += 1
+        self.objects[index] = pearl
+        self.slots[pearl] = index
+        self.x[index] = pearl.x
+        self.y[index] = pearl.y
+        self.base_y[index] = pearl.base_y
+        self.shine_phase[index] = pearl.shine_phase
+        self.bob_phase[index] = pearl.bob_phase
+        self.aura_phase[index] = getattr(pearl, 'aura_phase', 0.0)
+        self.kind[index] = isinstance(pearl, GiantPearl)
+        self.alive[index] = True
+        self.count += 1
+        return index
+    
+    def collect(self, index: int):
+        """Marca la perla como recogida y libera su hueco"""
+        if self.alive[index]:
+            self.alive[index] = False
+            self.count -= 1
+            self.free.append(index)
+    
+    def alive_mask(self) -> int:
+        """Bit i a 1 si la perla i sigue sin recoger (formato de las instantáneas de red)"""
+        bits = np.packbits(self.alive[:self.used], bitorder='little')
+        return int.from_bytes(bits.tobytes(), 'little')
+    
+    def set_alive_mask(self, mask: int):
+        """Aplica el estado recibido por red; las perlas pueden volver si llega una instantánea anterior"""
+        used = self.used
+        mask &= (1 << used) - 1
+        data = np.frombuffer(mask.to_bytes((used + 7) // 8, 'little'), dtype=np.uint8)
+        self.set_alive(np.unpackbits(data, count=used, bitorder='little'))
+    
+    def set_alive(self, alive: np.ndarray):
+        """Aplica las banderas de perla sin recoger de los primeros huecos (p. ej. de memoria compartida)"""
+        used = self.used
+        self.alive[:used] = alive[:used]
+        self.count = int(np.count_nonzero(self.alive[:used]))
+        self.free = np.flatnonzero(~self.alive[:used]).tolist()
+    
+    def update(self, start: int = 0, stop: Optional[int] = None):
+        """Avanza las fases y el balanceo de todas las perlas (o de los huecos start:stop)"""
+        part = slice(start, self.used if stop is None else stop)
+        kind = self.kind[part]
+        self.shine_phase[part] += self.SHINE_SPEED[kind]
+        self.bob_phase[part] += self.BOB_SPEED[kind]
+        self.aura_phase[part] += self.AURA_SPEED[kind]
+        np.multiply(np.sin(self.bob_phase[part]), self.BOB_AMPLITUDE[kind], out=self.y[part])
+        self.y[part] += self.base_y[part]
+    
+    def touching(self, obj: GameObject, start: int = 0, stop: Optional[int] = None) -> List[int]:
+        """Índices de las perlas sin recoger cuyo rectángulo de colisión toca el del objeto"""
+        if not obj.active:
+            return []
+        part = slice(start, self.used if stop is None else stop)
+        size = self.SIZE[self.kind[part]]
+        # Mismo rectángulo que GameObject.update_rect: centro truncado a píxeles
+        left = self.x[part].astype(int) - size // 2
+        top = self.y[part].astype(int) - size // 2
+        rect = obj.rect
+        hit = (self.alive[part] & (left < rect.right) & (rect.left < left + size)
+               & (top < rect.bottom) & (rect.top < top + size))
+        return (np.flatnonzero(hit) + start).tolist()
+    
+    def giants_in(self, region: pygame.Rect) -> List[Tuple[float, float, float]]:
+        """(x, y, fase del aura) de las perlas gigantes sin recoger dentro de la región"""
+        used = self.used
+        x, y = self.x[:used], self.y[:used]
+        inside = (self.alive[:used] & (self.kind[:used] == 1) & (x >= region.left) & (x < region.right)
+                  & (y >= region.top) & (y < region.bottom))
+        indices = np.flatnonzero(inside)
+        return list(zip(x[indices].tolist(), y[indices].tolist(), self.aura_phase[indices].tolist()))
+    
+    def position(self, pearl: GameObject) -> Tuple[float, float]:
+        """Posición actual (con balanceo) de una perla del almacén"""
+        index = self.slots[pearl]
+        return float(self.x[index]), float(self.y[index])
+    
+    def placed(self) -> List[GameObject]:
+        """Perlas de todos los huecos usados, recogidas o no, en el orden de alive_mask"""
+        return self.objects[:self.used]
+    
+    def positions(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """x, y y tipo de las perlas sin recoger"""
+        alive = self.alive[:self.used]
+        return self.x[:self.used][alive], self.y[:self.used][alive], self.kind[:self.used][alive]
+    
+    def draw(self, screen: pygame.Surface, view: pygame.Rect, lighting: Optional['DeepWaterLighting'] = None):
+        """Dibuja las perlas visibles (y alcanzadas por la luz) con una sola llamada a blits"""
+        frames, sparkles, _ = self.sprites(view, lighting)
+        screen.blits(frames, False)
+        screen.blits(sparkles, False)
+    
+    def sprites(self, view: pygame.Rect, lighting: Optional['DeepWaterLighting'] = None
+                ) -> Tuple[List[Tuple[pygame.Surface, Tuple[int, int]]],
+                           List[Tuple[pygame.Surface, Tuple[int, int]]], int]:
+        """Fotogramas de las perlas visibles, sus destellos (que van encima) y cuántas se han descartado"""
+        frames_key = (VIEW.scale, QUALITY.aura_layers, QUALITY.pearl_sparkles)
+        if frames_key != self.frames_key:
+            self.frames.clear()
+            self.frames_key = frames_key
+        
+        # Los sprites sobresalen de su tamaño de colisión (aura, destellos)
+        used = self.used
+        x, y = self.x[:used], self.y[:used]
+        margin = 2 * self.SIZE[self.kind[:used]]
+        shown = (self.alive[:used] & (x > view.left - margin) & (x < view.right + margin)
+                 & (y > view.top - margin) & (y < view.bottom + margin))
+        indices = np.flatnonzero(shown)
+        if lighting:
+            indices = indices[lighting.reaches_many(x[indices], y[indices], self.SIZE[self.kind[indices]])]
+        culled = self.count - len(indices)
+        if not len(indices):
+            return [], [], culled
+        
+        x, y = np.floor(x[indices]), np.floor(y[indices])
+        kind = self.kind[indices]
+        steps = (self.shine_phase[indices] % (2 * math.pi) * (self.SHINE_STEPS / (2 * math.pi))).astype(int)
+        auras = (15 + np.sin(self.aura_phase[indices]) * 5).astype(int) * kind
+        centers_x = (VIEW.offset_x + x * VIEW.scale).round().astype(int)
+        centers_y = (VIEW.offset_y + y * VIEW.scale).round().astype(int)
+        
+        blits = []
+        for key, center_x, center_y in zip(zip(kind.tolist(), steps.tolist(), auras.tolist()),
+                                           centers_x.tolist(), centers_y.tolist()):
+            frame = self.frames.get(key)
+            if frame is None:
+                frame = self.frames[key] = self.render_frame(*key)
+            half = frame.get_width() // 2
+            blits.append((frame, (center_x - half, center_y - half)))
+        
+        # Destellos sueltos: dos brillos en el 10% de las perlas normales y tres
+        # motas doradas en el 30% de las gigantes, en posiciones al azar
+        sparkles = []
+        rng = self.rng
+        normal = np.flatnonzero((kind == 0) & (rng.random(len(kind)) < 0.1)).repeat(2)
+        sparkle_x = x[normal] + rng.integers(-10, 11, len(normal))
+        sparkle_y = y[normal] + rng.integers(-10, 11, len(normal))
+        sparkle_colors = [COLORS['pearl_shine']] * len(normal)
+        if QUALITY.pearl_sparkles:
+            giant = np.flatnonzero((kind == 1) & (rng.random(len(kind)) < 0.3)).repeat(3)
+            sin_angle, cos_angle = sin_cos(rng.integers(0, TRIG_STEPS, len(giant)))
+            distance = rng.uniform(15, 25, len(giant))
+            sparkle_x = np.concatenate([sparkle_x, np.floor(x[giant] + cos_angle * distance)])
+            sparkle_y = np.concatenate([sparkle_y, np.floor(y[giant] + sin_angle * distance)])
+            sparkle_colors += [COLORS['giant_pearl']] * len(giant)
+        if sparkle_colors:
+            sparkle_x = (VIEW.offset_x + sparkle_x * VIEW.scale).round().astype(int)
+            sparkle_y = (VIEW.offset_y + sparkle_y * VIEW.scale).round().astype(int)
+            for color, center_x, center_y in zip(sparkle_colors, sparkle_x.tolist(), sparkle_y.tolist()):
+                frame = self.frames.get(('sparkle', color))
+                if frame is None:
+                    frame = self.frames[('sparkle', color)] = self.render_sparkle(color)
+                half = frame.get_width() // 2
+                sparkles.append((frame, (center_x - half, center_y - half)))
+        return blits, sparkles, culled
+    
+    def frame_surface(self, extent: float) -> Tuple[pygame.Surface, float]:
+        """Superficie transparente para un dibujo de radio lógico extent y su centro en píxeles"""
+        half = math.ceil(VIEW.length(extent)) + 1
+        return sprite_surface(2 * half + 1, 2 * half + 1), half
+    
+    def render_frame(self, kind: int, step: int, aura_radius: int) -> pygame.Surface:
+        """Dibuja una perla del tipo indicado con la fase de brillo del paso indicado"""
+        surface, center = self.frame_surface(self.EXTENT[kind])
+        shine_phase = (step + 0.5) * 2 * math.pi / self.SHINE_STEPS
+        shine_intensity = (math.sin(shine_phase) + 1) / 2
+        
+        def at(dx: float, dy: float) -> Tuple[float, float]:
+            return center + VIEW.length(dx), center + VIEW.length(dy)
+        
+        if kind == 0:
+            shine_color = tuple(int(255 * shine_intensity) for _ in range(3))
+            pygame.draw.circle(surface, COLORS['pearl_white'], at(0, 0), VIEW.length(7))
+            pygame.draw.circle(surface, shine_color, at(-2, -2), VIEW.length(int(3 + shine_intensity * 2)))
+            pygame.draw.circle(surface, COLORS['pearl_shine'], at(-3, -3), VIEW.length(2))
+            return surface
+        
+        for i in range(QUALITY.aura_layers):
             radius = aura_radius - i * 3
             if radius > 0:
-                # Simular transparencia con múltiples círculos
-                pygame.draw.circle(screen, COLORS['giant_pearl'], 
-                                 (int(self.x), int(self.y)), radius, 1)
-        
-        # Perla principal
-        shine_intensity = (math.sin(self.shine_phase) + 1) / 2
+                pygame.draw.circle(surface, COLORS['giant_pearl'], at(0, 0), VIEW.length(radius), 1)
         main_color = tuple(int(c * (0.8 + 0.2 * shine_intensity)) for c in COLORS['giant_pearl'])
-        
-        pygame.draw.circle(screen, main_color, (int(self.x), int(self.y)), 12)
-        
-        # Brillo interno
+        pygame.draw.circle(surface, main_color, at(0, 0), VIEW.length(12))
         inner_shine = tuple(min(255, int(c * 1.2)) for c in main_color)
-        pygame.draw.circle(screen, inner_shine, (int(self.x), int(self.y)), 8)
-        
-        # Reflejo principal
-        pygame.draw.circle(screen, COLORS['pearl_shine'], 
-                         (int(self.x - 4), int(self.y - 4)), 4)
-        
-        # Destellos
-        for i in range(6):
-            angle = (i / 6) * 2 * math.pi + self.shine_phase
-            sparkle_x = self.x + math.cos(angle) * 18
-            sparkle_y = self.y + math.sin(angle) * 18
-            pygame.draw.circle(screen, COLORS['pearl_shine'], 
-                             (int(sparkle_x), int(sparkle_y)), 2)
-        
-        # Partículas doradas
-        if random.random() < 0.3:
-            for _ in range(3):
-                particle_angle = random.uniform(0, 2 * math.pi)
-                particle_distance = random.uniform(15, 25)
-                particle_x = self.x + math.cos(particle_angle) * particle_distance
-                particle_y = self.y + math.sin(particle_angle) * particle_distance
-                pygame.draw.circle(screen, COLORS['giant_pearl'], 
-                                 (int(particle_x), int(particle_y)), 1)
+        pygame.draw.circle(surface, inner_shine, at(0, 0), VIEW.length(8))
+        pygame.draw.circle(surface, COLORS['pearl_shine'], at(-4, -4), VIEW.length(4))
+        sparkles = QUALITY.pearl_sparkles
+        for i in range(sparkles):
+            angle = (i / sparkles) * 2 * math.pi + shine_phase
+            pygame.draw.circle(surface, COLORS['pearl_shine'],
+                               at(math.cos(angle) * 18, math.sin(angle) * 18), VIEW.length(2))
+        return surface
+    
+    def render_sparkle(self, color: Tuple[int, int, int]) -> pygame.Surface:
+        surface, center = self.frame_surface(1)
+        pygame.draw.circle(surface, color, (center, center), VIEW.length(1))
+        return surface
 
-class SubmarineExplorerGame:
-    """Clase principal del juego El Explorador Submarino"""
+@dataclass
+class Level:
+    """Contenido de un nivel recién generado"""
+    maze: Maze
+    player: Player
+    enemies: List[Enemy]
+    pearls: List[GameObject]
+
+@dataclass
+class LevelPlan:
+    """Nivel generado sin entidades: laberinto y posiciones de aparición"""
+    maze: Maze
+    player_start: Tuple[float, float]
+    enemies: List[Tuple[type, float, float]]
+    pearls: List[Tuple[type, float, float]]
+
+def plan_level(config: GameConfig, rng=random) -> LevelPlan:
+    """Genera el laberinto y decide dónde aparece cada entidad (solo usa rng)"""
+    # Crear laberinto
+    maze = Maze(config.maze_width, config.maze_height, rng=rng)
+    
+    # Posición del jugador
+    start_x, start_y = maze.get_free_position()
+    
+    # Enemigos
+    enemies = []
+    for _ in range(config.enemy_count):
+        enemy_x, enemy_y = maze.get_free_position()
+        # Asegurar que no aparezcan muy cerca del jugador
+        while math.hypot(enemy_x - start_x, enemy_y - start_y) < 100:
+            enemy_x, enemy_y = maze.get_free_position()
+        enemies.append((Shark if rng.choice([True, False]) else Jellyfish, enemy_x, enemy_y))
+    
+    # Perlas normales y gigantes
+    pearls = [(Pearl, *maze.get_free_position()) for _ in range(config.pearl_count)]
+    pearls += [(GiantPearl, *maze.get_free_position()) for _ in range(config.giant_pearl_count)]
+    
+    return LevelPlan(maze, (start_x, start_y), enemies, pearls)
+
+def build_level(plan: LevelPlan, config: GameConfig) -> Level:
+    """Crea las entidades de un nivel planificado"""
+    player = Player(*plan.player_start, config)
+    enemies = [kind(x, y, config) for kind, x, y in plan.enemies]
+    pearls = [kind(x, y) for kind, x, y in plan.pearls]
+    return Level(plan.maze, player, enemies, pearls)
+
+def spawn_level(config: GameConfig, rng=random) -> Level:
+    """Genera el laberinto y coloca jugador, enemigos y perlas"""
+    return build_level(plan_level(config, rng), config)
+
+def level_config(base: GameConfig, level: int) -> GameConfig:
+    """Configuración de un nivel: laberinto mayor y enemigos más numerosos y rápidos"""
+    step = level - 1
+    speed_factor = min(1.5, 1.06 ** step)
+    return replace(
+        base,
+        # La cámara sigue al buzo: el arrecife crece sin límite
+        maze_width=base.maze_width + 6 * step,
+        maze_height=base.maze_height + 4 * step,
+        enemy_count=base.enemy_count + 2 * step,
+        pearl_count=base.pearl_count + 4 * step,
+        shark_speed=round(base.shark_speed * speed_factor, 3),
+        jellyfish_speed=round(base.jellyfish_speed * speed_factor, 3),
+        harpoon_duration=max(base.harpoon_duration // 2, base.harpoon_duration - 15 * step)
+    )
+
+def prepare_level(config: GameConfig, seed: str, minimap_size: Tuple[int, int]) -> LevelPlan:
+    """Planifica un nivel con su propia semilla y precalcula sus superficies"""
+    plan = plan_level(config, random.Random(seed))
+    plan.maze.prebake(minimap_size, plan.player_start)
+    return plan
+
+class LevelPreloader:
+    """Genera el siguiente nivel en un hilo de trabajo mientras se juega el actual"""
     
     def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("El Explorador Submarino")
-        self.clock = pygame.time.Clock()
-        
-        # Fuentes
-        self.title_font = pygame.font.Font(None, 72)
-        self.menu_font = pygame.font.Font(None, 48)
-        self.game_font = pygame.font.Font(None, 36)
-        self.small_font = pygame.font.Font(None, 24)
-        
-        # Configuración del juego
-        self.config = GameConfig()
-        
-        # Estado del juego
-        self.state = GameState.MENU
-        self.score_manager = ScoreManager()
-        self.particle_system = ParticleSystem()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='level-preloader')
+        self.level = None
+        self.future: Optional[Future] = None
+    
+    def request(self, level: int, config: GameConfig, seed: str, minimap_size: Tuple[int, int]):
+        self.level = level
+        self.future = self.executor.submit(prepare_level, config, seed, minimap_size)
+    
+    def take(self, level: int) -> Optional[LevelPlan]:
+        """Plan del nivel si se pidió (espera si aún no ha terminado), o None"""
+        if self.future is None or self.level != level:
+            return None
+        future, self.future = self.future, None
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"Error generando el nivel {level}: {e}")
+            return None
+    
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+# Intérprete sin GIL (CPython 3.13t con PYTHON_GIL=0): los hilos de Python corren a la vez
+FREE_THREADED = not getattr(sys, '_is_gil_enabled', lambda: True)()
+
+class ParallelUpdater:
+    """Actualiza enemigos, perlas y partículas por bloques en un grupo de hilos persistente
+    
+    Cada tipo de entidad se parte en bloques de tamaño fijo y los resultados
+    (supervivientes, colisiones con el buzo) se unen en el orden de los
+    bloques. Cada bloque de enemigos usa su propio generador, sembrado desde
+    el random global antes de repartir el trabajo, así que la partida no
+    depende del número de hilos ni del orden en que terminan. Con un solo
+    hilo los bloques se actualizan en el hilo que llama, con el mismo
+    resultado: es la actualización de todas las partidas, con GIL o sin él,
+    para que una semilla dé la misma partida en cualquier intérprete. Los
+    bloques pequeños no compensan: un nivel normal cabe en un bloque por tipo
+    y no toca el grupo de hilos.
+    """
+    
+    ENEMY_CHUNK = 64
+    PEARL_CHUNK = 8192
+    PARTICLE_CHUNK = 1024
+    
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        self.executor = (ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='update')
+                         if self.workers > 1 else None)
+    
+    @classmethod
+    def from_environment(cls) -> 'ParallelUpdater':
+        """Hilos según SUBMARINE_UPDATE_THREADS; por defecto uno por núcleo solo sin GIL
+        
+        Con GIL los hilos no aceleran el código de Python, así que por defecto se
+        usa el hilo que llama, pero la variable permite probar el grupo de hilos.
+        """
+        workers = (os.cpu_count() or 1) if FREE_THREADED else 1
+        value = os.environ.get('SUBMARINE_UPDATE_THREADS')
+        if value:
+            try:
+                workers = int(value)
+            except ValueError:
+                print(f"SUBMARINE_UPDATE_THREADS no es un entero ({value!r}); se usa el valor por defecto ({workers})")
+        return cls(workers)
+    
+    @staticmethod
+    def ranges(count: int, chunk: int) -> List[Tuple[int, int]]:
+        """Límites [inicio, fin) de los bloques en que se parten count entidades"""
+        return [(start, min(start + chunk, count)) for start in range(0, count, chunk)]
+    
+    def map(self, function: Callable, jobs: list) -> list:
+        """Resultados de function para cada trabajo, en el orden de los trabajos"""
+        if self.executor is None or len(jobs) < 2:
+            return [function(job) for job in jobs]
+        return list(self.executor.map(function, jobs))
+    
+    def update_enemies(self, enemies: List[Enemy], maze: Maze, player: Player) -> List[int]:
+        """Actualiza los enemigos y devuelve los índices de los que tocan al buzo"""
+        jobs = [(start, stop, random.getrandbits(64))
+                for start, stop in self.ranges(len(enemies), self.ENEMY_CHUNK)]
+        
+        def run(job: Tuple[int, int, int]) -> List[int]:
+            start, stop, seed = job
+            rng = random.Random(seed)
+            hits = []
+            for index in range(start, stop):
+                enemy = enemies[index]
+                enemy.rng = rng
+                enemy.update(maze, player)
+                if player.collides_with(enemy):
+                    hits.append(index)
+            return hits
+        
+        return [index for hits in self.map(run, jobs) for index in hits]
+    
+    def update_pearls(self, pearls: PearlStore, player: Player) -> List[int]:
+        """Avanza las perlas y devuelve las que toca el buzo (como PearlStore.touching)"""
+        def run(job: Tuple[int, int]) -> List[int]:
+            pearls.update(*job)
+            return pearls.touching(player, *job)
+        
+        jobs = self.ranges(pearls.used, self.PEARL_CHUNK)
+        return [index for hits in self.map(run, jobs) for index in hits]
+    
+    def update_particles(self, system: ParticleSystem):
+        """Actualiza las partículas conservando su orden"""
+        particles = system.particles
         
-        # Variables del juego
-        self.score = 0
-        self.lives = 3
-        self.level = 1
-        self.game_time = 0
+        def run(job: Tuple[int, int]) -> list:
+            start, stop = job
+            return [p for p in particles[start:stop] if p.update()]
         
-        # Objetos del juego
-        self.player = None
+        jobs = self.ranges(len(particles), self.PARTICLE_CHUNK)
+        system.particles = [p for alive in self.map(run, jobs) for p in alive]
+    
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+def grid_distances(walkable: np.ndarray, start: Tuple[int, int]) -> np.ndarray:
+    """Distancias BFS en celdas desde start (x, y) avanzando un frente de onda con NumPy"""
+    distances = np.full(walkable.shape, Autopilot.UNREACHABLE, dtype=np.int32)
+    start_x, start_y = start
+    if not walkable[start_y, start_x]:
+        return distances
+    
+    frontier = np.zeros(walkable.shape, dtype=bool)
+    frontier[start_y, start_x] = True
+    visited = frontier.copy()
+    distances[start_y, start_x] = 0
+    grown = np.empty_like(frontier)
+    
+    step = 0
+    while frontier.any():
+        step += 1
+        # Expandir el frente a los cuatro vecinos
+        grown.fill(False)
+        grown[1:, :] |= frontier[:-1, :]
+        grown[:-1, :] |= frontier[1:, :]
+        grown[:, 1:] |= frontier[:, :-1]
+        grown[:, :-1] |= frontier[:, 1:]
+        np.logical_and(grown, walkable, out=frontier)
+        frontier &= ~visited
+        visited |= frontier
+        distances[frontier] = step
+    
+    return distances
+
+class Autopilot:
+    """Piloto automático: recoge las perlas por caminos mínimos y esquiva enemigos
+    
+    Al empezar cada nivel precalcula un campo de distancias BFS por perla y la tabla
+    de distancias entre todas las perlas. Solo cambia de objetivo al recoger una
+    perla o al aparecer una amenaza; cada frame consulta listas ya calculadas.
+    """
+    
+    UNREACHABLE = 10**6
+    THREAT_RADIUS = 90  # px
+    DANGER_RADIUS = 2  # celdas
+    DANGER_WEIGHT = 6
+    STUCK_FRAMES = 45
+    ESCAPE_FRAMES = 15
+    
+    def __init__(self):
         self.maze = None
-        self.enemies = []
+        self.walkable = None
         self.pearls = []
-        
-        # Efectos y animaciones
-        self.menu_animation_time = 0
-        self.background_bubbles = []
-        self.screen_shake = 0
-        
-        self.init_background_effects()
+        self.pearl_index = {}
+        self.cells: List[Tuple[int, int]] = []
+        self.fields: List[List[List[int]]] = []
+        self.distances = np.zeros((0, 0), dtype=np.int32)
+        self.distance_rows: List[List[int]] = []
+        self.alive = set()
+        self.tour: List[int] = []
+        self.known_count = 0
+        self.threatened = False
+        self.danger = None
+        self.danger_kernel = self._make_danger_kernel()
+        self.stuck_frames = 0
+        self.last_position = (0.0, 0.0)
+        self.escape_frames = 0
+        self.escape_controls = IDLE_CONTROLS
     
-    def init_background_effects(self):
-        """Inicializa efectos de fondo"""
-        # Crear burbujas de fondo para el menú
-        for _ in range(20):
-            x = random.randint(0, SCREEN_WIDTH)
-            y = random.randint(0, SCREEN_HEIGHT)
-            self.background_bubbles.append(Bubble(x, y))
+    def _make_danger_kernel(self) -> np.ndarray:
+        """Peligro decreciente con la distancia de Chebyshev a un enemigo"""
+        span = np.arange(-self.DANGER_RADIUS, self.DANGER_RADIUS + 1)
+        chebyshev = np.maximum(np.abs(span)[:, None], np.abs(span)[None, :])
+        return (self.DANGER_RADIUS + 1 - chebyshev).astype(np.float32)
     
-    def reset_game(self):
-        """Reinicia el juego"""
-        self.score = 0
-        self.lives = 3
-        self.level = 1
-        self.game_time = 0
-        self.screen_shake = 0
+    @staticmethod
+    def cell_of(x: float, y: float) -> Tuple[int, int]:
+        return int(x // CELL_SIZE), int(y // CELL_SIZE)
+    
+    def start_level(self, maze: Maze, pearls: list, player: Player):
+        """Precalcula los campos de distancia y la tabla entre perlas del nivel"""
+        self.maze = maze
+        self.walkable = ~np.array(maze.grid, dtype=bool)
+        self.pearls = list(pearls)
+        self.pearl_index = {pearl: i for i, pearl in enumerate(self.pearls)}
+        self.cells = [self.cell_of(pearl.x, pearl.base_y) for pearl in self.pearls]
+        
+        fields = [grid_distances(self.walkable, cell) for cell in self.cells]
+        if fields:
+            xs = np.array([cell[0] for cell in self.cells])
+            ys = np.array([cell[1] for cell in self.cells])
+            self.distances = np.stack(fields)[:, ys, xs]
+        else:
+            self.distances = np.zeros((0, 0), dtype=np.int32)
+        self.fields = [field.tolist() for field in fields]
+        self.distance_rows = self.distances.tolist()
+        
+        self.alive = set(range(len(self.pearls)))
+        self.known_count = len(pearls)
+        self.threatened = False
+        self.danger = np.zeros(self.walkable.shape, dtype=np.float32)
+        self.stuck_frames = 0
+        self.escape_frames = 0
+        self.plan(self.cell_of(player.x, player.y))
+    
+    def first_target(self, start: Tuple[int, int], danger: Optional[np.ndarray] = None) -> int:
+        """Perla viva más cercana al inicio, penalizando las celdas peligrosas"""
+        start_x, start_y = start
+        best, best_cost = -1, float('inf')
+        for i in self.alive:
+            cost = self.fields[i][start_y][start_x]
+            if danger is not None:
+                cell_x, cell_y = self.cells[i]
+                cost += self.DANGER_WEIGHT * float(danger[cell_y, cell_x])
+            if cost < best_cost:
+                best, best_cost = i, cost
+        return best
+    
+    def plan(self, start: Tuple[int, int]):
+        """Ordena las perlas vivas: vecino más cercano y mejora 2-opt"""
+        if not self.alive:
+            self.tour = []
+            return
         
-        # Crear laberinto
-        self.maze = Maze(self.config.maze_width, self.config.maze_height)
+        distances = self.distance_rows
+        first = self.first_target(start)
+        route = [first]
+        pending = self.alive - {first}
+        while pending:
+            last = route[-1]
+            nearest = min(pending, key=distances[last].__getitem__)
+            route.append(nearest)
+            pending.remove(nearest)
+        
+        # 2-opt sobre el camino abierto manteniendo fija la primera perla
+        improved = True
+        while improved:
+            improved = False
+            for i in range(1, len(route) - 1):
+                for j in range(i + 1, len(route)):
+                    before = distances[route[i - 1]][route[i]]
+                    after = distances[route[i - 1]][route[j]]
+                    if j + 1 < len(route):
+                        before += distances[route[j]][route[j + 1]]
+                        after += distances[route[i]][route[j + 1]]
+                    if after < before:
+                        route[i:j + 1] = reversed(route[i:j + 1])
+                        improved = True
+        
+        self.tour = route
+    
+    def retarget(self, start: Tuple[int, int], danger: np.ndarray):
+        """Ante una amenaza adelanta la perla más segura sin rehacer todo el recorrido"""
+        if self.alive:
+            first = self.first_target(start, danger)
+            self.tour = [first] + [i for i in self.tour if i != first]
+    
+    def sync_collected(self, pearls: list):
+        """Quita del recorrido las perlas recogidas sin replanificar el resto"""
+        present = {self.pearl_index[pearl] for pearl in pearls if pearl in self.pearl_index}
+        self.alive &= present
+        self.tour = [i for i in self.tour if i in self.alive]
+        self.known_count = len(pearls)
+    
+    def find_threats(self, player: Player, enemies: list) -> list:
+        """Enemigos peligrosos cerca del jugador"""
+        if player.invulnerable:
+            return []
+        radius_sq = self.THREAT_RADIUS * self.THREAT_RADIUS
+        return [enemy for enemy in enemies
+                if (enemy.x - player.x) ** 2 + (enemy.y - player.y) ** 2 < radius_sq]
+    
+    def update_danger(self, threats: list):
+        """Mapa de peligro barato: un núcleo pequeño sumado alrededor de cada amenaza"""
+        danger = self.danger
+        danger.fill(0)
+        height, width = danger.shape
+        radius = self.DANGER_RADIUS
+        for enemy in threats:
+            enemy_x, enemy_y = self.cell_of(enemy.x, enemy.y)
+            x0, x1 = max(0, enemy_x - radius), min(width, enemy_x + radius + 1)
+            y0, y1 = max(0, enemy_y - radius), min(height, enemy_y + radius + 1)
+            if x0 < x1 and y0 < y1:
+                danger[y0:y1, x0:x1] += self.danger_kernel[
+                    y0 - enemy_y + radius:y1 - enemy_y + radius,
+                    x0 - enemy_x + radius:x1 - enemy_x + radius
+                ]
+    
+    def decide(self, maze: Maze, player: Player, enemies: list, pearls: PearlStore) -> PlayerControls:
+        """Controles del frame actual"""
+        if maze is not self.maze:
+            self.start_level(maze, pearls, player)
+        if len(pearls) != self.known_count:
+            self.sync_collected(pearls)
+        
+        cell = self.cell_of(player.x, player.y)
+        threats = self.find_threats(player, enemies)
+        if threats:
+            self.update_danger(threats)
+            if not self.threatened:
+                self.retarget(cell, self.danger)
+        self.threatened = bool(threats)
+        
+        if not self.tour:
+            return IDLE_CONTROLS
+        
+        # Salir de atascos con unos frames de movimiento aleatorio
+        if self.escape_frames > 0:
+            self.escape_frames -= 1
+            return self.escape_controls
+        if abs(player.x - self.last_position[0]) + abs(player.y - self.last_position[1]) < 0.5:
+            self.stuck_frames += 1
+            if self.stuck_frames > self.STUCK_FRAMES:
+                self.stuck_frames = 0
+                self.escape_frames = self.ESCAPE_FRAMES
+                self.escape_controls = random.choice([
+                    PlayerControls(left=True), PlayerControls(right=True),
+                    PlayerControls(up=True), PlayerControls(down=True)
+                ])
+        else:
+            self.stuck_frames = 0
+        self.last_position = (player.x, player.y)
         
-        # Crear jugador
-        start_x, start_y = self.maze.get_free_position()
-        self.player = Player(start_x, start_y, self.config)
+        target = self.tour[0]
+        if cell == self.cells[target]:
+            pearl_x, pearl_y = pearls.position(self.pearls[target])
+            return PlayerControls.towards(pearl_x - player.x, pearl_y - player.y)
         
-        # Crear enemigos
-        self.enemies = []
-        for _ in range(self.config.enemy_count):
-            enemy_x, enemy_y = self.maze.get_free_position()
-            # Asegurar que no aparezcan muy cerca del jugador
-            while self.player.distance_to(GameObject(enemy_x, enemy_y, 1)) < 100:
-                enemy_x, enemy_y = self.maze.get_free_position()
-            
-            if random.choice([True, False]):
-                self.enemies.append(Shark(enemy_x, enemy_y, self.config))
+        return self.steer_to_cell(player, cell, self.next_cell(cell, self.fields[target], threats))
+    
+    def next_cell(self, cell: Tuple[int, int], field: List[List[int]], threats: list) -> Tuple[int, int]:
+        """Vecino que más acerca al objetivo, penalizando el peligro si hay amenazas"""
+        cell_x, cell_y = cell
+        best = cell
+        best_score = float('inf')
+        for next_x, next_y in ((cell_x + 1, cell_y), (cell_x - 1, cell_y),
+                               (cell_x, cell_y + 1), (cell_x, cell_y - 1)):
+            if not (0 <= next_y < len(field) and 0 <= next_x < len(field[0])):
+                continue
+            score = field[next_y][next_x]
+            if score >= self.UNREACHABLE:
+                continue
+            if threats:
+                score += self.DANGER_WEIGHT * float(self.danger[next_y, next_x])
+            if score < best_score:
+                best, best_score = (next_x, next_y), score
+        return best
+    
+    @staticmethod
+    def steer_to_cell(player: Player, cell: Tuple[int, int], next_cell: Tuple[int, int]) -> PlayerControls:
+        """Avanza hacia la celda vecina manteniéndose centrado en el pasillo"""
+        center_x = next_cell[0] * CELL_SIZE + CELL_SIZE / 2
+        center_y = next_cell[1] * CELL_SIZE + CELL_SIZE / 2
+        if next_cell[0] != cell[0]:
+            return PlayerControls.towards(center_x - player.x, center_y - player.y, dead_zone=4.0)._replace(
+                left=next_cell[0] < cell[0], right=next_cell[0] > cell[0])
+        return PlayerControls.towards(center_x - player.x, center_y - player.y, dead_zone=4.0)._replace(
+            up=next_cell[1] < cell[1], down=next_cell[1] > cell[1])
+    
+    def controls(self, game: 'SubmarineExplorerGame') -> PlayerControls:
+        """Atajo para conducir al jugador de una partida"""
+        return self.decide(game.maze, game.player, game.enemies, game.pearls)
+
+class CachedLayer:
+    """Contenido estático renderizado una vez en una superficie
+    
+    Solo se vuelve a renderizar cuando cambia la clave (las entradas del
+    contenido, p. ej. las puntuaciones) o el tamaño de la pantalla. Las capas
+    transparentes se recortan a la zona con contenido para que cada frame
+    mezcle solo esos píxeles.
+    """
+    
+    def __init__(self, render: Callable[[pygame.Surface], None], transparent: bool = True):
+        self.render = render
+        self.transparent = transparent
+        self.key = None
+        self.surface: Optional[pygame.Surface] = None
+        self.offset = (0, 0)
+        self.renders = 0
+    
+    def invalidate(self):
+        self.surface = None
+    
+    def get(self, size: Tuple[int, int], key=None) -> pygame.Surface:
+        key = (size, key)
+        if self.surface is None or key != self.key:
+            if self.transparent:
+                surface = pygame.Surface(size, pygame.SRCALPHA)
+                self.render(surface)
+                bounds = surface.get_bounding_rect()
+                self.surface = surface.subsurface(bounds).copy()
+                self.offset = bounds.topleft
             else:
-                self.enemies.append(Jellyfish(enemy_x, enemy_y, self.config))
+                self.surface = pygame.Surface(size)
+                self.render(self.surface)
+            self.key = key
+            self.renders += 1
+        return self.surface
+    
+    def draw(self, target: pygame.Surface, key=None):
+        target.blit(self.get(target.get_size(), key), self.offset)
+
+def blit_centered(target: pygame.Surface, text: pygame.Surface, x: float, y: float):
+    """Dibuja un texto centrado en un punto lógico"""
+    target.blit(text, text.get_rect(center=VIEW.point(x, y)))
+
+class Scene:
+    """Pantalla de un GameState con sus propios manejadores de teclas, lógica y dibujo
+    
+    La escena activa se decide con game.state en cada llamada, así que cambiar
+    el estado desde fuera (espectadores, pruebas) también cambia de escena.
+    """
+    
+    state: GameState
+    
+    def __init__(self, game: 'SubmarineExplorerGame'):
+        self.game = game
+    
+    def enter(self):
+        """Al pasar a esta escena desde otra"""
+    
+    def handle_key(self, key: int) -> bool:
+        """Tecla pulsada; devuelve False si hay que salir del juego"""
+        return True
+    
+    def update(self, controls: Optional[PlayerControls]):
+        """Lógica de un tick"""
+    
+    def draw(self):
+        """Dibuja la escena en game.screen"""
+
+class MenuScene(Scene):
+    """Menú principal; tras un rato sin teclas empieza la demostración"""
+    
+    state = GameState.MENU
+    OPTIONS = ("ESPACIO - Jugar", "I - Instrucciones", "H - Puntuaciones", "ESC - Salir")
+    
+    def __init__(self, game: 'SubmarineExplorerGame'):
+        super().__init__(game)
+        # Textos renderizados: solo se mueven, así que se renderizan una vez
+        self.labels = None
+        self.labels_key = None
+    
+    def handle_key(self, key: int) -> bool:
+        game = self.game
+        if key == pygame.K_SPACE:
+            game.state = GameState.PLAYING
+            game.reset_game()
+        elif key == pygame.K_i:
+            game.state = GameState.INSTRUCTIONS
+        elif key == pygame.K_h:
+            game.state = GameState.HIGH_SCORES
+        elif key == pygame.K_ESCAPE:
+            return False
+        return True
+    
+    def update(self, controls: Optional[PlayerControls]):
+        game = self.game
+        game.menu_idle_time += 1
+        if game.menu_idle_time > game.ATTRACT_DELAY:
+            game.start_demo()
+    
+    def render_labels(self, high_score: int) -> dict:
+        game = self.game
+        key = (game.title_font, high_score)
+        if key != self.labels_key:
+            self.labels_key = key
+            self.labels = {
+                'title': game.title_font.render("EL EXPLORADOR", True, COLORS['text_gold']),
+                'subtitle': game.title_font.render("SUBMARINO", True, COLORS['text_gold']),
+                'options': [game.menu_font.render(option, True, COLORS['text_white']) for option in self.OPTIONS],
+                'high_score': game.small_font.render(f"Mejor Puntuación: {high_score}", True, COLORS['text_gold'])
+            }
+        return self.labels
+    
+    def draw(self):
+        game = self.game
+        screen = game.screen
+        game.draw_background()
+        high_score = game.score_manager.get_high_score()
+        labels = self.render_labels(high_score)
         
-        # Crear perlas
-        self.pearls = []
+        # Título con animación
+        title_y = 150 + math.sin(game.menu_animation_time) * 10
+        blit_centered(screen, labels['title'], SCREEN_WIDTH//2, title_y)
+        blit_centered(screen, labels['subtitle'], SCREEN_WIDTH//2, title_y + 80)
         
-        # Perlas normales
-        for _ in range(self.config.pearl_count):
-            pearl_x, pearl_y = self.maze.get_free_position()
-            self.pearls.append(Pearl(pearl_x, pearl_y))
+        # Decoración del título
+        for i in range(5):
+            angle = game.menu_animation_time + i * (2 * math.pi / 5)
+            deco_x = SCREEN_WIDTH//2 + math.cos(angle) * 200
+            deco_y = title_y + 40 + math.sin(angle) * 30
+            pygame.draw.circle(screen, COLORS['pearl_white'], VIEW.point(deco_x, deco_y), VIEW.length(4))
         
-        # Perlas gigantes
-        for _ in range(self.config.giant_pearl_count):
-            giant_pearl_x, giant_pearl_y = self.maze.get_free_position()
-            self.pearls.append(GiantPearl(giant_pearl_x, giant_pearl_y))
+        # Menú de opciones
+        start_y = 400
+        for i, option_text in enumerate(labels['options']):
+            option_y = start_y + i * 50 + math.sin(game.menu_animation_time + i) * 5
+            blit_centered(screen, option_text, SCREEN_WIDTH//2, option_y)
         
-        # Limpiar sistema de partículas
-        self.particle_system = ParticleSystem()
-    
-    def handle_events(self):
-        """Maneja eventos del juego"""
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                return False
-            
-            if event.type == pygame.KEYDOWN:
-                if self.state == GameState.MENU:
-                    if event.key == pygame.K_SPACE:
-                        self.state = GameState.PLAYING
-                        self.reset_game()
-                    elif event.key == pygame.K_i:
-                        self.state = GameState.INSTRUCTIONS
-                    elif event.key == pygame.K_h:
-                        self.state = GameState.HIGH_SCORES
-                    elif event.key == pygame.K_ESCAPE:
-                        return False
-                
-                elif self.state == GameState.INSTRUCTIONS:
-                    if event.key in [pygame.K_ESCAPE, pygame.K_SPACE]:
-                        self.state = GameState.MENU
+        # Puntuación más alta
+        if high_score > 0:
+            blit_centered(screen, labels['high_score'], SCREEN_WIDTH//2, SCREEN_HEIGHT - 50)
+
+class InstructionsScene(Scene):
+    """Instrucciones: el texto es fijo y se renderiza una sola vez"""
+    
+    state = GameState.INSTRUCTIONS
+    LINES = (
+        "OBJETIVO:",
+        "• Recolecta todas las perlas del arrecife de coral",
+        "• Evita a los tiburones y medusas",
+        "",
+        "CONTROLES:",
+        "• WASD o Flechas - Mover buzo",
+        "• ESC - Pausar juego",
+        "• L - Aguas profundas (solo ves con la linterna)",
+        "",
+        "ELEMENTOS DEL JUEGO:",
+        "• Perlas blancas: +10 puntos",
+        "• Perlas doradas: +50 puntos + Arpón temporal",
+        "• El arpón ahuyenta a los enemigos",
+        "• Tienes 3 vidas",
+        "",
+        "ENEMIGOS:",
+        "• Tiburones: Rápidos y agresivos",
+        "• Medusas: Lentas pero impredecibles",
+        "",
+        "ESPACIO - Volver al menú"
+    )
+    
+    def __init__(self, game: 'SubmarineExplorerGame'):
+        super().__init__(game)
+        self.layer = CachedLayer(self.render)
+    
+    def handle_key(self, key: int) -> bool:
+        if key in [pygame.K_ESCAPE, pygame.K_SPACE]:
+            self.game.state = GameState.MENU
+        return True
+    
+    def render(self, target: pygame.Surface):
+        game = self.game
+        blit_centered(target, game.menu_font.render("INSTRUCCIONES", True, COLORS['text_gold']), SCREEN_WIDTH//2, 100)
+        
+        start_y = 180
+        for i, instruction in enumerate(self.LINES):
+            color = COLORS['text_gold'] if instruction.endswith(":") else COLORS['text_white']
+            font = game.game_font if instruction.endswith(":") else game.small_font
+            blit_centered(target, font.render(instruction, True, color), SCREEN_WIDTH//2, start_y + i * 25)
+    
+    def draw(self):
+        self.game.draw_background()
+        self.layer.draw(self.game.screen)
+
+class HighScoresScene(Scene):
+    """Mejores puntuaciones: se vuelven a renderizar solo si cambia la lista"""
+    
+    state = GameState.HIGH_SCORES
+    
+    def __init__(self, game: 'SubmarineExplorerGame'):
+        super().__init__(game)
+        self.layer = CachedLayer(self.render)
+    
+    def handle_key(self, key: int) -> bool:
+        if key in [pygame.K_ESCAPE, pygame.K_SPACE]:
+            self.game.state = GameState.MENU
+        return True
+    
+    def render(self, target: pygame.Surface):
+        game = self.game
+        blit_centered(target, game.menu_font.render("MEJORES PUNTUACIONES", True, COLORS['text_gold']),
+                      SCREEN_WIDTH//2, 100)
+        
+        scores = game.score_manager.get_top_scores()
+        
+        if not scores:
+            blit_centered(target, game.game_font.render("No hay puntuaciones registradas", True, COLORS['text_white']),
+                          SCREEN_WIDTH//2, 300)
+        else:
+            start_y = 180
+            for i, score_data in enumerate(scores):
+                rank = i + 1
+                score = score_data['score']
+                date = score_data['date']
+                completed = score_data.get('completed', False)
                 
-                elif self.state == GameState.HIGH_SCORES:
-                    if event.key in [pygame.K_ESCAPE, pygame.K_SPACE]:
-                        self.state = GameState.MENU
+                # Número de ranking
+                rank_text = game.game_font.render(f"{rank}.", True, COLORS['text_gold'])
+                target.blit(rank_text, rank_text.get_rect(topright=VIEW.point(SCREEN_WIDTH//2 - 200, start_y + i * 40)))
                 
-                elif self.state == GameState.PLAYING:
-                    if event.key == pygame.K_ESCAPE:
-                        self.state = GameState.PAUSED
+                # Puntuación
+                score_text = game.game_font.render(f"{score:,}", True, COLORS['text_white'])
+                target.blit(score_text, score_text.get_rect(topleft=VIEW.point(SCREEN_WIDTH//2 - 180, start_y + i * 40)))
                 
-                elif self.state == GameState.PAUSED:
-                    if event.key == pygame.K_ESCAPE:
-                        self.state = GameState.PLAYING
-                    elif event.key == pygame.K_m:
-                        self.state = GameState.MENU
+                # Indicador de nivel completado
+                if completed:
+                    complete_text = game.small_font.render("★ COMPLETADO", True, COLORS['success_green'])
+                    target.blit(complete_text,
+                                complete_text.get_rect(topleft=VIEW.point(SCREEN_WIDTH//2 - 50, start_y + i * 40 + 5)))
                 
-                elif self.state in [GameState.GAME_OVER, GameState.VICTORY]:
-                    if event.key == pygame.K_SPACE:
-                        self.state = GameState.MENU
-                    elif event.key == pygame.K_r:
-                        self.state = GameState.PLAYING
-                        self.reset_game()
+                # Fecha
+                date_text = game.small_font.render(date, True, COLORS['text_white'])
+                target.blit(date_text, date_text.get_rect(topright=VIEW.point(SCREEN_WIDTH//2 + 200, start_y + i * 40 + 5)))
         
+        # Instrucción para volver
+        blit_centered(target, game.small_font.render("ESPACIO - Volver al menú", True, COLORS['text_white']),
+                      SCREEN_WIDTH//2, SCREEN_HEIGHT - 100)
+    
+    def draw(self):
+        game = self.game
+        game.draw_background()
+        scores = tuple((entry['score'], entry['date'], entry.get('completed', False))
+                       for entry in game.score_manager.get_top_scores())
+        self.layer.draw(game.screen, scores)
+
+class PlayingScene(Scene):
+    """Partida en curso"""
+    
+    state = GameState.PLAYING
+    
+    def handle_key(self, key: int) -> bool:
+        game = self.game
+        if key == pygame.K_ESCAPE:
+            game.state = GameState.PAUSED
+        elif key == pygame.K_l:
+            game.lighting.toggle()
         return True
     
-    def update(self):
-        """Actualiza la lógica del juego"""
-        # Actualizar animaciones globales
-        self.menu_animation_time += 0.05
+    def update(self, controls: Optional[PlayerControls]):
+        self.game.update_game(controls)
+    
+    def draw(self):
+        self.game.draw_game()
+
+class PauseScene(Scene):
+    """Pausa: el último frame de la partida queda congelado con el texto encima
+    
+    Al entrar se toma una copia de la pantalla (que aún tiene el último frame
+    de la partida) y se compone una vez con el velo y el texto; mientras dura
+    la pausa cada frame es un solo blit.
+    """
+    
+    state = GameState.PAUSED
+    OPTIONS = ("ESC - Continuar", "M - Menú principal")
+    
+    def __init__(self, game: 'SubmarineExplorerGame'):
+        super().__init__(game)
+        self.frame: Optional[pygame.Surface] = None
+    
+    def enter(self):
+        self.frame = None
+    
+    def handle_key(self, key: int) -> bool:
+        game = self.game
+        if key == pygame.K_ESCAPE:
+            game.state = GameState.PLAYING
+        elif key == pygame.K_m:
+            game.state = GameState.MENU
+        return True
+    
+    def render(self) -> pygame.Surface:
+        game = self.game
+        # Sin un frame de la partida en pantalla (p. ej. una pausa recibida por red) se dibuja uno
+        if game.drawn_scene is not game.scenes[GameState.PLAYING]:
+            game.draw_game()
+        frame = game.screen.copy()
         
-        # Actualizar burbujas de fondo
-        self.background_bubbles = [b for b in self.background_bubbles if b.update()]
+        # Overlay semi-transparente
+        overlay = pygame.Surface(frame.get_size())
+        overlay.set_alpha(150)
+        overlay.fill((0, 0, 0))
+        frame.blit(overlay, (0, 0))
         
-        # Añadir nuevas burbujas de fondo
-        if len(self.background_bubbles) < 15:
+        # Texto de pausa
+        blit_centered(frame, game.menu_font.render("JUEGO PAUSADO", True, COLORS['text_white']),
+                      SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 100)
+        
+        # Opciones
+        for i, option in enumerate(self.OPTIONS):
+            blit_centered(frame, game.game_font.render(option, True, COLORS['text_white']),
+                          SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 20 + i * 40)
+        return frame
+    
+    def draw(self):
+        screen = self.game.screen
+        if self.frame is None or self.frame.get_size() != screen.get_size():
+            self.frame = self.render()
+        screen.blit(self.frame, (0, 0))
+
+class GameOverScene(Scene):
+    """Fin de partida: el texto depende solo de la puntuación y del récord"""
+    
+    state = GameState.GAME_OVER
+    OPTIONS = ("R - Jugar de nuevo", "ESPACIO - Menú principal")
+    
+    def __init__(self, game: 'SubmarineExplorerGame'):
+        super().__init__(game)
+        self.layer = CachedLayer(self.render)
+    
+    def handle_key(self, key: int) -> bool:
+        game = self.game
+        if key == pygame.K_SPACE:
+            game.state = GameState.MENU
+        elif key == pygame.K_r:
+            game.state = GameState.PLAYING
+            game.reset_game()
+        return True
+    
+    def pearl_counts(self) -> Tuple[int, int]:
+        config = self.game.level_config
+        total_pearls = config.pearl_count + config.giant_pearl_count
+        return total_pearls - len(self.game.pearls), total_pearls
+    
+    def render(self, target: pygame.Surface):
+        game = self.game
+        
+        # Título
+        blit_centered(target, game.menu_font.render("JUEGO TERMINADO", True, COLORS['danger_red']), SCREEN_WIDTH//2, 200)
+        
+        # Puntuación final
+        blit_centered(target, game.game_font.render(f"Puntuación: {game.score:,}", True, COLORS['text_white']),
+                      SCREEN_WIDTH//2, 300)
+        
+        # Estadísticas
+        pearls_collected, total_pearls = self.pearl_counts()
+        stats_text = game.small_font.render(
+            f"Perlas recolectadas: {pearls_collected}/{total_pearls}",
+            True, COLORS['text_white']
+        )
+        blit_centered(target, stats_text, SCREEN_WIDTH//2, 350)
+        
+        # Mejor puntuación
+        high_score = game.score_manager.get_high_score()
+        if game.score == high_score and high_score > 0:
+            record_text = game.game_font.render("¡NUEVO RÉCORD!", True, COLORS['text_gold'])
+        else:
+            record_text = game.small_font.render(f"Mejor puntuación: {high_score:,}", True, COLORS['text_gold'])
+        blit_centered(target, record_text, SCREEN_WIDTH//2, 400)
+        
+        # Opciones
+        for i, option in enumerate(self.OPTIONS):
+            blit_centered(target, game.game_font.render(option, True, COLORS['text_white']), SCREEN_WIDTH//2, 500 + i * 40)
+    
+    def draw(self):
+        game = self.game
+        game.draw_background()
+        self.layer.draw(game.screen, (game.score, self.pearl_counts(), game.score_manager.get_high_score()))
+
+class VictoryScene(Scene):
+    """Nivel completado: título animado sobre un bloque de texto fijo"""
+    
+    state = GameState.VICTORY
+    
+    def __init__(self, game: 'SubmarineExplorerGame'):
+        super().__init__(game)
+        self.layer = CachedLayer(self.render)
+        self.title = None
+        self.title_key = None
+    
+    def handle_key(self, key: int) -> bool:
+        game = self.game
+        if key == pygame.K_n:
+            game.state = GameState.PLAYING
+            game.start_level(game.level + 1)
+        elif key == pygame.K_SPACE:
+            game.finish_run(True)
+            game.state = GameState.MENU
+        elif key == pygame.K_r:
+            game.finish_run(True)
+            game.state = GameState.PLAYING
+            game.reset_game()
+        return True
+    
+    def render(self, target: pygame.Surface):
+        game = self.game
+        
+        # Puntuación final con bonus
+        bonus_score = 1000 + (game.lives * 200)
+        blit_centered(target, game.game_font.render(f"Puntuación Final: {game.score:,}", True, COLORS['text_white']),
+                      SCREEN_WIDTH//2, 320)
+        blit_centered(target, game.small_font.render(f"Bonus por completar: +{bonus_score:,}", True, COLORS['success_green']),
+                      SCREEN_WIDTH//2, 350)
+        
+        # Estadísticas perfectas
+        blit_centered(target, game.game_font.render("¡ARRECIFE COMPLETAMENTE EXPLORADO!", True, COLORS['text_gold']),
+                      SCREEN_WIDTH//2, 400)
+        
+        # Mejor puntuación (la partida se guarda al terminar, no en cada nivel)
+        if game.score > game.score_manager.get_high_score():
+            blit_centered(target, game.game_font.render("¡NUEVO RÉCORD MUNDIAL!", True, COLORS['text_gold']),
+                          SCREEN_WIDTH//2, 450)
+        
+        # Opciones
+        options = [
+            f"N - Nivel {game.level + 1}",
+            "R - Jugar de nuevo",
+            "ESPACIO - Menú principal"
+        ]
+        for i, option in enumerate(options):
+            blit_centered(target, game.game_font.render(option, True, COLORS['text_white']), SCREEN_WIDTH//2, 550 + i * 40)
+    
+    def draw(self):
+        game = self.game
+        screen = game.screen
+        game.draw_background()
+        
+        # Título animado
+        key = (game.menu_font, game.level)
+        if key != self.title_key:
+            self.title_key = key
+            self.title = game.menu_font.render(f"¡NIVEL {game.level} COMPLETADO!", True, COLORS['success_green'])
+        title_y = 200 + math.sin(game.menu_animation_time * 2) * 10
+        blit_centered(screen, self.title, SCREEN_WIDTH//2, title_y)
+        
+        # Efectos de celebración
+        for i in range(10):
+            angle = game.menu_animation_time * 2 + i * (2 * math.pi / 10)
+            star_x = SCREEN_WIDTH//2 + math.cos(angle) * 100
+            star_y = title_y + math.sin(angle) * 50
+            pygame.draw.circle(screen, COLORS['text_gold'], VIEW.point(star_x, star_y), VIEW.length(3))
+        
+        self.layer.draw(screen, (game.score, game.lives, game.level, game.score_manager.get_high_score()))
+
+SCENES = (MenuScene, InstructionsScene, HighScoresScene, PlayingScene, PauseScene, GameOverScene, VictoryScene)
+
+class SubmarineExplorerGame:
+    """Clase principal del juego El Explorador Submarino"""
+    
+    ATTRACT_DELAY = 20 * FPS  # Inactividad en el menú antes de la demostración
+    
+    def __init__(self, seed: Optional[int] = None, config: Optional[GameConfig] = None,
+                 headless: bool = False, display: Optional[DisplaySettings] = None,
+                 preload_levels: Optional[bool] = None):
+        # Sin pantalla se dibuja en una superficie fuera de pantalla y no se
+        # inicializan ni la ventana ni las fuentes (se cargan al dibujar).
+        # preload_levels: generar el siguiente nivel en un hilo (por defecto solo con pantalla)
+        self.headless = headless
+        self.display = display or DisplaySettings.from_env()
+        render_size = self.display.render_size
+        if headless:
+            self.window = None
+            self.screen = pygame.Surface(render_size)
+        else:
+            init_pygame()
+            self.window = pygame.display.set_mode(self.display.window_size)
+            pygame.display.set_caption("El Explorador Submarino")
+            # Con resolución interna menor se dibuja aparte y se escala una vez al presentar
+            if render_size == self.display.window_size:
+                self.screen = self.window
+            else:
+                self.screen = pygame.Surface(render_size)
+        VIEW.fit(render_size)
+        self.clock = pygame.time.Clock()
+        
+        # Fuentes
+        self.title_font = None
+        self.menu_font = None
+        self.game_font = None
+        self.small_font = None
+        self.overlay_font = None
+        if not headless:
+            self.load_fonts()
+        
+        # Configuración del juego (la del nivel 1; cada nivel la escala con level_config)
+        self.config = config or GameConfig()
+        self.level_config = self.config
+        
+        # Semilla de la sesión para poder reproducir partidas
+        if seed is None:
+            seed = random.randrange(2**32)
+            env_seed = os.environ.get('SUBMARINE_SEED')
+            if env_seed:
+                try:
+                    seed = int(env_seed)
+                except ValueError:
+                    print(f"SUBMARINE_SEED no es un entero ({env_seed!r}); se usa la semilla {seed}")
+        self.seed = seed
+        random.seed(self.seed)
+        
+        # Estado del juego
+        self.state = GameState.MENU
+        # Una escena por estado; la activa se elige con self.state
+        self.scenes = {scene.state: scene(self) for scene in SCENES}
+        self.scene: Optional[Scene] = None
+        self.drawn_scene: Optional[Scene] = None
+        self.score_manager = ScoreManager(None if headless else "submarine_high_scores.json")
+        self.particle_system = ParticleSystem()
+        
+        # Efectos de sonido (SUBMARINE_SOUND=0 los desactiva)
+        self.sound_bank = SoundBank(os.environ.get('SUBMARINE_SOUND_DIR', 'sounds'),
+                                    enabled=not headless and os.environ.get('SUBMARINE_SOUND', '1') != '0')
+        
+        # Cámara que sigue al buzo por el arrecife
+        self.camera = Camera()
+        
+        # Cola de dibujo de entidades, partículas, perlas y HUD
+        self.render_queue = RenderQueue()
+        
+        # Visión de los enemigos (la caché se vacía sola al cambiar de laberinto)
+        self.line_of_sight = LineOfSight()
+        
+        # Modo aguas profundas (tecla L o SUBMARINE_DEEP_WATER=1)
+        self.lighting = DeepWaterLighting(os.environ.get('SUBMARINE_DEEP_WATER', '0') == '1')
+        
+        # Variables del juego
+        self.score = 0
+        self.lives = 3
+        self.level = 1
+        self.game_time = 0
+        
+        # Objetos del juego
+        self.player = None
+        self.maze = None
+        self.enemies = []
+        self.pearls = PearlStore()
+        
+        # Efectos y animaciones
+        self.menu_animation_time = 0
+        self.background_bubbles = []
+        self.background = CachedLayer(self.render_background, transparent=False)
+        self.screen_shake = 0
+        self.minimap_surface = None
+        self.minimap_age = 0
+        
+        # Modo demostración: el piloto automático juega tras un rato en el menú
+        self.autopilot = None
+        self.demo_mode = False
+        self.menu_idle_time = 0
+        
+        # Generación del siguiente nivel en segundo plano (sin pantalla, por defecto al momento)
+        if preload_levels is None:
+            preload_levels = not headless
+        self.level_preloader = LevelPreloader() if preload_levels else None
+        
+        # Actualización de entidades por bloques (en varios hilos por defecto solo sin GIL)
+        self.parallel_update = ParallelUpdater.from_environment()
+        
+        # Capturas del frame como arrays de NumPy
+        self.frame_captures = []
+        
+        # Funciones llamadas al final de cada update (p. ej. el servidor de espectadores)
+        self.tick_listeners = []
+        
+        # Instrumentación de tiempos por frame (F3 para el overlay)
+        self.frame_stats = FrameStats(export_path=os.environ.get('SUBMARINE_FRAME_STATS'))
+        
+        # Grabación de los frames presentados (F11 o SUBMARINE_RECORD=raw|png)
+        record_format = os.environ.get('SUBMARINE_RECORD', '')
+        if record_format and record_format not in FrameRecorder.FORMATS:
+            print(f"SUBMARINE_RECORD desconocido ({record_format!r}); valores válidos: "
+                  f"{', '.join(FrameRecorder.FORMATS)}. No se graba desde el arranque")
+            record_format = ''
+        record_scale = os.environ.get('SUBMARINE_RECORD_SCALE', '1')
+        try:
+            scale = float(record_scale)
+            if not 0 < scale <= 1:
+                raise ValueError(record_scale)
+        except ValueError:
+            print(f"SUBMARINE_RECORD_SCALE debe ser un número mayor que 0 y como mucho 1 "
+                  f"({record_scale!r}); se graba a tamaño completo")
+            scale = 1.0
+        self.frame_recorder = FrameRecorder(
+            os.environ.get('SUBMARINE_RECORD_DIR', 'recordings'),
+            record_format or 'raw',
+            scale=scale,
+            compress=os.environ.get('SUBMARINE_RECORD_COMPRESS', '0') == '1')
+        if record_format:
+            self.frame_recorder.request()
+        
+        # Captura de perfil bajo demanda (F9 o SUBMARINE_PROFILE=<frames>)
+        self.profiler_capture = ProfilerCapture(os.environ.get('SUBMARINE_PROFILE_DIR', 'profiles'))
+        profile_frames = os.environ.get('SUBMARINE_PROFILE')
+        if profile_frames:
+            try:
+                self.profiler_capture.request(int(profile_frames))
+            except ValueError:
+                self.profiler_capture.request()
+        
+        # Seguimiento de asignaciones (F10 o SUBMARINE_ALLOC=<frames>)
+        self.allocation_tracker = AllocationTracker(os.environ.get('SUBMARINE_PROFILE_DIR', 'profiles'))
+        alloc_frames = os.environ.get('SUBMARINE_ALLOC')
+        if alloc_frames:
+            try:
+                self.allocation_tracker.request(int(alloc_frames))
+            except ValueError:
+                self.allocation_tracker.request()
+        
+        # Regulador de calidad: SUBMARINE_QUALITY=auto (por defecto) o un nivel fijo
+        quality = os.environ.get('SUBMARINE_QUALITY', 'auto')
+        if quality.isdigit():
+            self.quality_governor = QualityGovernor(int(quality), enabled=False)
+        else:
+            self.quality_governor = QualityGovernor(enabled=not headless)
+        
+        self.init_background_effects()
+    
+    def add_frame_capture(self, size: Optional[Tuple[int, int]] = None, grayscale: bool = False,
+                          smooth: bool = False) -> FrameCapture:
+        """Registra una captura del frame compuesto (ver FrameCapture)"""
+        capture = FrameCapture(self.screen, size, grayscale, smooth)
+        self.frame_captures.append(capture)
+        return capture
+    
+    def release_frame_captures(self):
+        """Desbloquea la pantalla antes de dibujar
+        
+        Las vistas a tamaño completo bloquean la pantalla. Si quien capturó aún
+        conserva la última, la pantalla pasa a ser una copia del frame: la vista
+        se queda con el suyo y el juego sigue dibujando sin bloqueos.
+        """
+        for capture in self.frame_captures:
+            capture.release()
+        if not self.screen.get_locked():
+            return
+        screen = self.screen.copy()
+        for capture in self.frame_captures:
+            if capture.source is self.screen:
+                capture.source = screen
+        if self.frame_recorder.source is self.screen:
+            self.frame_recorder.source = screen
+        self.screen = screen
+    
+    def add_tick_listener(self, listener):
+        """Registra una función que recibe el juego tras cada update"""
+        self.tick_listeners.append(listener)
+    
+    def load_fonts(self):
+        """Carga las fuentes del juego"""
+        pygame.font.init()
+        # Los tamaños siguen la escala de la vista; el overlay de diagnóstico
+        # se dibuja sobre la ventana y usa siempre el tamaño original
+        scale = VIEW.scale
+        self.title_font = pygame.font.Font(None, max(8, round(72 * scale)))
+        self.menu_font = pygame.font.Font(None, max(8, round(48 * scale)))
+        self.game_font = pygame.font.Font(None, max(8, round(36 * scale)))
+        self.small_font = pygame.font.Font(None, max(8, round(24 * scale)))
+        self.overlay_font = pygame.font.Font(None, 24)
+    
+    def init_background_effects(self):
+        """Inicializa efectos de fondo"""
+        # Crear burbujas de fondo para el menú
+        for _ in range(20):
             x = random.randint(0, SCREEN_WIDTH)
-            y = SCREEN_HEIGHT + 10
+            y = random.randint(0, SCREEN_HEIGHT)
             self.background_bubbles.append(Bubble(x, y))
+    
+    def reset_game(self):
+        """Reinicia el juego"""
+        self.score = 0
+        self.lives = 3
+        self.game_time = 0
+        self.start_level(1)
+    
+    def start_level(self, level: int):
+        """Entra en un nivel conservando puntuación y vidas"""
+        self.level = level
+        self.level_config = level_config(self.config, level)
+        self.screen_shake = 0
+        
+        # Crear laberinto, jugador, enemigos y perlas (el plan suele estar ya preparado)
+        plan = self.level_preloader.take(level) if self.level_preloader else None
+        if plan is None:
+            plan = prepare_level(self.level_config, self.level_seed(level), self.minimap_rect().size)
+        level_objects = build_level(plan, self.level_config)
+        self.maze = level_objects.maze
+        self.player = level_objects.player
+        self.enemies = level_objects.enemies
+        self.pearls = PearlStore(level_objects.pearls)
+        self.camera.snap(self.player.x, self.player.y, self.maze)
+        
+        # Limpiar sistema de partículas
+        self.particle_system.clear()
+        self.minimap_surface = None
+        
+        # Preparar el siguiente mientras se juega este
+        if self.level_preloader:
+            self.level_preloader.request(level + 1, level_config(self.config, level + 1),
+                                         self.level_seed(level + 1), self.minimap_rect().size)
+    
+    def level_seed(self, level: int) -> str:
+        """Semilla de un nivel: depende solo de la sesión y del número de nivel"""
+        return f"{self.seed}:{level}"
+    
+    def finish_run(self, completed: bool):
+        """Guarda la puntuación de la partida (una vez por partida, no por nivel)"""
+        if not self.demo_mode:
+            self.score_manager.save_score(self.score, completed)
+    
+    def session_metadata(self) -> dict:
+        """Datos necesarios para reproducir la sesión (semilla y configuración)"""
+        return {
+            'seed': self.seed,
+            'config': asdict(self.config),
+            'state': self.state.value,
+            'level': self.level,
+            'game_time': self.game_time,
+            'quality_level': self.quality_governor.level
+        }
+    
+    def handle_events(self):
+        """Maneja eventos del juego"""
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                if self.state == GameState.VICTORY:
+                    self.finish_run(True)
+                return False
+            
+            if event.type == pygame.KEYDOWN and not self.handle_key(event.key):
+                return False
+        
+        return True
+    
+    def handle_key(self, key: int) -> bool:
+        """Aplica una tecla pulsada; devuelve False si hay que salir del juego"""
+        self.menu_idle_time = 0
+        
+        # Cualquier tecla termina la demostración
+        if self.demo_mode:
+            self.stop_demo()
+            return True
         
-        # Actualizar según el estado
-        if self.state == GameState.PLAYING:
-            self.update_game()
+        if key == pygame.K_F3:
+            self.frame_stats.toggle_overlay()
+        elif key == pygame.K_F9:
+            self.profiler_capture.toggle()
+        elif key == pygame.K_F10:
+            self.allocation_tracker.toggle()
+        elif key == pygame.K_F11:
+            self.frame_recorder.toggle()
+        
+        return self.current_scene().handle_key(key)
+    
+    def current_scene(self) -> Scene:
+        """Escena del estado actual; avisa a la escena al entrar en ella"""
+        scene = self.scenes[self.state]
+        if scene is not self.scene:
+            self.scene = scene
+            scene.enter()
+        return scene
+    
+    def update(self, controls: Optional[PlayerControls] = None):
+        """Actualiza la lógica del juego (sin controles explícitos se lee el teclado)"""
+        self.update_ambient()
+        
+        self.current_scene().update(controls)
+        
+        if self.demo_mode and self.state in [GameState.GAME_OVER, GameState.VICTORY]:
+            self.stop_demo()
         
         # Actualizar sistema de partículas
-        self.particle_system.update()
+        with self.frame_stats.section('update.particles'):
+            self.parallel_update.update_particles(self.particle_system)
         
         # Reducir screen shake
         if self.screen_shake > 0:
             self.screen_shake -= 1
+        
+        for listener in self.tick_listeners:
+            listener(self)
+    
+    def update_ambient(self):
+        """Animaciones del menú y burbujas de fondo (no dependen de la partida)"""
+        # Actualizar animaciones globales
+        self.menu_animation_time += 0.05
+        
+        # Actualizar burbujas de fondo
+        with self.frame_stats.section('update.background'):
+            self.background_bubbles = [b for b in self.background_bubbles if b.update()]
+        
+        # Añadir nuevas burbujas de fondo
+        if len(self.background_bubbles) < 15:
+            x = random.randint(0, SCREEN_WIDTH)
+            y = SCREEN_HEIGHT + 10
+            self.background_bubbles.append(Bubble(x, y))
+    
+    def start_demo(self):
+        """Inicia una partida de demostración manejada por el piloto automático"""
+        self.demo_mode = True
+        self.autopilot = Autopilot()
+        self.state = GameState.PLAYING
+        self.reset_game()
     
-    def update_game(self):
+    def stop_demo(self):
+        """Termina la demostración y vuelve al menú"""
+        self.demo_mode = False
+        self.autopilot = None
+        self.menu_idle_time = 0
+        self.state = GameState.MENU
+    
+    def update_game(self, controls: Optional[PlayerControls] = None):
         """Actualiza la lógica del juego principal"""
         self.game_time += 1
         
-        # Actualizar laberinto
-        self.maze.update()
+        if controls is None and self.autopilot is not None:
+            controls = self.autopilot.controls(self)
+        elif controls is None and self.headless:
+            # Sin pantalla no hay teclado que leer
+            controls = IDLE_CONTROLS
+        
+        stats = self.frame_stats
+        
+        # Actualizar laberinto (solo los bloques cerca de la cámara)
+        with stats.section('update.maze'):
+            self.maze.update(self.camera.active_region())
         
         # Actualizar jugador
-        self.player.update(self.maze)
+        with stats.section('update.player'):
+            self.player.update(self.maze, controls)
+        self.camera.follow(self.player.x, self.player.y, self.maze)
         
         # Generar burbujas del jugador
-        bubble_pos = self.player.draw(self.screen)
+        bubble_pos = self.player.exhale()
         if bubble_pos and random.random() < 0.3:
             self.particle_system.add_bubble(bubble_pos[0], bubble_pos[1])
         
-        # Actualizar enemigos
-        for enemy in self.enemies:
-            enemy.update(self.maze, self.player)
+        # Actualizar enemigos (las colisiones salen de la misma pasada)
+        parallel = self.parallel_update
+        with stats.section('update.enemies'):
+            sight = self.line_of_sight.can_see(self.maze, self.player, self.enemies)
+            for enemy, sees in zip(self.enemies, sight):
+                enemy.sees_player = sees
+            enemy_hits = [self.enemies[i] for i in parallel.update_enemies(self.enemies, self.maze, self.player)]
         
         # Actualizar perlas
-        for pearl in self.pearls:
-            pearl.update()
+        with stats.section('update.pearls'):
+            pearl_hits = parallel.update_pearls(self.pearls, self.player)
         
         # Verificar colisiones con perlas
-        for pearl in self.pearls[:]:
-            if self.player.collides_with(pearl):
-                self.score += pearl.points
-                
-                # Efectos especiales para perla gigante
-                if isinstance(pearl, GiantPearl):
-                    self.player.give_harpoon()
-                    self.particle_system.add_explosion(pearl.x, pearl.y, COLORS['giant_pearl'])
-                    self.screen_shake = 10
-                else:
-                    self.particle_system.add_explosion(pearl.x, pearl.y, COLORS['pearl_white'])
-                
-                self.pearls.remove(pearl)
+        for index in pearl_hits:
+            pearl = self.pearls.objects[index]
+            pearl_x, pearl_y = self.pearls.x[index], self.pearls.y[index]
+            self.score += pearl.points
+            
+            # Efectos especiales para perla gigante
+            if isinstance(pearl, GiantPearl):
+                self.player.give_harpoon()
+                self.particle_system.add_explosion(pearl_x, pearl_y, COLORS['giant_pearl'])
+                self.sound_bank.play('giant_pearl')
+                self.screen_shake = 10
+            else:
+                self.particle_system.add_explosion(pearl_x, pearl_y, COLORS['pearl_white'])
+                self.sound_bank.play('pearl')
+            
+            self.pearls.collect(index)
         
         # Verificar colisiones con enemigos
-        for enemy in self.enemies:
-            if self.player.collides_with(enemy):
-                if self.player.take_damage():
-                    self.lives -= 1
-                    self.particle_system.add_explosion(self.player.x, self.player.y, COLORS['danger_red'])
-                    self.screen_shake = 15
-                    
-                    if self.lives <= 0:
-                        self.score_manager.save_score(self.score, False)
-                        self.state = GameState.GAME_OVER
-                        return
+        for enemy in enemy_hits:
+            if self.player.take_damage():
+                self.lives -= 1
+                self.particle_system.add_explosion(self.player.x, self.player.y, COLORS['danger_red'])
+                self.sound_bank.play('damage')
+                self.screen_shake = 15
+                
+                if self.lives <= 0:
+                    self.finish_run(self.level > 1)
+                    self.state = GameState.GAME_OVER
+                    return
         
         # Verificar victoria (todas las perlas recolectadas)
         if not self.pearls:
             bonus_score = 1000 + (self.lives * 200)
             self.score += bonus_score
-            self.score_manager.save_score(self.score, True)
+            self.sound_bank.play('victory')
             self.state = GameState.VICTORY
         
-        # Generar burbujas ambientales
-        if self.game_time % self.config.bubble_spawn_rate == 0:
-            x = random.randint(0, SCREEN_WIDTH)
-            y = SCREEN_HEIGHT + 10
+        # Generar burbujas ambientales (desde el borde inferior de la vista)
+        if self.game_time % self.level_config.bubble_spawn_rate == 0:
+            view = self.camera.rect()
+            x = random.randint(view.left, view.right)
+            y = view.bottom + 10
             self.particle_system.add_bubble(x, y)
+            if self.sound_bank.enabled and random.random() < 0.15:
+                self.sound_bank.play('bubble', random.uniform(0.5, 1.0))
     
-    def draw_background(self):
-        """Dibuja el fondo submarino"""
-        # Gradiente de agua
-        for y in range(SCREEN_HEIGHT):
-            ratio = y / SCREEN_HEIGHT
+    def render_background(self, target: pygame.Surface):
+        """Gradiente de agua (una línea por fila de la superficie de render)"""
+        width, height = target.get_size()
+        for y in range(height):
+            ratio = y / height
             color = (
                 int(COLORS['water_deep'][0] + (COLORS['water_light'][0] - COLORS['water_deep'][0]) * ratio),
                 int(COLORS['water_deep'][1] + (COLORS['water_light'][1] - COLORS['water_deep'][1]) * ratio),
                 int(COLORS['water_deep'][2] + (COLORS['water_light'][2] - COLORS['water_deep'][2]) * ratio)
             )
-            pygame.draw.line(self.screen, color, (0, y), (SCREEN_WIDTH, y))
+            pygame.draw.line(target, color, (0, y), (width, y))
+    
+    def draw_background(self):
+        """Dibuja el fondo submarino"""
+        # El gradiente solo depende del tamaño de la pantalla
+        self.background.draw(self.screen)
         
         # Burbujas de fondo
         for bubble in self.background_bubbles:
             bubble.draw(self.screen)
     
-    def draw_menu(self):
-        """Dibuja el menú principal"""
-        self.draw_background()
-        
-        # Título con animación
-        title_y = 150 + math.sin(self.menu_animation_time) * 10
-        title_text = self.title_font.render("EL EXPLORADOR", True, COLORS['text_gold'])
-        title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, title_y))
-        self.screen.blit(title_text, title_rect)
-        
-        subtitle_text = self.title_font.render("SUBMARINO", True, COLORS['text_gold'])
-        subtitle_rect = subtitle_text.get_rect(center=(SCREEN_WIDTH//2, title_y + 80))
-        self.screen.blit(subtitle_text, subtitle_rect)
-        
-        # Decoración del título
-        for i in range(5):
-            angle = self.menu_animation_time + i * (2 * math.pi / 5)
-            deco_x = SCREEN_WIDTH//2 + math.cos(angle) * 200
-            deco_y = title_y + 40 + math.sin(angle) * 30
-            pygame.draw.circle(self.screen, COLORS['pearl_white'], (int(deco_x), int(deco_y)), 4)
-        
-        # Menú de opciones
-        menu_options = [
-            ("ESPACIO - Jugar", COLORS['text_white']),
-            ("I - Instrucciones", COLORS['text_white']),
-            ("H - Puntuaciones", COLORS['text_white']),
-            ("ESC - Salir", COLORS['text_white'])
-        ]
-        
-        start_y = 400
-        for i, (option, color) in enumerate(menu_options):
-            option_y = start_y + i * 50 + math.sin(self.menu_animation_time + i) * 5
-            option_text = self.menu_font.render(option, True, color)
-            option_rect = option_text.get_rect(center=(SCREEN_WIDTH//2, option_y))
-            self.screen.blit(option_text, option_rect)
-        
-        # Puntuación más alta
-        high_score = self.score_manager.get_high_score()
-        if high_score > 0:
-            high_score_text = self.small_font.render(
-                f"Mejor Puntuación: {high_score}", True, COLORS['text_gold']
-            )
-            high_score_rect = high_score_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT - 50))
-            self.screen.blit(high_score_text, high_score_rect)
-    
-    def draw_instructions(self):
-        """Dibuja las instrucciones del juego"""
-        self.draw_background()
-        
-        title_text = self.menu_font.render("INSTRUCCIONES", True, COLORS['text_gold'])
-        title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, 100))
-        self.screen.blit(title_text, title_rect)
-        
-        instructions = [
-            "OBJETIVO:",
-            "• Recolecta todas las perlas del arrecife de coral",
-            "• Evita a los tiburones y medusas",
-            "",
-            "CONTROLES:",
-            "• WASD o Flechas - Mover buzo",
-            "• ESC - Pausar juego",
-            "",
-            "ELEMENTOS DEL JUEGO:",
-            "• Perlas blancas: +10 puntos",
-            "• Perlas doradas: +50 puntos + Arpón temporal",
-            "• El arpón ahuyenta a los enemigos",
-            "• Tienes 3 vidas",
-            "",
-            "ENEMIGOS:",
-            "• Tiburones: Rápidos y agresivos",
-            "• Medusas: Lentas pero impredecibles",
-            "",
-            "ESPACIO - Volver al menú"
-        ]
-        
-        start_y = 180
-        for i, instruction in enumerate(instructions):
-            color = COLORS['text_gold'] if instruction.endswith(":") else COLORS['text_white']
-            font = self.game_font if instruction.endswith(":") else self.small_font
-            
-            instruction_text = font.render(instruction, True, color)
-            instruction_rect = instruction_text.get_rect(center=(SCREEN_WIDTH//2, start_y + i * 25))
-            self.screen.blit(instruction_text, instruction_rect)
-    
-    def draw_high_scores(self):
-        """Dibuja las mejores puntuaciones"""
-        self.draw_background()
-        
-        title_text = self.menu_font.render("MEJORES PUNTUACIONES", True, COLORS['text_gold'])
-        title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, 100))
-        self.screen.blit(title_text, title_rect)
-        
-        scores = self.score_manager.get_top_scores()
-        
-        if not scores:
-            no_scores_text = self.game_font.render("No hay puntuaciones registradas", True, COLORS['text_white'])
-            no_scores_rect = no_scores_text.get_rect(center=(SCREEN_WIDTH//2, 300))
-            self.screen.blit(no_scores_text, no_scores_rect)
-        else:
-            start_y = 180
-            for i, score_data in enumerate(scores):
-                rank = i + 1
-                score = score_data['score']
-                date = score_data['date']
-                completed = score_data.get('completed', False)
-                
-                # Número de ranking
-                rank_text = self.game_font.render(f"{rank}.", True, COLORS['text_gold'])
-                rank_rect = rank_text.get_rect(right=SCREEN_WIDTH//2 - 200, y=start_y + i * 40)
-                self.screen.blit(rank_text, rank_rect)
-                
-                # Puntuación
-                score_text = self.game_font.render(f"{score:,}", True, COLORS['text_white'])
-                score_rect = score_text.get_rect(left=SCREEN_WIDTH//2 - 180, y=start_y + i * 40)
-                self.screen.blit(score_text, score_rect)
-                
-                # Indicador de nivel completado
-                if completed:
-                    complete_text = self.small_font.render("★ COMPLETADO", True, COLORS['success_green'])
-                    complete_rect = complete_text.get_rect(left=SCREEN_WIDTH//2 - 50, y=start_y + i * 40 + 5)
-                    self.screen.blit(complete_text, complete_rect)
-                
-                # Fecha
-                date_text = self.small_font.render(date, True, COLORS['text_white'])
-                date_rect = date_text.get_rect(right=SCREEN_WIDTH//2 + 200, y=start_y + i * 40 + 5)
-                self.screen.blit(date_text, date_rect)
-        
-        # Instrucción para volver
-        back_text = self.small_font.render("ESPACIO - Volver al menú", True, COLORS['text_white'])
-        back_rect = back_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT - 100))
-        self.screen.blit(back_text, back_rect)
-    
     def draw_game(self):
         """Dibuja el juego principal"""
         # Aplicar screen shake
         shake_x = random.randint(-self.screen_shake, self.screen_shake) if self.screen_shake > 0 else 0
         shake_y = random.randint(-self.screen_shake, self.screen_shake) if self.screen_shake > 0 else 0
         
+        stats = self.frame_stats
+        
         # Fondo
-        self.draw_background()
+        with stats.section('draw.background'):
+            self.draw_background()
         
         # Crear superficie temporal para el shake
-        game_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        
-        # Dibujar laberinto
-        self.maze.draw(game_surface)
-        
-        # Dibujar perlas
-        for pearl in self.pearls:
-            pearl.draw(game_surface)
-        
-        # Dibujar enemigos
-        for enemy in self.enemies:
-            enemy.draw(game_surface)
-        
-        # Dibujar jugador
-        self.player.draw(game_surface)
-        
-        # Dibujar partículas
-        self.particle_system.draw(game_surface)
+        game_surface = pygame.Surface(self.screen.get_size())
+        
+        # Solo se dibuja lo que cae en la vista: el coste no depende del tamaño del arrecife.
+        # La cola descarta lo que queda fuera; en aguas profundas, además, solo se envía
+        # lo que alcanzan las luces
+        camera = self.camera
+        queue = self.render_queue
+        lighting = self.lighting if self.lighting.enabled else None
+        if lighting:
+            lighting.begin_frame(self.player, self.pearls, camera.rect())
+        
+        # Lo que se sale de la vista no debe pintar sobre las bandas laterales
+        game_surface.set_clip(VIEW.rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT))
+        with VIEW.world(camera):
+            # Dibujar laberinto
+            with stats.section('draw.maze'):
+                self.maze.draw(game_surface, lighting.regions if lighting else None)
+            
+            with stats.section('draw.submit'):
+                # Las perlas se descartan con NumPy antes de llegar a la cola
+                frames, sparkles, culled = self.pearls.sprites(camera.rect(), lighting)
+                queue.submit_many(RenderLayer.PEARLS, frames, culled)
+                queue.submit_many(RenderLayer.PEARL_SPARKLES, sparkles)
+                for enemy in self.enemies:
+                    if not lighting or lighting.is_lit(enemy):
+                        queue.submit_draw(RenderLayer.ENEMIES, enemy.screen_rect(), enemy.draw)
+                queue.submit_draw(RenderLayer.PLAYER, self.player.screen_rect(), self.player.draw)
+                particle_lit = (lambda x, y: lighting.reaches(x, y, 10)) if lighting else None
+                queue.submit_many(RenderLayer.PARTICLES, self.particle_system.sprites(particle_lit))
+            
+            with stats.section('draw.flush'):
+                queue.flush(game_surface)
+            
+            if lighting:
+                with stats.section('draw.lighting'):
+                    lighting.apply(game_surface)
+        game_surface.set_clip(None)
         
         # Aplicar shake y dibujar en pantalla principal
-        self.screen.blit(game_surface, (shake_x, shake_y))
+        self.screen.blit(game_surface, (VIEW.length(shake_x), VIEW.length(shake_y)))
         
         # HUD
-        self.draw_hud()
+        with stats.section('draw.hud'):
+            self.draw_hud()
+        
+        submitted, culled = queue.take_counts()
+        stats.set_gauge('render.submitted', submitted)
+        stats.set_gauge('render.culled', culled)
     
     def draw_hud(self):
-        """Dibuja la interfaz de usuario"""
+        """Dibuja la interfaz de usuario (a través de la cola de dibujo)"""
+        queue = self.render_queue
+        
         # Panel de información
-        hud_surface = pygame.Surface((300, 150))
+        hud_rect = VIEW.rect(10, 10, 300, 150)
+        hud_surface = pygame.Surface(hud_rect.size)
         hud_surface.set_alpha(200)
         hud_surface.fill((0, 0, 0))
-        self.screen.blit(hud_surface, (10, 10))
+        queue.submit(RenderLayer.HUD_PANEL, hud_surface, hud_rect.topleft)
         
         # Puntuación
         score_text = self.game_font.render(f"Puntuación: {self.score:,}", True, COLORS['text_white'])
-        self.screen.blit(score_text, (20, 20))
+        queue.submit(RenderLayer.HUD_TEXT, score_text, VIEW.point(20, 20))
         
         # Vidas
         lives_text = self.game_font.render(f"Vidas: {self.lives}", True, COLORS['text_white'])
-        self.screen.blit(lives_text, (20, 50))
+        queue.submit(RenderLayer.HUD_TEXT, lives_text, VIEW.point(20, 50))
         
         # Perlas restantes
         pearls_remaining = len(self.pearls)
-        pearls_text = self.game_font.render(f"Perlas: {pearls_remaining}", True, COLORS['text_white'])
-        self.screen.blit(pearls_text, (20, 80))
+        pearls_text = self.game_font.render(f"Perlas: {pearls_remaining}   Nivel {self.level}", True,
+                                            COLORS['text_white'])
+        queue.submit(RenderLayer.HUD_TEXT, pearls_text, VIEW.point(20, 80))
         
         # Tiempo de arpón
         if self.player.has_harpoon:
             harpoon_ratio = self.player.harpoon_time / self.player.config.harpoon_duration
             harpoon_text = self.small_font.render(f"Arpón: {harpoon_ratio:.0%}", True, COLORS['harpoon_silver'])
-            self.screen.blit(harpoon_text, (20, 110))
+            queue.submit(RenderLayer.HUD_TEXT, harpoon_text, VIEW.point(20, 110))
             
             # Barra de arpón
             bar_width = 100
             bar_height = 8
-            bar_rect = pygame.Rect(20, 130, bar_width, bar_height)
-            pygame.draw.rect(self.screen, COLORS['shark_gray'], bar_rect)
-            
+            bar_rect = VIEW.rect(20, 130, bar_width, bar_height)
             fill_width = int(bar_width * harpoon_ratio)
-            fill_rect = pygame.Rect(20, 130, fill_width, bar_height)
-            pygame.draw.rect(self.screen, COLORS['harpoon_silver'], fill_rect)
+            fill_rect = VIEW.rect(20, 130, fill_width, bar_height)
+            
+            def draw_bar(target: pygame.Surface):
+                pygame.draw.rect(target, COLORS['shark_gray'], bar_rect)
+                pygame.draw.rect(target, COLORS['harpoon_silver'], fill_rect)
+            queue.submit_draw(RenderLayer.HUD, bar_rect, draw_bar)
         
         # Indicador de invulnerabilidad
         if self.player.invulnerable:
             invuln_text = self.small_font.render("INVULNERABLE", True, COLORS['success_green'])
-            self.screen.blit(invuln_text, (20, 140))
+            queue.submit(RenderLayer.HUD_TEXT, invuln_text, VIEW.point(20, 140))
+        
+        # Aviso de demostración
+        if self.demo_mode:
+            demo_text = self.game_font.render("DEMO - Pulsa una tecla", True, COLORS['text_gold'])
+            demo_rect = demo_text.get_rect(center=VIEW.point(SCREEN_WIDTH//2, 30))
+            queue.submit(RenderLayer.HUD_TEXT, demo_text, demo_rect.topleft)
         
         # Mini mapa (opcional)
-        self.draw_minimap()
+        with self.frame_stats.section('draw.minimap'):
+            self.draw_minimap()
+        
+        queue.flush(self.screen)
     
-    def draw_minimap(self):
-        """Dibuja un mini mapa"""
+    @staticmethod
+    def minimap_rect() -> pygame.Rect:
         minimap_size = 150
-        minimap_surface = pygame.Surface((minimap_size, minimap_size))
+        return VIEW.rect(SCREEN_WIDTH - minimap_size - 10, 10, minimap_size, minimap_size)
+    
+    def draw_minimap(self):
+        """Dibuja un mini mapa (se redibuja cada QUALITY.minimap_interval frames)"""
+        minimap_rect = self.minimap_rect()
+        self.minimap_age -= 1
+        if (self.minimap_surface is None or self.minimap_age <= 0
+                or self.minimap_surface.get_size() != minimap_rect.size):
+            self.minimap_surface = self.render_minimap(minimap_rect.size)
+            self.minimap_age = QUALITY.minimap_interval
+        
+        # Mini mapa y su marco, a la cola de dibujo del HUD
+        self.render_queue.submit(RenderLayer.HUD_PANEL, self.minimap_surface, minimap_rect.topleft)
+        border = VIEW.line_width(2)
+        self.render_queue.submit_draw(
+            RenderLayer.HUD, minimap_rect,
+            lambda target: pygame.draw.rect(target, COLORS['text_white'], minimap_rect, border))
+    
+    def render_minimap(self, size: Tuple[int, int]) -> pygame.Surface:
+        """Renderiza el contenido del mini mapa al tamaño en píxeles indicado"""
+        # Paredes cacheadas por el laberinto (precalculadas con el nivel)
+        walls = self.maze.minimap_walls
+        if walls is None or walls.get_size() != size:
+            walls = self.maze.minimap_walls = self.maze.render_minimap_walls(size)
+        minimap_surface = walls.copy()
         minimap_surface.set_alpha(180)
-        minimap_surface.fill((0, 0, 50))
         
         # Escala del mini mapa
-        scale_x = minimap_size / SCREEN_WIDTH
-        scale_y = minimap_size / SCREEN_HEIGHT
-        
-        # Dibujar paredes del laberinto
-        for y in range(self.maze.height):
-            for x in range(self.maze.width):
-                if self.maze.grid[y][x]:
-                    mini_x = int(x * CELL_SIZE * scale_x)
-                    mini_y = int(y * CELL_SIZE * scale_y)
-                    mini_size = max(1, int(CELL_SIZE * scale_x))
-                    pygame.draw.rect(minimap_surface, COLORS['coral_pink'], 
-                                   (mini_x, mini_y, mini_size, mini_size))
+        scale_x = size[0] / self.maze.pixel_width
+        scale_y = size[1] / self.maze.pixel_height
         
         # Dibujar jugador
         player_x = int(self.player.x * scale_x)
@@ -1428,161 +4585,69 @@ class SubmarineExplorerGame:
             pygame.draw.circle(minimap_surface, color, (enemy_x, enemy_y), 2)
         
         # Dibujar perlas
-        for pearl in self.pearls:
-            pearl_x = int(pearl.x * scale_x)
-            pearl_y = int(pearl.y * scale_y)
-            color = COLORS['giant_pearl'] if isinstance(pearl, GiantPearl) else COLORS['pearl_white']
-            pygame.draw.circle(minimap_surface, color, (pearl_x, pearl_y), 1)
-        
-        # Dibujar mini mapa en pantalla
-        minimap_pos = (SCREEN_WIDTH - minimap_size - 10, 10)
-        self.screen.blit(minimap_surface, minimap_pos)
-        
-        # Marco del mini mapa
-        pygame.draw.rect(self.screen, COLORS['text_white'], (*minimap_pos, minimap_size, minimap_size), 2)
+        # Con decenas de miles de perlas se escriben los píxeles directamente:
+        # un cuadrado de 2x2, como pygame.draw.circle con radio 1
+        pearl_x, pearl_y, kind = self.pearls.positions()
+        if len(kind):
+            colors = np.array([COLORS['pearl_white'], COLORS['giant_pearl']])[kind]
+            mini_x = (pearl_x * scale_x).astype(int)
+            mini_y = (pearl_y * scale_y).astype(int)
+            pixels = pygame.surfarray.pixels3d(minimap_surface)
+            for dx, dy in ((-1, -1), (0, -1), (-1, 0), (0, 0)):
+                pixels[np.clip(mini_x + dx, 0, size[0] - 1), np.clip(mini_y + dy, 0, size[1] - 1)] = colors
+            del pixels
+        
+        # Zona visible, si el arrecife no cabe en la pantalla
+        if self.maze.pixel_width > SCREEN_WIDTH or self.maze.pixel_height > SCREEN_HEIGHT:
+            view = self.camera.rect()
+            view_rect = (int(view.x * scale_x), int(view.y * scale_y), int(view.width * scale_x), int(view.height * scale_y))
+            pygame.draw.rect(minimap_surface, COLORS['text_white'], view_rect, 1)
+        
+        return minimap_surface
     
-    def draw_pause(self):
-        """Dibuja la pantalla de pausa"""
-        self.draw_game()
-        
-        # Overlay semi-transparente
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.set_alpha(150)
-        overlay.fill((0, 0, 0))
-        self.screen.blit(overlay, (0, 0))
-        
-        # Texto de pausa
-        pause_text = self.menu_font.render("JUEGO PAUSADO", True, COLORS['text_white'])
-        pause_rect = pause_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 100))
-        self.screen.blit(pause_text, pause_rect)
-        
-        # Opciones
-        options = [
-            "ESC - Continuar",
-            "M - Menú principal"
-        ]
-        
-        for i, option in enumerate(options):
-            option_text = self.game_font.render(option, True, COLORS['text_white'])
-            option_rect = option_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 20 + i * 40))
-            self.screen.blit(option_text, option_rect)
-    
-    def draw_game_over(self):
-        """Dibuja la pantalla de fin de juego"""
-        self.draw_background()
-        
-        # Título
-        title_text = self.menu_font.render("JUEGO TERMINADO", True, COLORS['danger_red'])
-        title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, 200))
-        self.screen.blit(title_text, title_rect)
-        
-        # Puntuación final
-        score_text = self.game_font.render(f"Puntuación Final: {self.score:,}", True, COLORS['text_white'])
-        score_rect = score_text.get_rect(center=(SCREEN_WIDTH//2, 300))
-        self.screen.blit(score_text, score_rect)
-        
-        # Estadísticas
-        pearls_collected = self.config.pearl_count + self.config.giant_pearl_count - len(self.pearls)
-        total_pearls = self.config.pearl_count + self.config.giant_pearl_count
-        
-        stats_text = self.small_font.render(
-            f"Perlas recolectadas: {pearls_collected}/{total_pearls}", 
-            True, COLORS['text_white']
-        )
-        stats_rect = stats_text.get_rect(center=(SCREEN_WIDTH//2, 350))
-        self.screen.blit(stats_text, stats_rect)
-        
-        # Mejor puntuación
-        high_score = self.score_manager.get_high_score()
-        if self.score == high_score and high_score > 0:
-            new_record_text = self.game_font.render("¡NUEVO RÉCORD!", True, COLORS['text_gold'])
-            new_record_rect = new_record_text.get_rect(center=(SCREEN_WIDTH//2, 400))
-            self.screen.blit(new_record_text, new_record_rect)
-        else:
-            best_text = self.small_font.render(f"Mejor puntuación: {high_score:,}", True, COLORS['text_gold'])
-            best_rect = best_text.get_rect(center=(SCREEN_WIDTH//2, 400))
-            self.screen.blit(best_text, best_rect)
-        
-        # Opciones
-        options = [
-            "R - Jugar de nuevo",
-            "ESPACIO - Menú principal"
-        ]
+    def draw(self):
+        """Dibuja según el estado actual del juego"""
+        if self.small_font is None:
+            self.load_fonts()
+        
+        self.release_frame_captures()
+        scene = self.current_scene()
+        scene.draw()
+        self.drawn_scene = scene
+        
+        if self.headless:
+            # Overlay de instrumentación
+            if self.frame_stats.show_overlay:
+                self.frame_stats.draw_overlay(self.screen, self.overlay_font)
+            return
         
-        for i, option in enumerate(options):
-            option_text = self.game_font.render(option, True, COLORS['text_white'])
-            option_rect = option_text.get_rect(center=(SCREEN_WIDTH//2, 500 + i * 40))
-            self.screen.blit(option_text, option_rect)
+        with self.frame_stats.section('present'):
+            self.present()
     
-    def draw_victory(self):
-        """Dibuja la pantalla de victoria"""
-        self.draw_background()
-        
-        # Título animado
-        title_y = 200 + math.sin(self.menu_animation_time * 2) * 10
-        title_text = self.menu_font.render("¡NIVEL COMPLETADO!", True, COLORS['success_green'])
-        title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, title_y))
-        self.screen.blit(title_text, title_rect)
-        
-        # Efectos de celebración
-        for i in range(10):
-            angle = self.menu_animation_time * 2 + i * (2 * math.pi / 10)
-            star_x = SCREEN_WIDTH//2 + math.cos(angle) * 100
-            star_y = title_y + math.sin(angle) * 50
-            pygame.draw.circle(self.screen, COLORS['text_gold'], (int(star_x), int(star_y)), 3)
-        
-        # Puntuación final con bonus
-        bonus_score = 1000 + (self.lives * 200)
-        score_text = self.game_font.render(f"Puntuación Final: {self.score:,}", True, COLORS['text_white'])
-        score_rect = score_text.get_rect(center=(SCREEN_WIDTH//2, 320))
-        self.screen.blit(score_text, score_rect)
-        
-        bonus_text = self.small_font.render(f"Bonus por completar: +{bonus_score:,}", True, COLORS['success_green'])
-        bonus_rect = bonus_text.get_rect(center=(SCREEN_WIDTH//2, 350))
-        self.screen.blit(bonus_text, bonus_rect)
-        
-        # Estadísticas perfectas
-        perfect_text = self.game_font.render("¡ARRECIFE COMPLETAMENTE EXPLORADO!", True, COLORS['text_gold'])
-        perfect_rect = perfect_text.get_rect(center=(SCREEN_WIDTH//2, 400))
-        self.screen.blit(perfect_text, perfect_rect)
-        
-        # Mejor puntuación
-        high_score = self.score_manager.get_high_score()
-        if self.score == high_score:
-            new_record_text = self.game_font.render("¡NUEVO RÉCORD MUNDIAL!", True, COLORS['text_gold'])
-            new_record_rect = new_record_text.get_rect(center=(SCREEN_WIDTH//2, 450))
-            self.screen.blit(new_record_text, new_record_rect)
-        
-        # Opciones
-        options = [
-            "R - Jugar de nuevo",
-            "ESPACIO - Menú principal"
-        ]
+    def present(self):
+        """Escala el frame a la ventana si hace falta y lo muestra"""
+        if self.screen is not self.window:
+            with self.frame_stats.section('present.scale'):
+                if self.display.smooth:
+                    pygame.transform.smoothscale(self.screen, self.display.window_size, self.window)
+                else:
+                    pygame.transform.scale(self.screen, self.display.window_size, self.window)
         
-        for i, option in enumerate(options):
-            option_text = self.game_font.render(option, True, COLORS['text_white'])
-            option_rect = option_text.get_rect(center=(SCREEN_WIDTH//2, 550 + i * 40))
-            self.screen.blit(option_text, option_rect)
-    
-    def draw(self):
-        """Dibuja según el estado actual del juego"""
-        if self.state == GameState.MENU:
-            self.draw_menu()
-        elif self.state == GameState.INSTRUCTIONS:
-            self.draw_instructions()
-        elif self.state == GameState.HIGH_SCORES:
-            self.draw_high_scores()
-        elif self.state == GameState.PLAYING:
-            self.draw_game()
-        elif self.state == GameState.PAUSED:
-            self.draw_pause()
-        elif self.state == GameState.GAME_OVER:
-            self.draw_game_over()
-        elif self.state == GameState.VICTORY:
-            self.draw_victory()
+        # Overlay de instrumentación, a la resolución de la ventana
+        if self.frame_stats.show_overlay:
+            self.frame_stats.draw_overlay(self.window, self.overlay_font)
         
         pygame.display.flip()
     
+    def close(self):
+        """Detiene los hilos de la sesión (siguiente nivel y actualización por bloques)
+        
+        run() lo llama al salir; quien use la sesión sin run() debe llamarlo al terminar.
+        """
+        if self.level_preloader:
+            self.level_preloader.shutdown()
+        self.parallel_update.shutdown()
+    
     def run(self):
         """Bucle principal del juego"""
         running = True
@@ -1591,12 +4656,41 @@ class SubmarineExplorerGame:
         print("* Cargando recursos...")
         print("* Diviértete!")
 
+        stats = self.frame_stats
+        capture = self.profiler_capture
+        allocations = self.allocation_tracker
+        recorder = self.frame_recorder
+        governor = self.quality_governor
+        
         while running:
-            running = self.handle_events()
-            self.update()
-            self.draw()
+            capture.begin_frame()
+            allocations.begin_frame()
+            stats.begin_frame()
+            governor.begin_frame()
+            with stats.section('events'):
+                running = self.handle_events()
+            with stats.section('update'):
+                self.update()
+            with stats.section('draw'):
+                self.draw()
+            with stats.section('capture'):
+                recorder.end_frame(self.screen, self.session_metadata)
+            governor.end_frame()
+            stats.set_gauge('quality.level', governor.level)
+            stats.end_frame()
+            capture.end_frame(self.session_metadata)
+            allocations.end_frame(self.session_metadata)
             self.clock.tick(FPS)
         
+        # Guardar una captura que siga en curso al salir
+        capture.stop(self.session_metadata())
+        allocations.stop(self.session_metadata())
+        recorder.stop(self.session_metadata())
+        self.close()
+        
+        if stats.export_path:
+            stats.export(stats.export_path)
+        
         print("¡Gracias por jugar El Explorador Submarino!")
         pygame.quit()
 
@@ -1605,6 +4699,7 @@ def main():
     """Función principal del juego"""
     try:
         # Verificar que pygame esté correctamente inicializado
+        init_pygame()
         if not pygame.get_init():
             print("Error: Pygame no se pudo inicializar correctamente")
             return